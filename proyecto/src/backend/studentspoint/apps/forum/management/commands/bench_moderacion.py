@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from studentspoint.apps.forum.models import BANNED_WORDS, MODERATION_WORDS
+from studentspoint.apps.forum.moderation import (
+    CATEGORIA_MODERACION,
+    CATEGORIA_PROHIBIDA,
+    MatcherModeracion,
+)
+
+VOCABULARIO = (
+    "clase prueba ramo sede profesor horario biblioteca casino proyecto "
+    "hackathon malograr entrega informe laboratorio certamen apuntes grupo "
+    "política religión"
+).split()
+
+
+def _escaneo_anterior(texto, prohibidas, moderacion):
+    """Implementación previa: búsqueda de subcadenas término por término."""
+    texto = texto.lower()
+    if any(bad in texto for bad in prohibidas):
+        return True
+    return any(mod in texto for mod in moderacion)
+
+
+class Command(BaseCommand):
+    help = "Compara el motor Aho-Corasick con el escaneo por subcadenas en posts largos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=200)
+        parser.add_argument("--palabras", type=int, default=2000, help="Palabras por post")
+        parser.add_argument(
+            "--terminos-extra",
+            type=int,
+            default=0,
+            help="Términos sintéticos que se agregan a la lista prohibida",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        prohibidas = set(BANNED_WORDS) | {f"termino{i}" for i in range(options["terminos_extra"])}
+        textos = [
+            " ".join(rng.choice(VOCABULARIO) for _ in range(options["palabras"]))
+            for _ in range(options["posts"])
+        ]
+
+        inicio = time.perf_counter()
+        matcher = MatcherModeracion(
+            {CATEGORIA_PROHIBIDA: prohibidas, CATEGORIA_MODERACION: MODERATION_WORDS}
+        )
+        t_compilar = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        marcados_anterior = sum(_escaneo_anterior(t, prohibidas, MODERATION_WORDS) for t in textos)
+        t_anterior = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        marcados_nuevo = sum(bool(matcher.buscar(t)) for t in textos)
+        t_nuevo = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{options['posts']} posts x {options['palabras']} palabras, "
+            f"{len(prohibidas) + len(MODERATION_WORDS)} términos\n"
+            f"  subcadenas:   {t_anterior * 1000:8.1f} ms  (marcados: {marcados_anterior})\n"
+            f"  aho-corasick: {t_nuevo * 1000:8.1f} ms  (marcados: {marcados_nuevo}, "
+            f"compilación {t_compilar * 1000:.1f} ms)"
+        )
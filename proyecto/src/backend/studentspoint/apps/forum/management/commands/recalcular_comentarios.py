@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from studentspoint.apps.forum.models import Comentario, Post
+
+
+class Command(BaseCommand):
+    help = "Recalcula el contador desnormalizado total_comentarios de cada post"
+
+    def handle(self, *args, **options):
+        conteo = (
+            Comentario.objects.filter(post=OuterRef("pk"))
+            .order_by()
+            .values("post")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        actualizados = Post.objects.update(
+            total_comentarios=Coalesce(Subquery(conteo), Value(0))
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Contadores recalculados para {actualizados} posts")
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0002_post_moderado_at_post_moderado_por_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='total_comentarios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0003_post_total_comentarios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['foro', 'estado', '-created_at', 'id'], name='post_feed_nuevo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['foro', 'estado', '-score', 'id'], name='post_feed_top_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+# Copia de ``forum.ranking`` al crear esta migración.
+PESO_COMENTARIOS = 0.5
+EPOCA = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SEGUNDOS_POR_ORDEN = 45000
+TAMANO_LOTE = 500
+
+
+def calcular_hot(score, total_comentarios, created_at):
+    puntos = score + PESO_COMENTARIOS * total_comentarios
+    orden = math.log10(max(abs(puntos), 1))
+    signo = (puntos > 0) - (puntos < 0)
+    return signo * orden + (created_at - EPOCA).total_seconds() / SEGUNDOS_POR_ORDEN
+
+
+def recalcular_hot(apps, schema_editor):
+    Post = apps.get_model("forum", "Post")
+    posts = list(Post.objects.only("id", "score", "total_comentarios", "created_at"))
+    for post in posts:
+        post.hot_rank = calcular_hot(post.score, post.total_comentarios, post.created_at)
+    Post.objects.bulk_update(posts, ["hot_rank"], batch_size=TAMANO_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0005_post_hot_rank'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_hot, migrations.RunPython.noop),
+    ]
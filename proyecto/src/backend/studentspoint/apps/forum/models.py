@@ -6,7 +6,8 @@ from django.db import models
 
 # Palabras que no se permiten en títulos o cuerpos de posts. Si una
 # aparece, el post queda en estado de "revisión". Ajusta esta lista para
-# modificar las reglas de moderación.
+# modificar las reglas de moderación; :mod:`.moderation` la compila en un
+# autómata la primera vez que se usa.
 BANNED_WORDS = {
     "malo", "ofensivo", "odio", "violencia", "drogas", "alcohol", 
     "sexo", "pornografia", "spam", "estafa", "fraude", "hack",
@@ -68,21 +69,49 @@ class Post(models.Model):
     total_reportes = models.PositiveIntegerField(default=0)
     ultimo_reporte_at = models.DateTimeField(null=True, blank=True)
 
+    # Contador desnormalizado de comentarios. Se mantiene en la misma
+    # transacción que crea o elimina el comentario y puede recalcularse con
+    # ``manage.py recalcular_comentarios``.
+    total_comentarios = models.PositiveIntegerField(default=0)
+
+    # Puntaje "hot" precalculado (ver :mod:`.ranking`).
+    hot_rank = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            # Feed "nuevo" y "top" filtrado por foro y estado; el ``id`` final
+            # desempata y permite la paginación por cursor.
+            models.Index(
+                fields=["foro", "estado", "-created_at", "id"], name="post_feed_nuevo_idx"
+            ),
+            models.Index(fields=["foro", "estado", "-score", "id"], name="post_feed_top_idx"),
+            models.Index(fields=["foro", "estado", "-hot_rank", "-id"], name="post_feed_hot_idx"),
+        ]
+
     def __str__(self) -> str:  # pragma: no cover - representación simple
         return self.titulo
     
+    def save(self, *args, **kwargs):
+        # El hot rank parte de la fecha de publicación, así que se fija al crear.
+        if self._state.adding and not self.hot_rank:
+            from django.utils import timezone
+
+            from .ranking import calcular_hot
+
+            self.hot_rank = calcular_hot(
+                self.score, self.total_comentarios, self.created_at or timezone.now()
+            )
+        super().save(*args, **kwargs)
+    
     def verificar_contenido(self):
         """Verifica el contenido del post y determina el estado apropiado."""
-        texto = f"{self.titulo} {self.cuerpo}".lower()
-        
-        # Verificar palabras prohibidas
-        if any(bad in texto for bad in BANNED_WORDS):
-            return Post.Estado.REVISION
-        
-        # Verificar palabras que requieren moderación
-        if any(mod in texto for mod in MODERATION_WORDS):
+        from .moderation import analizar_texto
+
+        # Tanto palabras prohibidas como las que requieren moderación manual
+        # envían el post a revisión.
+        if analizar_texto(self.titulo, self.cuerpo):
             return Post.Estado.REVISION
-            
+
         return Post.Estado.PUBLICADO
     
     def moderar(self, moderador, accion, razon=""):
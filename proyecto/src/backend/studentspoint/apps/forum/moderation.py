@@ -0,0 +1,145 @@
+"""Motor de moderación automática basado en Aho-Corasick.
+
+Las listas :data:`~studentspoint.apps.forum.models.BANNED_WORDS` y
+:data:`~studentspoint.apps.forum.models.MODERATION_WORDS` se compilan una
+sola vez en un autómata multi-patrón. Así un texto se revisa en una única
+pasada lineal, sin importar cuántos términos tengan las listas.
+
+El autómata trabaja sobre palabras y no sobre caracteres: el texto se
+divide con una expresión regular precompilada, por lo que sólo hay
+coincidencias de palabra completa ("hack" no marca "hackathon" y "malo" no
+marca "malograr") y los términos pueden tener varias palabras. Antes de
+comparar, texto y términos se pasan a minúsculas y se les quitan los
+acentos, de modo que "Política" y "politica" coinciden.
+"""
+
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple
+
+CATEGORIA_PROHIBIDA = "prohibida"
+CATEGORIA_MODERACION = "moderacion"
+
+_PALABRA_RE = re.compile(r"\w+")
+# Bloque Unicode de diacríticos combinables (tildes, diéresis, virgulilla).
+_DIACRITICOS_RE = re.compile("[\u0300-\u036f]+")
+
+
+class Coincidencia(NamedTuple):
+    """Término encontrado en un texto y la categoría a la que pertenece."""
+
+    termino: str
+    categoria: str
+
+
+def normalizar(texto: str) -> str:
+    """Pasa ``texto`` a minúsculas y quita los acentos (``ñ`` queda como ``n``)."""
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS_RE.sub("", unicodedata.normalize("NFKD", texto))
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Normaliza ``texto`` y lo divide en palabras."""
+    return _PALABRA_RE.findall(normalizar(texto))
+
+
+class MatcherModeracion:
+    """Autómata Aho-Corasick cuyo alfabeto son palabras normalizadas.
+
+    Parameters
+    ----------
+    categorias:
+        Diccionario ``{categoria: términos}``. Si un término aparece en más
+        de una categoría se conserva la primera.
+    """
+
+    def __init__(self, categorias: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._salida: List[List[Coincidencia]] = [[]]
+        # Todas las palabras que aparecen en algún término; permite descartar
+        # en C los textos que no pueden tener coincidencias.
+        self._vocabulario = set()
+        vistos = set()
+        for categoria, terminos in categorias.items():
+            for termino in terminos:
+                clave = tuple(tokenizar(termino))
+                if clave and clave not in vistos:
+                    vistos.add(clave)
+                    self._agregar(clave, Coincidencia(termino, categoria))
+        self._construir_fallos()
+
+    def _agregar(self, clave, coincidencia: Coincidencia) -> None:
+        estado = 0
+        for palabra in clave:
+            self._vocabulario.add(palabra)
+            siguiente = self._goto[estado].get(palabra)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[estado][palabra] = siguiente
+                self._goto.append({})
+                self._fail.append(0)
+                self._salida.append([])
+            estado = siguiente
+        self._salida[estado].append(coincidencia)
+
+    def _construir_fallos(self) -> None:
+        cola = deque(self._goto[0].values())
+        while cola:
+            estado = cola.popleft()
+            for palabra, hijo in self._goto[estado].items():
+                cola.append(hijo)
+                fallo = self._fail[estado]
+                while fallo and palabra not in self._goto[fallo]:
+                    fallo = self._fail[fallo]
+                self._fail[hijo] = self._goto[fallo].get(palabra, 0)
+                self._salida[hijo] = self._salida[hijo] + self._salida[self._fail[hijo]]
+
+    def buscar(self, texto: str) -> List[Coincidencia]:
+        """Devuelve los términos presentes en ``texto``.
+
+        Cada término aparece una sola vez, en el orden en que se encontró.
+        """
+        palabras = tokenizar(texto)
+        if self._vocabulario.isdisjoint(palabras):
+            return []
+        vocabulario = self._vocabulario
+        goto, fail, salida = self._goto, self._fail, self._salida
+        encontrados: Dict[str, Coincidencia] = {}
+        estado = 0
+        anterior = -1
+        # Una palabra fuera del vocabulario siempre lleva el autómata a la
+        # raíz, así que sólo se recorren las relevantes y se reinicia el
+        # estado cuando hay un salto entre ellas.
+        for indice, palabra in [(i, p) for i, p in enumerate(palabras) if p in vocabulario]:
+            if indice != anterior + 1:
+                estado = 0
+            anterior = indice
+            while estado and palabra not in goto[estado]:
+                estado = fail[estado]
+            estado = goto[estado].get(palabra, 0)
+            for coincidencia in salida[estado]:
+                encontrados.setdefault(coincidencia.termino, coincidencia)
+        return list(encontrados.values())
+
+
+@lru_cache(maxsize=1)
+def obtener_matcher() -> MatcherModeracion:
+    """Compila (una sola vez por proceso) el autómata con las listas del foro."""
+    from .models import BANNED_WORDS, MODERATION_WORDS
+
+    return MatcherModeracion(
+        {
+            CATEGORIA_PROHIBIDA: sorted(BANNED_WORDS),
+            CATEGORIA_MODERACION: sorted(MODERATION_WORDS),
+        }
+    )
+
+
+def analizar_texto(*partes: str) -> List[Coincidencia]:
+    """Revisa las ``partes`` de un texto y devuelve las coincidencias."""
+    return obtener_matcher().buscar(" ".join(p for p in partes if p))
@@ -0,0 +1,130 @@
+"""Paginación del feed del foro.
+
+Además de la paginación por número de página, el feed admite paginación
+por cursor (*keyset*): en vez de ``OFFSET`` se filtra por los valores de
+orden del último elemento entregado, de modo que la página N cuesta lo
+mismo que la primera y los posts nuevos no desplazan las páginas ya
+leídas. Está pensada para los índices compuestos de :class:`Post`
+(``foro, estado, -created_at, id`` y ``foro, estado, -score, id``).
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por cursor sobre el ``order_by`` del queryset.
+
+    El queryset debe venir ordenado por una combinación única de campos
+    (por ejemplo ``("-created_at", "id")``). El cursor codifica los valores
+    de esos campos para el último elemento de la página.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Cursor inválido"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        opts = queryset.model._meta
+        self.ordering = list(queryset.query.order_by) or [opts.pk.name]
+        self.fields = [
+            opts.pk if nombre.lstrip("-") == "pk" else opts.get_field(nombre.lstrip("-"))
+            for nombre in self.ordering
+        ]
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._filtro_despues_de(self.decode_cursor(cursor)))
+
+        resultados = list(queryset[: self.page_size + 1])
+        self.has_next = len(resultados) > self.page_size
+        self.page = resultados[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _filtro_despues_de(self, valores):
+        """Comparación lexicográfica ``(f1, f2, ...) > cursor`` según el orden."""
+        filtro = Q()
+        iguales = Q()
+        for nombre, field, valor in zip(self.ordering, self.fields, valores):
+            operador = "lt" if nombre.startswith("-") else "gt"
+            filtro |= iguales & Q(**{f"{field.name}__{operador}": valor})
+            iguales &= Q(**{field.name: valor})
+        return filtro
+
+    def encode_cursor(self, obj):
+        valores = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(valores) != len(self.fields):
+                raise ValueError
+            return [field.to_python(valor) for field, valor in zip(self.fields, valores)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class PostFeedPagination(PageNumberPagination):
+    """Paginación por página o por cursor (``?paginacion=cursor`` o ``?cursor=``)."""
+
+    keyset_class = KeysetPagination
+
+    def _usar_cursor(self, request):
+        # La relevancia de una búsqueda no es una columna, así que los
+        # resultados de ``?search=`` siempre se paginan por número de página.
+        if request.query_params.get("search"):
+            return False
+        return (
+            request.query_params.get("paginacion") == "cursor"
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.keyset_class() if self._usar_cursor(request) else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
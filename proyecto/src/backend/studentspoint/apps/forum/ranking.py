@@ -0,0 +1,80 @@
+"""Ranking "hot" del foro.
+
+Cada post guarda en ``Post.hot_rank`` un puntaje que combina votos,
+comentarios y fecha de publicación::
+
+    puntos = score + PESO_COMENTARIOS * total_comentarios
+    hot = signo(puntos) * log10(max(|puntos|, 1)) + segundos_desde_EPOCA / SEGUNDOS_POR_ORDEN
+
+El puntaje no depende de la hora actual: la frescura entra como la fecha de
+creación, así que un post nuevo supera a uno de hace ``SEGUNDOS_POR_ORDEN``
+segundos con diez veces sus puntos. Por eso basta recalcular la fila del
+post que recibe un voto o un comentario para que siga siendo comparable
+con el resto, y un post con puntos negativos sólo cae un poco por debajo
+de sus contemporáneos. El feed "hot" se sirve con un recorrido del índice
+``foro, estado, -hot_rank, id`` en lugar de calcular una expresión por
+petición.
+
+La tarea periódica :func:`~.tasks.recalcular_hot_rank` sólo corrige los
+posts recientes cuyos contadores cambiaron por otra vía (por ejemplo, una
+reconciliación de comentarios).
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Post
+
+PESO_COMENTARIOS = 0.5
+EPOCA = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+SEGUNDOS_POR_ORDEN = 45000
+# Posts que revisa la tarea periódica.
+VENTANA_HOT = timedelta(days=7)
+TAMANO_LOTE = 500
+
+
+def calcular_hot(score, total_comentarios, created_at) -> float:
+    """Devuelve el puntaje hot para los valores dados."""
+    puntos = score + PESO_COMENTARIOS * total_comentarios
+    orden = math.log10(max(abs(puntos), 1))
+    signo = (puntos > 0) - (puntos < 0)
+    return signo * orden + (created_at - EPOCA).total_seconds() / SEGUNDOS_POR_ORDEN
+
+
+def actualizar_hot(post_id) -> None:
+    """Recalcula el hot rank de un post tras un voto o comentario."""
+    datos = (
+        Post.objects.filter(pk=post_id)
+        .values("score", "total_comentarios", "created_at")
+        .first()
+    )
+    if datos is None:
+        return
+    Post.objects.filter(pk=post_id).update(hot_rank=calcular_hot(**datos))
+
+
+def recalcular_ventana(ahora=None) -> int:
+    """Corrige el hot rank de los posts recientes que quedaron desfasados.
+
+    Devuelve la cantidad de posts actualizados.
+    """
+    ahora = ahora or timezone.now()
+    actualizados = 0
+    lote = []
+    recientes = Post.objects.filter(created_at__gte=ahora - VENTANA_HOT).only(
+        "id", "score", "total_comentarios", "created_at", "hot_rank"
+    )
+    for post in recientes.iterator(chunk_size=TAMANO_LOTE):
+        hot = calcular_hot(post.score, post.total_comentarios, post.created_at)
+        if hot == post.hot_rank:
+            continue
+        post.hot_rank = hot
+        lote.append(post)
+        if len(lote) >= TAMANO_LOTE:
+            actualizados += Post.objects.bulk_update(lote, ["hot_rank"])
+            lote = []
+    if lote:
+        actualizados += Post.objects.bulk_update(lote, ["hot_rank"])
+    return actualizados
@@ -19,7 +19,7 @@ class PostSerializer(serializers.ModelSerializer):
     usuario_name = serializers.CharField(source="usuario.name", read_only=True)
     usuario_career = serializers.CharField(source="usuario.career", read_only=True)
     usuario_campus = serializers.CharField(source="usuario.campus.nombre", read_only=True)
-    total_comentarios = serializers.SerializerMethodField()
+    total_comentarios = serializers.IntegerField(read_only=True)
     total_reportes = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -50,9 +50,6 @@ class PostSerializer(serializers.ModelSerializer):
             "total_comentarios", "total_reportes", "moderado_por", 
             "razon_moderacion", "moderado_at"
         ]
-    
-    def get_total_comentarios(self, obj):
-        return obj.comentarios.count()
 
 
 class ComentarioSerializer(serializers.ModelSerializer):
@@ -106,6 +103,8 @@ class ModeracionSerializer(serializers.Serializer):
     
     accion = serializers.ChoiceField(choices=["aprobar", "rechazar", "ocultar"])
     razon = serializers.CharField(required=False, allow_blank=True)
+    # Al aprobar, avisar a toda la sede y carrera del foro.
+    anunciar = serializers.BooleanField(required=False, default=False)
 
 
 class ForumDetailSerializer(serializers.Serializer):
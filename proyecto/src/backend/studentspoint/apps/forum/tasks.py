@@ -0,0 +1,11 @@
+"""Tareas periódicas del foro."""
+
+from celery import shared_task
+
+from .ranking import recalcular_ventana
+
+
+@shared_task
+def recalcular_hot_rank():
+    """Refresca ``Post.hot_rank`` de los posts recientes."""
+    return recalcular_ventana()
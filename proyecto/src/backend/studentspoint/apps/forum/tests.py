@@ -1,11 +1,34 @@
 """Pruebas para la app de foros."""
 
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
 from rest_framework.test import APITestCase
 
 from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.notifications.models import Notificacion
 
-from .models import Foro, Post
+from .models import Comentario, Foro, ModeracionEvent, Post, VotoComentario, VotoPost
+from .moderation import (
+    CATEGORIA_MODERACION,
+    CATEGORIA_PROHIBIDA,
+    Coincidencia,
+    MatcherModeracion,
+    analizar_texto,
+)
+from .ranking import actualizar_hot
+from .tasks import recalcular_hot_rank
+from .votes import VALORES_VALIDOS, votar_post
 
 
 class ForumEndpointTests(APITestCase):
@@ -54,3 +77,348 @@ class ForumEndpointTests(APITestCase):
         )
         self.assertEqual(response.status_code, 201)
         self.assertEqual(post.comentarios.count(), 1)
+
+
+class ComentariosContadorTests(APITestCase):
+    """Verifica el contador desnormalizado y el costo fijo del listado."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.sede = Sede.objects.create(
+            slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0
+        )
+        self.user = User.objects.create_user(
+            email="user@duocuc.cl", password="pass123", campus=self.sede, career="Ing"
+        )
+        self.client.force_authenticate(self.user)
+        self.foro = Foro.objects.create(sede=self.sede, carrera="Ing", titulo="General", slug="general")
+        self.post = Post.objects.create(foro=self.foro, usuario=self.user, titulo="t", cuerpo="c")
+
+    def test_crear_y_eliminar_comentario_actualiza_contador(self):
+        url = f"/api/forum/posts/{self.post.id}/comentarios"
+        response = self.client.post(url, {"cuerpo": "hola"})
+        self.assertEqual(response.status_code, 201)
+        self.client.post(url, {"cuerpo": "chao"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.total_comentarios, 2)
+
+        response = self.client.delete(f"{url}/{response.data['id']}")
+        self.assertEqual(response.status_code, 204)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.total_comentarios, 1)
+
+    def test_no_puede_eliminar_comentario_ajeno(self):
+        otro = get_user_model().objects.create_user(email="otro@duocuc.cl", password="x")
+        comentario = Comentario.objects.create(post=self.post, usuario=otro, cuerpo="hola")
+        response = self.client.delete(
+            f"/api/forum/posts/{self.post.id}/comentarios/{comentario.id}"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Comentario.objects.filter(pk=comentario.pk).exists())
+
+    def test_listado_con_consultas_constantes(self):
+        for i in range(20):
+            post = Post.objects.create(foro=self.foro, usuario=self.user, titulo=f"p{i}", cuerpo="c")
+            Comentario.objects.create(post=post, usuario=self.user, cuerpo="hola")
+        # COUNT de paginación + SELECT con JOIN a usuario y sede.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/forum/posts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["usuario_campus"], "Sede Central")
+
+    def test_comando_recalcula_contadores(self):
+        Comentario.objects.create(post=self.post, usuario=self.user, cuerpo="a")
+        Comentario.objects.create(post=self.post, usuario=self.user, cuerpo="b")
+        call_command("recalcular_comentarios", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.total_comentarios, 2)
+
+
+class VotacionTests(APITestCase):
+    """Votos incrementales sobre posts y comentarios."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password="pass123")
+        self.client.force_authenticate(self.user)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+        self.post = Post.objects.create(foro=foro, usuario=self.user, titulo="t", cuerpo="c")
+        self.comentario = Comentario.objects.create(post=self.post, usuario=self.user, cuerpo="hola")
+
+    def test_cambiar_voto_aplica_delta(self):
+        url = f"/api/forum/posts/{self.post.id}/votar"
+        self.assertEqual(self.client.post(url, {"valor": 1}).data["score"], 1)
+        self.assertEqual(self.client.post(url, {"valor": 1}).data["score"], 1)
+        self.assertEqual(self.client.post(url, {"valor": -1}).data["score"], -1)
+        self.assertEqual(self.client.post(url, {"valor": 0}).data["score"], 0)
+        self.assertEqual(VotoPost.objects.filter(post=self.post).count(), 1)
+
+    def test_votar_comentario(self):
+        url = f"/api/forum/posts/{self.post.id}/comentarios/{self.comentario.id}/votar"
+        response = self.client.post(url, {"valor": -1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["score"], -1)
+        self.comentario.refresh_from_db()
+        self.assertEqual(self.comentario.score, -1)
+        self.assertTrue(VotoComentario.objects.filter(comentario=self.comentario, valor=-1).exists())
+
+    def test_valor_invalido(self):
+        response = self.client.post(f"/api/forum/posts/{self.post.id}/votar", {"valor": 5})
+        self.assertEqual(response.status_code, 400)
+
+
+class VotacionConcurrenteTests(TransactionTestCase):
+    """Bajo votantes paralelos el score debe coincidir con la suma de votos."""
+
+    VOTANTES = 24
+    RONDAS = 4
+
+    def setUp(self):
+        User = get_user_model()
+        autor = User.objects.create_user(email="autor@duocuc.cl", password="x")
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+        self.post = Post.objects.create(foro=foro, usuario=autor, titulo="t", cuerpo="c")
+        self.votantes = [
+            User.objects.create_user(email=f"v{i}@duocuc.cl")
+            for i in range(self.VOTANTES)
+        ]
+
+    def _votar(self, usuario, semilla):
+        rng = random.Random(semilla)
+        try:
+            for _ in range(self.RONDAS):
+                for intento in range(50):
+                    try:
+                        votar_post(self.post, usuario, rng.choice(VALORES_VALIDOS))
+                        break
+                    except OperationalError:
+                        # SQLite serializa escritores con "database is locked";
+                        # en PostgreSQL el bloqueo de fila espera por sí solo.
+                        time.sleep(0.01 * (intento + 1))
+                else:
+                    raise AssertionError("no se pudo registrar el voto")
+        finally:
+            connection.close()
+
+    def test_score_igual_a_suma_de_votos(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futuros = [
+                pool.submit(self._votar, usuario, i) for i, usuario in enumerate(self.votantes)
+            ]
+            for futuro in futuros:
+                futuro.result()
+
+        self.post.refresh_from_db()
+        suma = VotoPost.objects.filter(post=self.post).aggregate(total=Sum("valor"))["total"] or 0
+        self.assertEqual(self.post.score, suma)
+        self.assertEqual(VotoPost.objects.filter(post=self.post).count(), self.VOTANTES)
+
+
+class MotorModeracionTests(SimpleTestCase):
+    """Coincidencias de palabra completa, acentos y categorías."""
+
+    def test_no_marca_palabras_contenidas(self):
+        self.assertEqual(analizar_texto("Inscríbete al hackathon", "no quiero malograr nada"), [])
+
+    def test_ignora_acentos_y_mayusculas(self):
+        coincidencias = analizar_texto("Debate de POLITICA", "sobre la religion")
+        self.assertEqual(
+            {(c.termino, c.categoria) for c in coincidencias},
+            {("política", CATEGORIA_MODERACION), ("religión", CATEGORIA_MODERACION)},
+        )
+
+    def test_reporta_categoria_prohibida(self):
+        coincidencias = analizar_texto("Esto es spam, spam y más spam")
+        self.assertEqual(coincidencias, [Coincidencia("spam", CATEGORIA_PROHIBIDA)])
+
+    def test_terminos_de_varias_palabras(self):
+        matcher = MatcherModeracion({"acoso": ["ataque personal"], "otro": ["personal"]})
+        self.assertEqual(
+            [c.termino for c in matcher.buscar("fue un ataque personal")],
+            ["ataque personal", "personal"],
+        )
+        self.assertEqual([c.termino for c in matcher.buscar("ataque al personal")], ["personal"])
+
+
+class ModeracionAutomaticaTests(APITestCase):
+    """El motor se aplica al crear posts y comentarios."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password="pass123")
+        self.client.force_authenticate(self.user)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+
+    def test_post_con_palabra_contenida_se_publica(self):
+        response = self.client.post(
+            "/api/forum/posts/", {"foro": self.foro.id, "titulo": "Hackathon", "cuerpo": "Vengan"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["estado"], Post.Estado.PUBLICADO)
+
+    def test_post_marcado_registra_terminos(self):
+        response = self.client.post(
+            "/api/forum/posts/", {"foro": self.foro.id, "titulo": "Hola", "cuerpo": "contenido malo"}
+        )
+        self.assertEqual(response.data["estado"], Post.Estado.REVISION)
+        evento = ModeracionEvent.objects.get(objeto_tipo="post", objeto_id=response.data["id"])
+        self.assertEqual(evento.razones_json["terminos"], ["malo"])
+
+    def test_comentario_marcado_registra_evento(self):
+        post = Post.objects.create(foro=self.foro, usuario=self.user, titulo="t", cuerpo="c")
+        response = self.client.post(
+            f"/api/forum/posts/{post.id}/comentarios", {"cuerpo": "esto es una estafa"}
+        )
+        self.assertEqual(response.status_code, 201)
+        evento = ModeracionEvent.objects.get(objeto_tipo="comentario", objeto_id=response.data["id"])
+        self.assertEqual(evento.razones_json["categorias"], [CATEGORIA_PROHIBIDA])
+
+
+class AnuncioModeracionTests(APITestCase):
+    """Aprobar un post con ``anunciar`` avisa a la sede y carrera del foro."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.moderador = User.objects.create_user(
+            email="mod@duocuc.cl", password="pass123", role=User.Roles.MODERATOR
+        )
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.alumnos = [
+            User.objects.create_user(email=f"a{i}@duocuc.cl", password="pass123", campus=sede, career="Ing")
+            for i in range(2)
+        ]
+        User.objects.create_user(email="otro@duocuc.cl", password="pass123", campus=sede, career="Diseño")
+        foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+        self.post = Post.objects.create(
+            foro=foro, usuario=self.alumnos[0], titulo="Feria laboral", cuerpo="c", estado=Post.Estado.REVISION
+        )
+        self.client.force_authenticate(self.moderador)
+
+    def _moderar(self, **datos):
+        with patch("studentspoint.apps.notifications.tasks.repartir_difusion.delay"):
+            return self.client.post(f"/api/forum/posts/{self.post.id}/moderar", datos, format="json")
+
+    def test_aprobar_con_anuncio(self):
+        self.assertEqual(self._moderar(accion="aprobar", anunciar=True).status_code, 200)
+        aviso = Notificacion.objects.get(tipo="forum")
+        self.assertEqual(aviso.mensaje, "Feria laboral")
+        self.assertEqual(
+            set(aviso.destinatarios.values_list("usuario_id", flat=True)), {u.id for u in self.alumnos}
+        )
+
+    def test_aprobar_sin_anuncio(self):
+        self.assertEqual(self._moderar(accion="aprobar").status_code, 200)
+        self.assertFalse(Notificacion.objects.exists())
+
+
+class FeedCursorTests(APITestCase):
+    """Paginación por cursor del feed de posts."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password="pass123")
+        self.client.force_authenticate(self.user)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+        for i in range(7):
+            # Varios posts con el mismo score para ejercitar el desempate por id.
+            Post.objects.create(foro=self.foro, usuario=self.user, titulo=f"p{i}", cuerpo="c", score=i % 3)
+
+    def _recorrer(self, url):
+        ids = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(p["id"] for p in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_recorre_feed_top_sin_repetir(self):
+        ids = self._recorrer(
+            f"/api/forum/posts/?foro_id={self.foro.id}&orden=top&paginacion=cursor&page_size=2"
+        )
+        esperado = list(
+            Post.objects.filter(foro=self.foro).order_by("-score", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, esperado)
+
+    def test_cursor_estable_con_posts_nuevos(self):
+        response = self.client.get("/api/forum/posts/?paginacion=cursor&page_size=3")
+        primera = [p["id"] for p in response.data["results"]]
+        Post.objects.create(foro=self.foro, usuario=self.user, titulo="nuevo", cuerpo="c")
+        resto = self._recorrer(response.data["next"])
+        self.assertEqual(len(primera) + len(resto), 7)
+        self.assertFalse(set(primera) & set(resto))
+
+    def test_cursor_invalido(self):
+        response = self.client.get("/api/forum/posts/?cursor=no-es-un-cursor")
+        self.assertEqual(response.status_code, 404)
+
+
+class HotRankTests(APITestCase):
+    """Orden "hot" servido desde la columna precalculada."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password="pass123")
+        self.client.force_authenticate(self.user)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+
+    def _post(self, horas, score=0):
+        post = Post.objects.create(foro=self.foro, usuario=self.user, titulo="t", cuerpo="c", score=score)
+        Post.objects.filter(pk=post.pk).update(created_at=timezone.now() - timedelta(hours=horas))
+        actualizar_hot(post.pk)
+        return post
+
+    def test_voto_y_comentario_actualizan_hot_rank(self):
+        # Con score 0 un voto deja log10(max(1, 1)) = 0: se parte de 1.
+        post = self._post(horas=1, score=1)
+        post.refresh_from_db()
+        sin_voto = post.hot_rank
+        response = self.client.post(f"/api/forum/posts/{post.id}/votar", {"valor": 1})
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db()
+        con_voto = post.hot_rank
+        self.assertGreater(con_voto, sin_voto)
+        response = self.client.post(f"/api/forum/posts/{post.id}/comentarios", {"cuerpo": "hola"})
+        self.assertEqual(response.status_code, 201)
+        post.refresh_from_db()
+        self.assertGreater(post.hot_rank, con_voto)
+
+    def _orden_hot(self):
+        response = self.client.get(f"/api/forum/posts/?foro_id={self.foro.id}&orden=hot")
+        return [p["id"] for p in response.data["results"]]
+
+    def test_orden_hot_favorece_posts_recientes(self):
+        viejo = self._post(horas=72, score=10)
+        nuevo = self._post(horas=1, score=3)
+        antiguo = self._post(horas=24 * 30, score=100)
+        negativo = self._post(horas=2, score=-5)
+        # Un post reciente con votos negativos sigue por sobre los de hace días.
+        self.assertEqual(self._orden_hot(), [nuevo.id, negativo.id, viejo.id, antiguo.id])
+
+    def test_tarea_periodica_corrige_contadores_cambiados_por_fuera(self):
+        post = self._post(horas=1)
+        post.refresh_from_db()
+        self.assertEqual(recalcular_hot_rank(), 0)
+        Post.objects.filter(pk=post.pk).update(total_comentarios=40)
+        self.assertEqual(recalcular_hot_rank(), 1)
+        antes = post.hot_rank
+        post.refresh_from_db()
+        self.assertGreater(post.hot_rank, antes)
+
+    def test_un_voto_no_baja_el_post_frente_a_sus_pares(self):
+        votado = self._post(horas=5, score=50)
+        par = self._post(horas=5, score=50)
+        Post.objects.filter(pk=par.pk).update(created_at=F("created_at") + timedelta(seconds=1))
+        actualizar_hot(par.pk)
+        self.assertEqual(self._orden_hot(), [par.id, votado.id])
+
+        # Sin recalcular a los demás, el voto lo sube.
+        self.client.post(f"/api/forum/posts/{votado.id}/votar", {"valor": 1})
+        self.assertEqual(self._orden_hot(), [votado.id, par.id])
@@ -4,6 +4,8 @@ from django.urls import path
 
 from .views import (
     CommentCreateView,
+    CommentDeleteView,
+    CommentVoteView,
     ForoListView,
     ModeracionListView,
     PostHideView,
@@ -18,6 +20,16 @@ urlpatterns = [
     path("foros/", ForoListView.as_view(), name="foro-list"),
     path("forum/posts/", PostListCreateView.as_view(), name="post-list"),
     path("forum/posts/<int:pk>/comentarios", CommentCreateView.as_view(), name="post-comments"),
+    path(
+        "forum/posts/<int:pk>/comentarios/<int:comentario_id>",
+        CommentDeleteView.as_view(),
+        name="post-comment-delete",
+    ),
+    path(
+        "forum/posts/<int:pk>/comentarios/<int:comentario_id>/votar",
+        CommentVoteView.as_view(),
+        name="post-comment-vote",
+    ),
     path("forum/posts/<int:pk>/votar", PostVoteView.as_view(), name="post-vote"),
     path("forum/posts/<int:pk>/reportar", PostReporteView.as_view(), name="post-report"),
     path("forum/posts/<int:pk>/moderar", PostModeracionView.as_view(), name="post-moderate"),
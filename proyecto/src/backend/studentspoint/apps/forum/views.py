@@ -1,16 +1,23 @@
 """Vistas para la API del foro."""
 
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema
 
 from studentspoint.apps.accounts.permissions import IsModerator
+from studentspoint.apps.notifications.difusion import difundir, usuarios_para
+from studentspoint.apps.search.indice import buscar
 
-from .models import BANNED_WORDS, MODERATION_WORDS, Comentario, Foro, Post, PostReporte, VotoPost
+from .models import Comentario, Foro, ModeracionEvent, Post, PostReporte
+from .moderation import analizar_texto
+from .pagination import PostFeedPagination
+from .ranking import actualizar_hot
 from .serializers import (
     ComentarioSerializer,
     ForumDetailSerializer,
@@ -21,6 +28,29 @@ from .serializers import (
     ScoreSerializer,
     VoteSerializer,
 )
+from .votes import VALORES_VALIDOS, votar_comentario, votar_post
+
+
+def _registrar_revision_automatica(objeto_tipo, objeto_id, coincidencias):
+    """Deja constancia de los términos que detectó el motor de moderación."""
+    ModeracionEvent.objects.create(
+        objeto_tipo=objeto_tipo,
+        objeto_id=objeto_id,
+        accion="revision_automatica",
+        razones_json={
+            "terminos": [c.termino for c in coincidencias],
+            "categorias": sorted({c.categoria for c in coincidencias}),
+        },
+    )
+
+
+def _leer_valor_voto(request):
+    """Obtiene el ``valor`` del voto o ``None`` si no es válido."""
+    try:
+        valor = int(request.data.get("valor"))
+    except (TypeError, ValueError):
+        return None
+    return valor if valor in VALORES_VALIDOS else None
 
 
 class ForoListView(generics.ListAPIView):
@@ -79,28 +109,40 @@ class PostListCreateView(generics.ListCreateAPIView):
 
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PostFeedPagination
 
     def get_queryset(self):
-        queryset = Post.objects.all()
+        # ``usuario`` y su sede se cargan en el mismo JOIN para que el listado
+        # tenga un costo fijo de consultas sin importar el tamaño de la página.
+        queryset = Post.objects.select_related("usuario", "usuario__campus")
         foro_id = self.request.query_params.get("foro_id")
         if foro_id:
             queryset = queryset.filter(foro_id=foro_id)
         orden = self.request.query_params.get("orden", "nuevo")
+        # El ``id`` desempata para que el orden sea total (requisito del cursor).
         if orden == "top":
-            queryset = queryset.order_by("-score")
+            queryset = queryset.order_by("-score", "id")
+        elif orden == "hot":
+            queryset = queryset.order_by("-hot_rank", "-id")
         else:
-            queryset = queryset.order_by("-created_at")
+            queryset = queryset.order_by("-created_at", "id")
         estado = self.request.query_params.get("estado")
         if estado:
             queryset = queryset.filter(estado=estado)
+        search = self.request.query_params.get("search")
+        if search:
+            queryset = buscar(queryset, "post", search).order_by("-relevancia", "-created_at", "id")
         return queryset
 
     def perform_create(self, serializer):
-        post = serializer.save(usuario=self.request.user)
-        # Verificar contenido automáticamente
-        estado = post.verificar_contenido()
-        post.estado = estado
-        post.save(update_fields=["estado"])
+        # Verificar contenido automáticamente antes de guardar, en una sola
+        # pasada sobre título y cuerpo.
+        datos = serializer.validated_data
+        coincidencias = analizar_texto(datos.get("titulo", ""), datos.get("cuerpo", ""))
+        estado = Post.Estado.REVISION if coincidencias else Post.Estado.PUBLICADO
+        post = serializer.save(usuario=self.request.user, estado=estado)
+        if coincidencias:
+            _registrar_revision_automatica("post", post.id, coincidencias)
 
 
 class CommentCreateView(generics.ListCreateAPIView):
@@ -115,7 +157,39 @@ class CommentCreateView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         post = get_object_or_404(Post, pk=self.kwargs["pk"])
-        serializer.save(post=post, usuario=self.request.user)
+        coincidencias = analizar_texto(serializer.validated_data.get("cuerpo", ""))
+        with transaction.atomic():
+            comentario = serializer.save(post=post, usuario=self.request.user)
+            Post.objects.filter(pk=post.pk).update(
+                total_comentarios=F("total_comentarios") + 1
+            )
+            actualizar_hot(post.pk)
+            if coincidencias:
+                _registrar_revision_automatica("comentario", comentario.id, coincidencias)
+
+
+class CommentDeleteView(generics.DestroyAPIView):
+    """Elimina un comentario propio (o cualquiera si es moderador)."""
+
+    serializer_class = ComentarioSerializer
+
+    def get_object(self):
+        comentario = get_object_or_404(
+            Comentario, pk=self.kwargs["comentario_id"], post_id=self.kwargs["pk"]
+        )
+        user = self.request.user
+        if comentario.usuario_id != user.id and user.role != user.Roles.MODERATOR:
+            raise PermissionDenied("No puedes eliminar este comentario")
+        return comentario
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            post_id = instance.post_id
+            instance.delete()
+            Post.objects.filter(pk=post_id, total_comentarios__gt=0).update(
+                total_comentarios=F("total_comentarios") - 1
+            )
+            actualizar_hot(post_id)
 
 
 class PostVoteView(APIView):
@@ -123,18 +197,23 @@ class PostVoteView(APIView):
     @extend_schema(request=VoteSerializer, responses=ScoreSerializer)
     def post(self, request, pk):
         post = get_object_or_404(Post, pk=pk)
-        try:
-            valor = int(request.data.get("valor"))
-        except (TypeError, ValueError):
+        valor = _leer_valor_voto(request)
+        if valor is None:
             return Response({"detail": "valor inválido"}, status=status.HTTP_400_BAD_REQUEST)
-        if valor not in (-1, 0, 1):
+        score = votar_post(post, request.user, valor)
+        return Response({"score": score})
+
+
+class CommentVoteView(APIView):
+    """Registra el voto del usuario para un comentario."""
+    @extend_schema(request=VoteSerializer, responses=ScoreSerializer)
+    def post(self, request, pk, comentario_id):
+        comentario = get_object_or_404(Comentario, pk=comentario_id, post_id=pk)
+        valor = _leer_valor_voto(request)
+        if valor is None:
             return Response({"detail": "valor inválido"}, status=status.HTTP_400_BAD_REQUEST)
-        VotoPost.objects.update_or_create(
-            post=post, usuario=request.user, defaults={"valor": valor}
-        )
-        post.score = post.votos.aggregate(score=Sum("valor"))["score"] or 0
-        post.save(update_fields=["score"])
-        return Response({"score": post.score})
+        score = votar_comentario(comentario, request.user, valor)
+        return Response({"score": score})
 
 
 class PostReporteView(generics.CreateAPIView):
@@ -163,6 +242,15 @@ class PostModeracionView(generics.GenericAPIView):
         razon = serializer.validated_data.get("razon", "")
         
         post.moderar(request.user, accion, razon)
+        if accion == "aprobar" and serializer.validated_data["anunciar"]:
+            foro = post.foro
+            difundir(
+                usuarios_para(foro.sede_id, foro.carrera),
+                f"Nuevo anuncio en {foro.titulo}",
+                post.titulo,
+                tipo="forum",
+                data_extra={"post_id": post.id, "foro": foro.slug},
+            )
         
         return Response({"detail": f"Post {accion}do exitosamente"})
 
@@ -188,7 +276,11 @@ class ModeracionListView(generics.ListAPIView):
     serializer_class = PostSerializer
     
     def get_queryset(self):
-        return Post.objects.filter(estado=Post.Estado.REVISION).order_by("-created_at")
+        return (
+            Post.objects.filter(estado=Post.Estado.REVISION)
+            .select_related("usuario", "usuario__campus")
+            .order_by("-created_at")
+        )
 
 
 class PostReportesListView(generics.ListAPIView):
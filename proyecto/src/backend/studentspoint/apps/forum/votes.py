@@ -0,0 +1,67 @@
+"""Motor de votación incremental para posts y comentarios.
+
+En lugar de volver a sumar todos los votos de un objeto cada vez que
+alguien vota, se calcula la diferencia entre el voto anterior del usuario
+y el nuevo, y se aplica como ``F("score") + delta``. La fila del voto se
+bloquea con ``select_for_update`` dentro de la transacción, por lo que dos
+votos simultáneos del mismo usuario no pueden contar dos veces y votos de
+usuarios distintos nunca se pisan el ``score``.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Comentario, Post, VotoComentario, VotoPost
+from .ranking import actualizar_hot
+
+VALORES_VALIDOS = (-1, 0, 1)
+
+
+def _registrar_voto(objeto, usuario, valor, voto_model, campo):
+    """Guarda el voto de ``usuario`` sobre ``objeto`` y devuelve el score.
+
+    ``campo`` es el nombre de la FK del modelo de voto que apunta a
+    ``objeto`` (``post`` o ``comentario``).
+    """
+    if valor not in VALORES_VALIDOS:
+        raise ValueError(f"valor de voto inválido: {valor}")
+
+    modelo = type(objeto)
+    filtro = {campo: objeto, "usuario": usuario}
+    with transaction.atomic():
+        voto = voto_model.objects.select_for_update().filter(**filtro).first()
+        anterior = 0
+        if voto is None:
+            try:
+                # Savepoint propio: si otra petición del mismo usuario insertó
+                # el voto entre medio, la restricción única lo detecta y se
+                # continúa con la fila ya existente.
+                with transaction.atomic():
+                    voto_model.objects.create(valor=valor, **filtro)
+            except IntegrityError:
+                voto = voto_model.objects.select_for_update().get(**filtro)
+        if voto is not None:
+            anterior = voto.valor
+            if anterior != valor:
+                voto_model.objects.filter(pk=voto.pk).update(valor=valor)
+
+        delta = valor - anterior
+        if delta:
+            modelo.objects.filter(pk=objeto.pk).update(score=F("score") + delta)
+        return modelo.objects.values_list("score", flat=True).get(pk=objeto.pk)
+
+
+def votar_post(post: Post, usuario, valor: int) -> int:
+    """Registra un voto sobre ``post`` y devuelve su score actualizado.
+
+    El hot rank del post se refresca en la misma transacción.
+    """
+    with transaction.atomic():
+        score = _registrar_voto(post, usuario, valor, VotoPost, "post")
+        actualizar_hot(post.pk)
+    return score
+
+
+def votar_comentario(comentario: Comentario, usuario, valor: int) -> int:
+    """Registra un voto sobre ``comentario`` y devuelve su score actualizado."""
+    return _registrar_voto(comentario, usuario, valor, VotoComentario, "comentario")
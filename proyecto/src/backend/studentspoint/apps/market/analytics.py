@@ -0,0 +1,158 @@
+"""Rollup del registro de visualizaciones hacia los analytics de productos.
+
+:class:`~.models.VisualizacionProducto` es un registro append-only que se
+llena en lote al volcar los contadores (ver :mod:`.contadores`). Este
+módulo lo consolida de forma incremental: cada pasada procesa solo las
+filas con ``id`` mayor al guardado en :class:`~.models.ProgresoRollup`, las
+agrupa en SQL y suma el resultado a
+
+* ``ProductoAnalytics.visualizaciones_por_campus`` y
+  ``visualizaciones_por_carrera`` (JSON ``{nombre: total}``), y
+* la serie :class:`~.models.VisualizacionDiaria`.
+
+Así ninguna petición agrega visualizaciones y el costo de cada pasada
+depende solo de lo nuevo, no del historial.
+
+Los ``id`` se asignan al insertar, pero una transacción de volcado puede
+confirmarse después de otra con ``id`` mayores. Para que la marca no pase
+por encima de filas aún invisibles, cada pasada se detiene antes de la
+primera fila registrada hace menos de :data:`RETRASO`; las que queden
+detrás se consolidan en una pasada siguiente.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from studentspoint.apps.campuses.models import Sede
+
+from .models import (
+    ProductoAnalytics,
+    ProgresoRollup,
+    VisualizacionDiaria,
+    VisualizacionProducto,
+)
+
+NOMBRE_PROGRESO = "visualizaciones"
+TAMANO_LOTE = 50_000
+# Días del registro que se conservan una vez consolidados.
+RETENCION_DIAS = 90
+# Margen para que confirmen los volcados en curso; muy superior a su duración.
+RETRASO = timedelta(minutes=5)
+SIN_SEDE = "Sin sede"
+SIN_CARRERA = "Sin carrera"
+
+
+def _sumar_distribucion(actual, nuevos):
+    resultado = dict(actual or {})
+    for clave, cantidad in nuevos.items():
+        resultado[clave] = resultado.get(clave, 0) + cantidad
+    return resultado
+
+
+def consolidar(limite: int = TAMANO_LOTE, ahora=None) -> int:
+    """Consolida hasta ``limite`` filas nuevas registradas antes de ``ahora - RETRASO``.
+
+    Devuelve la cantidad de filas procesadas.
+    """
+    corte = (ahora or timezone.now()) - RETRASO
+    with transaction.atomic():
+        progreso, _ = ProgresoRollup.objects.select_for_update().get_or_create(nombre=NOMBRE_PROGRESO)
+        pendientes = VisualizacionProducto.objects.filter(id__gt=progreso.ultimo_id)
+        primera_reciente = pendientes.filter(registrado_at__gt=corte).aggregate(id=Min("id"))["id"]
+        if primera_reciente is not None:
+            pendientes = pendientes.filter(id__lt=primera_reciente)
+        hasta = (
+            pendientes.order_by("id").values_list("id", flat=True)[limite - 1:limite].first()
+            or pendientes.aggregate(hasta=Max("id"))["hasta"]
+        )
+        if hasta is None:
+            return 0
+        rango = pendientes.filter(id__lte=hasta).order_by()
+
+        por_campus = defaultdict(dict)
+        filas = list(rango.values_list("producto_id", "campus_id").annotate(n=Sum("cantidad")))
+        sedes = dict(
+            Sede.objects.filter(id__in={c for _, c, _ in filas if c}).values_list("id", "nombre")
+        )
+        for producto_id, campus_id, n in filas:
+            nombre = sedes.get(campus_id, SIN_SEDE)
+            por_campus[producto_id][nombre] = por_campus[producto_id].get(nombre, 0) + n
+
+        por_carrera = defaultdict(dict)
+        for producto_id, carrera, n in rango.values_list("producto_id", "carrera__nombre").annotate(
+            n=Sum("cantidad")
+        ):
+            por_carrera[producto_id][carrera or SIN_CARRERA] = n
+
+        _actualizar_distribuciones(por_campus, por_carrera)
+        _actualizar_series(
+            {(p, d): n for p, d, n in rango.values_list("producto_id", "dia").annotate(n=Sum("cantidad"))}
+        )
+        procesadas = rango.count()
+
+        progreso.ultimo_id = hasta
+        progreso.save(update_fields=["ultimo_id", "actualizado_at"])
+    return procesadas
+
+
+def _actualizar_distribuciones(por_campus, por_carrera) -> None:
+    producto_ids = set(por_campus) | set(por_carrera)
+    analytics = {
+        a.producto_id: a
+        for a in ProductoAnalytics.objects.select_for_update().filter(producto_id__in=producto_ids)
+    }
+    faltantes = [ProductoAnalytics(producto_id=pid) for pid in producto_ids - analytics.keys()]
+    for nuevo in ProductoAnalytics.objects.bulk_create(faltantes):
+        analytics[nuevo.producto_id] = nuevo
+
+    for producto_id, registro in analytics.items():
+        registro.visualizaciones_por_campus = _sumar_distribucion(
+            registro.visualizaciones_por_campus, por_campus.get(producto_id, {})
+        )
+        registro.visualizaciones_por_carrera = _sumar_distribucion(
+            registro.visualizaciones_por_carrera, por_carrera.get(producto_id, {})
+        )
+    ProductoAnalytics.objects.bulk_update(
+        analytics.values(),
+        ["visualizaciones_por_campus", "visualizaciones_por_carrera"],
+        batch_size=500,
+    )
+
+
+def _actualizar_series(por_dia) -> None:
+    """Suma ``{(producto_id, dia): n}`` a la serie diaria."""
+    if not por_dia:
+        return
+    existentes = {
+        (fila.producto_id, fila.dia): fila
+        for fila in VisualizacionDiaria.objects.filter(
+            producto_id__in={p for p, _ in por_dia}, dia__in={d for _, d in por_dia}
+        )
+    }
+    nuevas = []
+    for (producto_id, dia), n in por_dia.items():
+        fila = existentes.get((producto_id, dia))
+        if fila is None:
+            nuevas.append(VisualizacionDiaria(producto_id=producto_id, dia=dia, visualizaciones=n))
+        else:
+            fila.visualizaciones += n
+    VisualizacionDiaria.objects.bulk_update(
+        [f for clave, f in existentes.items() if clave in por_dia], ["visualizaciones"], batch_size=500
+    )
+    VisualizacionDiaria.objects.bulk_create(nuevas, batch_size=500)
+
+
+def purgar_registro(dias: int = RETENCION_DIAS) -> int:
+    """Borra los días del registro más antiguos que ``dias`` que ya fueron consolidados."""
+    ultimo_id = (
+        ProgresoRollup.objects.filter(nombre=NOMBRE_PROGRESO).values_list("ultimo_id", flat=True).first()
+    )
+    if not ultimo_id:
+        return 0
+    limite = timezone.localdate() - timedelta(days=dias)
+    borradas, _ = VisualizacionProducto.objects.filter(dia__lt=limite, id__lte=ultimo_id).delete()
+    return borradas
@@ -0,0 +1,297 @@
+"""Contadores diferidos de visualizaciones y clicks de productos.
+
+Ver el detalle de un producto o hacer click en su enlace no escribe en la
+base de datos: el incremento se acumula en la caché (Redis en producción,
+locmem en desarrollo) y la tarea periódica :func:`~.tasks.volcar_contadores`
+lo traslada en lote a ``Producto`` y ``ProductoAnalytics`` con ``F()``.
+
+Los incrementos se agrupan en ventanas de :data:`INTERVALO` segundos. Cada
+ventana lleva su propia lista de productos con incrementos, armada con un
+contador atómico (``cache.incr``), de modo que el volcado sabe exactamente
+qué claves leer sin recorrer la caché. Solo se vuelcan ventanas cerradas
+hace al menos una ventana completa, así ninguna petición en curso puede
+seguir escribiendo en ellas.
+
+Las visualizaciones además se cuentan por sede y carrera del usuario; al
+volcar, esos segmentos se insertan en lote en el registro
+:class:`~.models.VisualizacionProducto`, que luego consolida
+:mod:`.analytics`.
+"""
+
+import hashlib
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import CodigoCarrera, Producto, ProductoAnalytics, VisualizacionProducto
+
+VISUALIZACIONES = "visualizaciones"
+CLICKS = "clicks_enlace"
+# Campo de ``ProductoAnalytics`` que acompaña a cada contador de ``Producto``.
+CAMPOS_ANALYTICS = {VISUALIZACIONES: "total_visualizaciones", CLICKS: "total_clicks"}
+
+INTERVALO = 30
+# Ventanas que se conservan en caché si el volcado se atrasa.
+VENTANAS_RETENIDAS = 120
+TTL = INTERVALO * (VENTANAS_RETENIDAS + 2)
+TAMANO_LOTE = 500
+
+_PREFIJO = "market:contadores"
+_CLAVE_ULTIMA = f"{_PREFIJO}:ultima_volcada"
+_CLAVE_BLOQUEO = f"{_PREFIJO}:bloqueo"
+# Listas de entradas de cada ventana: contadores por producto y segmentos.
+_CONTADORES = "c"
+_SEGMENTOS = "s"
+
+
+def _ventana(ahora=None) -> int:
+    return int((ahora if ahora is not None else time.time()) // INTERVALO)
+
+
+def _clave_contador(ventana, campo, producto_id):
+    return f"{_PREFIJO}:{ventana}:{campo}:{producto_id}"
+
+
+def _clave_segmento(ventana, producto_id, campus_id, carrera):
+    # La carrera es texto libre; se resume para usarla en la clave.
+    resumen = hashlib.md5(carrera.encode()).hexdigest()[:12]
+    return f"{_PREFIJO}:{ventana}:seg:{producto_id}:{campus_id}:{resumen}"
+
+
+def _clave_total(ventana, lista):
+    return f"{_PREFIJO}:{ventana}:{lista}:n"
+
+
+def _clave_entrada(ventana, lista, n):
+    return f"{_PREFIJO}:{ventana}:{lista}:{n}"
+
+
+def _incr_o_crear(clave) -> int:
+    if cache.add(clave, 1, TTL):
+        return 1
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave expiró entre ``add`` e ``incr``.
+        cache.set(clave, 1, TTL)
+        return 1
+
+
+def _incr_anotando(ventana, lista, clave, entrada) -> None:
+    if _incr_o_crear(clave) == 1:
+        # Primer incremento de la clave en la ventana: se anota para el volcado.
+        n = _incr_o_crear(_clave_total(ventana, lista))
+        cache.set(_clave_entrada(ventana, lista, n), entrada, TTL)
+
+
+def incrementar(campo: str, producto_id: int, ahora=None) -> None:
+    """Suma uno a ``campo`` del producto en la ventana actual."""
+    ventana = _ventana(ahora)
+    _incr_anotando(ventana, _CONTADORES, _clave_contador(ventana, campo, producto_id), (campo, producto_id))
+
+
+def registrar_visualizacion(producto_id: int, campus_id=None, carrera: str = "", ahora=None) -> None:
+    """Cuenta una visualización y la atribuye a la sede y carrera de quien la hizo."""
+    ventana = _ventana(ahora)
+    incrementar(VISUALIZACIONES, producto_id, ahora)
+    carrera = (carrera or "").strip()
+    _incr_anotando(
+        ventana,
+        _SEGMENTOS,
+        _clave_segmento(ventana, producto_id, campus_id, carrera),
+        (producto_id, campus_id, carrera),
+    )
+
+
+def registrar_click(producto_id: int) -> None:
+    incrementar(CLICKS, producto_id)
+
+
+def _ventanas_pendientes(ahora=None):
+    actual = _ventana(ahora)
+    ultima = cache.get(_CLAVE_ULTIMA)
+    desde = actual - VENTANAS_RETENIDAS if ultima is None else max(ultima + 1, actual - VENTANAS_RETENIDAS)
+    return range(desde, actual + 1)
+
+
+def pendientes(producto_id: int, ahora=None) -> dict:
+    """Incrementos aún no volcados del producto, por campo."""
+    claves = {
+        _clave_contador(ventana, campo, producto_id): campo
+        for ventana in _ventanas_pendientes(ahora)
+        for campo in CAMPOS_ANALYTICS
+    }
+    resultado = dict.fromkeys(CAMPOS_ANALYTICS, 0)
+    for clave, valor in cache.get_many(list(claves)).items():
+        resultado[claves[clave]] += valor
+    return resultado
+
+
+def aplicar_pendientes(producto: Producto) -> Producto:
+    """Suma en memoria los incrementos sin volcar a ``producto`` (no escribe)."""
+    for campo, valor in pendientes(producto.pk).items():
+        setattr(producto, campo, getattr(producto, campo) + valor)
+    return producto
+
+
+def _leer_lista(ventana, lista, clave_de):
+    """Devuelve ``[(entrada, valor)]`` de una lista de la ventana y las claves a borrar.
+
+    ``clave_de`` reconstruye la clave del contador a partir de la entrada.
+    """
+    total = cache.get(_clave_total(ventana, lista)) or 0
+    if not total:
+        return [], []
+    claves_entrada = [_clave_entrada(ventana, lista, n) for n in range(1, total + 1)]
+    entradas = list(cache.get_many(claves_entrada).values())
+    claves_contador = [clave_de(ventana, *entrada) for entrada in entradas]
+    valores = cache.get_many(claves_contador)
+    leidos = [
+        (entrada, valores[clave])
+        for entrada, clave in zip(entradas, claves_contador)
+        if valores.get(clave)
+    ]
+    return leidos, [_clave_total(ventana, lista), *claves_entrada, *claves_contador]
+
+
+def _dia_de(ventana):
+    inicio = datetime.fromtimestamp(ventana * INTERVALO, tz=dt_timezone.utc)
+    return timezone.localdate(inicio)
+
+
+def _sumar(modelo, columna_pk, deltas, campos):
+    """Un ``UPDATE ... SET campo = campo + CASE ...`` por lote de ids."""
+    ids = list(deltas)
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        lote = ids[inicio:inicio + TAMANO_LOTE]
+        cambios = {}
+        for campo_origen, campo_destino in campos.items():
+            casos = [
+                When(**{columna_pk: pid, "then": Value(deltas[pid][campo_origen])})
+                for pid in lote
+                if deltas[pid].get(campo_origen)
+            ]
+            if casos:
+                cambios[campo_destino] = F(campo_destino) + Case(
+                    *casos, default=Value(0), output_field=IntegerField()
+                )
+        if cambios:
+            modelo.objects.filter(**{f"{columna_pk}__in": lote}).update(**cambios)
+
+
+def volcar(ahora=None) -> int:
+    """Traslada a la base de datos las ventanas cerradas.
+
+    Devuelve la cantidad de productos actualizados. Si otro proceso ya está
+    volcando, no hace nada.
+    """
+    if not cache.add(_CLAVE_BLOQUEO, 1, TTL):
+        return 0
+    try:
+        # La ventana actual y la anterior pueden seguir recibiendo escrituras.
+        ventanas = [v for v in _ventanas_pendientes(ahora) if v < _ventana(ahora) - 1]
+        if not ventanas:
+            return 0
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        segmentos = defaultdict(int)
+        claves = []
+        for ventana in ventanas:
+            leidos, claves_lista = _leer_lista(ventana, _CONTADORES, _clave_contador)
+            claves.extend(claves_lista)
+            for (campo, producto_id), valor in leidos:
+                deltas[producto_id][campo] += valor
+            leidos, claves_lista = _leer_lista(ventana, _SEGMENTOS, _clave_segmento)
+            claves.extend(claves_lista)
+            dia = _dia_de(ventana)
+            for (producto_id, campus_id, carrera), valor in leidos:
+                segmentos[dia, producto_id, campus_id, carrera] += valor
+
+        with transaction.atomic():
+            actuales = {
+                pk: valores
+                for pk, *valores in Producto.objects.filter(pk__in=list(deltas))
+                .order_by()
+                .values_list("pk", *CAMPOS_ANALYTICS)
+            }
+            # Los productos eliminados entre medio se descartan.
+            deltas = {pid: d for pid, d in deltas.items() if pid in actuales}
+            _crear_analytics_faltantes(actuales)
+            _sumar(Producto, "pk", deltas, {campo: campo for campo in CAMPOS_ANALYTICS})
+            _sumar(ProductoAnalytics, "producto_id", deltas, CAMPOS_ANALYTICS)
+            _registrar_segmentos(
+                {clave: n for clave, n in segmentos.items() if clave[1] in actuales}
+            )
+
+        # Solo se avanza cuando la transacción confirmó; si falló, el próximo
+        # volcado vuelve a leer las mismas ventanas.
+        cache.set(_CLAVE_ULTIMA, ventanas[-1], None)
+        cache.delete_many(claves)
+        return len(deltas)
+    finally:
+        cache.delete(_CLAVE_BLOQUEO)
+
+
+def _crear_analytics_faltantes(actuales) -> None:
+    """Crea el ``ProductoAnalytics`` de los productos que aún no lo tienen.
+
+    ``actuales`` mapea id de producto a sus contadores antes del volcado;
+    con ellos se inicializa el registro para que, tras sumar el lote,
+    producto y analytics queden iguales.
+    """
+    con_analytics = set(
+        ProductoAnalytics.objects.filter(producto_id__in=list(actuales))
+        .values_list("producto_id", flat=True)
+    )
+    ProductoAnalytics.objects.bulk_create(
+        [
+            ProductoAnalytics(producto_id=pk, total_visualizaciones=vis, total_clicks=clicks)
+            for pk, (vis, clicks) in actuales.items()
+            if pk not in con_analytics
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def codigos_carrera(nombres) -> dict:
+    """Devuelve ``{nombre: id}`` de :class:`CodigoCarrera`, creando los que falten."""
+    nombres = {n for n in nombres if n}
+    if not nombres:
+        return {}
+    codigos = dict(CodigoCarrera.objects.filter(nombre__in=nombres).values_list("nombre", "id"))
+    faltantes = nombres - codigos.keys()
+    if faltantes:
+        CodigoCarrera.objects.bulk_create(
+            [CodigoCarrera(nombre=n) for n in faltantes], ignore_conflicts=True
+        )
+        codigos.update(
+            CodigoCarrera.objects.filter(nombre__in=faltantes).values_list("nombre", "id")
+        )
+    return codigos
+
+
+def _registrar_segmentos(segmentos) -> None:
+    """Inserta en lote los segmentos ``{(dia, producto, sede, carrera): n}`` en el registro."""
+    if not segmentos:
+        return
+    codigos = codigos_carrera(carrera for _, _, _, carrera in segmentos)
+    VisualizacionProducto.objects.bulk_create(
+        [
+            VisualizacionProducto(
+                dia=dia,
+                producto_id=producto_id,
+                campus_id=campus_id,
+                carrera_id=codigos.get(carrera),
+                cantidad=cantidad,
+            )
+            for (dia, producto_id, campus_id, carrera), cantidad in sorted(
+                segmentos.items(), key=lambda item: (item[0][0], item[0][1])
+            )
+        ],
+        batch_size=TAMANO_LOTE,
+    )
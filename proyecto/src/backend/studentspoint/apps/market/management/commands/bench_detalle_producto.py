@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from studentspoint.apps.market.contadores import volcar
+from studentspoint.apps.market.models import CategoriaProducto, Producto, ProductoAnalytics
+from studentspoint.apps.market.views import ProductoViewSet
+
+
+class _ProductoViewSetActual(ProductoViewSet):
+    # Sin límite de peticiones, para medir solo la vista.
+    throttle_classes = []
+
+
+class _ProductoViewSetAnterior(_ProductoViewSetActual):
+    """Detalle con la escritura por petición que se usaba antes."""
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        instance.visualizaciones += 1
+        instance.save()
+        try:
+            instance.analytics.actualizar_estadisticas()
+        except ProductoAnalytics.DoesNotExist:
+            ProductoAnalytics.objects.create(producto=instance)
+        return Response(self.get_serializer(instance).data)
+
+
+class Command(BaseCommand):
+    help = "Mide peticiones por segundo del detalle de producto, con y sin contadores diferidos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--peticiones", type=int, default=2000)
+        parser.add_argument("--productos", type=int, default=50)
+
+    def handle(self, *args, **options):
+        # Sin transacción envolvente: cada escritura del camino anterior paga
+        # su propio commit, como en producción. Los datos se borran al final.
+        usuario = get_user_model().objects.create_user(email="bench-detalle@duocuc.cl", password=None)
+        categoria = CategoriaProducto.objects.create(nombre="bench-detalle")
+        try:
+            self._ejecutar(options, usuario, categoria)
+        finally:
+            usuario.delete()
+            categoria.delete()
+
+    def _ejecutar(self, options, usuario, categoria):
+        ids = [
+            p.pk
+            for p in Producto.objects.bulk_create(
+                Producto(
+                    vendedor=usuario,
+                    categoria=categoria,
+                    titulo=f"Producto {i}",
+                    descripcion="Producto de prueba",
+                    url_principal="https://example.com/p",
+                    estado=Producto.Estados.PUBLICADO,
+                )
+                for i in range(options["productos"])
+            )
+        ]
+        cache.clear()
+
+        factory = APIRequestFactory()
+        for nombre, viewset in (("anterior", _ProductoViewSetAnterior), ("diferido", _ProductoViewSetActual)):
+            vista = viewset.as_view({"get": "retrieve"})
+            inicio = time.perf_counter()
+            for i in range(options["peticiones"]):
+                pk = ids[i % len(ids)]
+                request = factory.get(f"/api/productos/{pk}/")
+                force_authenticate(request, user=usuario)
+                respuesta = vista(request, pk=pk)
+                assert respuesta.status_code == 200, respuesta.status_code
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(
+                f"  {nombre:9} {options['peticiones'] / duracion:8.0f} req/s "
+                f"({duracion * 1000 / options['peticiones']:.2f} ms por petición)"
+            )
+
+        inicio = time.perf_counter()
+        actualizados = volcar(ahora=time.time() + 1000)
+        self.stdout.write(
+            f"  volcado de {actualizados} productos en {(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
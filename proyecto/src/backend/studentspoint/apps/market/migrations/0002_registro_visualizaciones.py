@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoCarrera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=150, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Código de Carrera',
+                'verbose_name_plural': 'Códigos de Carrera',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProgresoRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('actualizado_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VisualizacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('visualizaciones', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visualizaciones_diarias', to='market.producto')),
+            ],
+            options={
+                'verbose_name': 'Visualizaciones Diarias',
+                'verbose_name_plural': 'Visualizaciones Diarias',
+                'ordering': ['dia'],
+                'unique_together': {('producto', 'dia')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VisualizacionProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('campus_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('carrera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='market.codigocarrera')),
+                ('producto', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='registro_visualizaciones', to='market.producto')),
+            ],
+            options={
+                'verbose_name': 'Visualización de Producto',
+                'verbose_name_plural': 'Visualizaciones de Productos',
+                'indexes': [models.Index(fields=['dia', 'id'], name='market_visual_dia_idx'), models.Index(fields=['producto', 'dia'], name='market_visual_prod_dia_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0002_registro_visualizaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visualizacionproducto',
+            name='registrado_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -2,6 +2,7 @@
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import URLValidator
 
@@ -24,6 +25,27 @@ class CategoriaProducto(models.Model):
         return self.nombre
 
 
+class ProductoQuerySet(models.QuerySet):
+    """Consultas frecuentes sobre productos."""
+    
+    def con_favoritos(self, usuario):
+        """Anota ``es_favorito`` (para ``usuario``) y ``total_favoritos``.
+        
+        Ambos salen de subconsultas correlacionadas en el mismo SELECT, sin
+        cargar los favoritos en memoria ni consultar por cada producto.
+        """
+        favoritos = ProductoFavorito.objects.filter(producto=models.OuterRef('pk'))
+        total = favoritos.order_by().values('producto').annotate(n=models.Count('id')).values('n')
+        if usuario is not None and usuario.is_authenticated:
+            es_favorito = models.Exists(favoritos.filter(usuario=usuario))
+        else:
+            es_favorito = models.Value(False)
+        return self.annotate(
+            es_favorito=es_favorito,
+            total_favoritos=Coalesce(models.Subquery(total), 0),
+        )
+
+
 class Producto(models.Model):
     """Producto publicado en el mercado con enlaces externos seguros."""
     
@@ -89,6 +111,8 @@ class Producto(models.Model):
     visualizaciones = models.PositiveIntegerField(default=0)
     clicks_enlace = models.PositiveIntegerField(default=0)
     
+    objects = ProductoQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -207,10 +231,78 @@ class ProductoAnalytics(models.Model):
         self.total_favoritos = self.producto.favoritos.count()
         self.total_reportes = self.producto.reportes.count()
         
-        # Aquí se podrían agregar más estadísticas complejas
-        # como distribución por campus/carrera basada en logs de visualización
-        
-        self.save()
+        # La distribución por campus/carrera la mantiene el rollup del
+        # registro de visualizaciones (ver ``analytics.consolidar``): no se
+        # reescribe aquí para no pisar lo que haya fusionado entretanto.
+        self.save(update_fields=[
+            "total_visualizaciones", "total_clicks", "total_favoritos", "total_reportes",
+            "ultima_actualizacion",
+        ])
+    
+    def __str__(self):
+        return f"Analytics: {self.producto.titulo}"
+
+class CodigoCarrera(models.Model):
+    """Diccionario de carreras para que el registro de visualizaciones guarde un entero."""
+    
+    nombre = models.CharField(max_length=150, unique=True)
+    
+    class Meta:
+        verbose_name = "Código de Carrera"
+        verbose_name_plural = "Códigos de Carrera"
+    
+    def __str__(self):
+        return self.nombre
+
+
+class VisualizacionProducto(models.Model):
+    """Registro append-only de visualizaciones de productos.
+    
+    Cada fila agrupa las visualizaciones de un producto por sede y carrera
+    dentro de una ventana de volcado de contadores; se insertan en lote y
+    nunca se actualizan. ``dia`` particiona el registro: las consultas y la
+    purga de días antiguos recorren el índice ``(dia, id)``. El rollup usa
+    ``registrado_at`` para no adelantarse a inserciones aún sin confirmar.
+    """
+    
+    dia = models.DateField()
+    producto = models.ForeignKey(
+        Producto, on_delete=models.CASCADE, related_name="registro_visualizaciones", db_index=False
+    )
+    campus_id = models.PositiveIntegerField(null=True, blank=True)
+    carrera = models.ForeignKey(CodigoCarrera, on_delete=models.PROTECT, null=True, blank=True, related_name="+")
+    cantidad = models.PositiveIntegerField(default=1)
+    registrado_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['dia', 'id'], name='market_visual_dia_idx'),
+            models.Index(fields=['producto', 'dia'], name='market_visual_prod_dia_idx'),
+        ]
+        verbose_name = "Visualización de Producto"
+        verbose_name_plural = "Visualizaciones de Productos"
+
+
+class VisualizacionDiaria(models.Model):
+    """Serie diaria de visualizaciones por producto, mantenida por el rollup."""
+    
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="visualizaciones_diarias")
+    dia = models.DateField()
+    visualizaciones = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['producto', 'dia']
+        ordering = ['dia']
+        verbose_name = "Visualizaciones Diarias"
+        verbose_name_plural = "Visualizaciones Diarias"
+
+
+class ProgresoRollup(models.Model):
+    """Último id del registro de visualizaciones ya consolidado."""
+    
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    actualizado_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return f"Analytics: {self.producto.titulo}"
\ No newline at end of file
+        return f"{self.nombre}: {self.ultimo_id}"
@@ -0,0 +1,313 @@
+"""Enriquecimiento OpenGraph de los enlaces de productos.
+
+Los metadatos ``og_*`` de un producto se obtienen fuera de la petición, con
+la tarea :func:`~.tasks.enriquecer_opengraph` que se programa al crear o
+editar el producto. Para no repetir trabajo ni saturar a los sitios de
+venta:
+
+* Las descargas comparten una :class:`requests.Session` por proceso, con
+  pool de conexiones y *keep-alive*.
+* La respuesta se lee en *streaming* y se procesa con un parser
+  incremental que se detiene al cerrar ``<head>``; el ``<body>`` (lo más
+  pesado de Marketplace o Yapo) nunca se descarga completo.
+* El resultado se guarda en caché con la URL normalizada como clave, así
+  varios productos con el mismo enlace se resuelven con una sola descarga.
+* Cada dominio admite a lo sumo :data:`LIMITE_POR_DOMINIO` descargas
+  simultáneas entre todos los workers (semáforo en la caché); si no hay
+  cupo se lanza :class:`DominioOcupado` y la tarea se reintenta.
+
+La URL la escribe el vendedor, así que antes de cada descarga (y de cada
+redirección, que se siguen a mano hasta :data:`MAX_REDIRECCIONES`) se
+resuelve el dominio y se exige que todas sus direcciones sean públicas; la
+conexión se abre contra la IP revisada, no contra un nuevo DNS.
+"""
+
+import codecs
+import hashlib
+import ipaddress
+import re
+import socket
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+
+USER_AGENT = "Mozilla/5.0 (compatible; DuocPoint/1.0)"
+TIMEOUT = (3.05, 5)
+MAX_BYTES_HEAD = 256 * 1024
+TAMANO_BLOQUE = 8 * 1024
+TTL_METADATOS = 60 * 60 * 24
+# Los fallos se recuerdan menos tiempo para reintentar pronto.
+TTL_FALLO = 60 * 10
+LIMITE_POR_DOMINIO = 2
+ESQUEMAS = {"http", "https"}
+MAX_REDIRECCIONES = 3
+
+# Largo máximo de cada campo según el modelo ``Producto``.
+CAMPOS = {
+    "og_title": 200,
+    "og_description": 500,
+    "og_image": 200,
+    "og_site_name": 100,
+}
+_PARAMETROS_DESCARTADOS = {"ref", "fbclid", "gclid", "tracking_id"}
+_PREFIJOS_DESCARTADOS = ("utm_",)
+_CHARSET_CABECERA = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+_CHARSET_META = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+
+_sesion = None
+
+
+class DominioOcupado(Exception):
+    """El dominio ya tiene :data:`LIMITE_POR_DOMINIO` descargas en curso."""
+
+
+class DestinoNoPermitido(Exception):
+    """La URL no es http(s) o su dominio resuelve a una dirección no pública."""
+
+
+class AdaptadorFijado(HTTPAdapter):
+    """Adaptador para URLs con la IP ya resuelta y el dominio en ``Host``.
+
+    En https el certificado (y el SNI) se validan contra el dominio
+    original, no contra la IP.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        host = request.headers.get("Host")
+        if host_params["scheme"] == "https" and host:
+            dominio = urlsplit("//" + host).hostname
+            pool_kwargs["server_hostname"] = dominio
+            pool_kwargs["assert_hostname"] = dominio
+        return host_params, pool_kwargs
+
+
+def sesion() -> requests.Session:
+    """Sesión HTTP compartida por el proceso."""
+    global _sesion
+    if _sesion is None:
+        nueva = requests.Session()
+        adaptador = AdaptadorFijado(pool_connections=20, pool_maxsize=LIMITE_POR_DOMINIO * 4, max_retries=1)
+        nueva.mount("http://", adaptador)
+        nueva.mount("https://", adaptador)
+        nueva.headers["User-Agent"] = USER_AGENT
+        _sesion = nueva
+    return _sesion
+
+
+def normalizar_url(url: str) -> str:
+    """Forma canónica de ``url`` para usarla como clave de caché.
+
+    Minúsculas en esquema y dominio, sin fragmento, sin parámetros de
+    seguimiento y con la query ordenada.
+    """
+    partes = urlsplit(url.strip())
+    query = sorted(
+        (clave, valor)
+        for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if clave.lower() not in _PARAMETROS_DESCARTADOS
+        and not clave.lower().startswith(_PREFIJOS_DESCARTADOS)
+    )
+    ruta = partes.path.rstrip("/") or "/"
+    return urlunsplit(
+        (partes.scheme.lower(), partes.netloc.lower(), ruta, urlencode(query), "")
+    )
+
+
+def _clave_cache(url_normalizada: str) -> str:
+    return "market:og:" + hashlib.sha1(url_normalizada.encode()).hexdigest()
+
+
+class ParserHead(HTMLParser):
+    """Extrae metadatos de ``<head>`` y marca ``terminado`` al llegar al cuerpo."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.metadatos = {}
+        self.terminado = False
+        self._titulo = None
+        self._descripcion = None
+        self._en_titulo = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.terminado:
+            return
+        if tag == "body":
+            self.terminado = True
+        elif tag == "title":
+            self._en_titulo = True
+            self._titulo = ""
+        elif tag == "meta":
+            attrs = dict(attrs)
+            contenido = (attrs.get("content") or "").strip()
+            propiedad = (attrs.get("property") or "").lower()
+            if propiedad.startswith("og:"):
+                campo = "og_" + propiedad[3:]
+                if campo in CAMPOS and contenido:
+                    self.metadatos.setdefault(campo, contenido)
+            elif (attrs.get("name") or "").lower() == "description":
+                self._descripcion = contenido
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.terminado = True
+        elif tag == "title":
+            self._en_titulo = False
+
+    def handle_data(self, data):
+        if self._en_titulo:
+            self._titulo += data
+
+    def resultado(self) -> dict:
+        """Metadatos con los mismos *fallbacks* HTML que se usaban antes."""
+        metadatos = dict(self.metadatos)
+        if not metadatos.get("og_title") and self._titulo:
+            metadatos["og_title"] = self._titulo.strip()
+        if not metadatos.get("og_description") and self._descripcion:
+            metadatos["og_description"] = self._descripcion
+        # Una URL de imagen recortada queda rota: mejor no guardarla.
+        if len(metadatos.get("og_image", "")) > CAMPOS["og_image"]:
+            del metadatos["og_image"]
+        return {campo: valor[: CAMPOS[campo]] for campo, valor in metadatos.items()}
+
+
+def _valida(codificacion):
+    try:
+        return codecs.lookup(codificacion).name if codificacion else None
+    except LookupError:
+        return None
+
+
+def codificacion(response, inicio: bytes) -> str:
+    """Charset de la página: cabecera, ``<meta>`` en ``inicio`` o detección.
+
+    Sin ``charset`` en la cabecera ``requests`` asume ISO-8859-1, así que
+    ``response.encoding`` no sirve. ``response.apparent_encoding`` leería
+    el cuerpo completo; se usa el mismo detector sobre ``inicio``.
+    """
+    cabecera = _CHARSET_CABECERA.search(response.headers.get("Content-Type", ""))
+    meta = _CHARSET_META.search(inicio)
+    elegida = (
+        _valida(cabecera and cabecera.group(1))
+        or _valida(meta and meta.group(1).decode("ascii"))
+        or _valida(chardet.detect(inicio).get("encoding"))
+    )
+    # Un comienzo sólo ASCII no dice nada del resto: UTF-8 lo contiene.
+    return "utf-8" if elegida in (None, "ascii") else elegida
+
+
+def leer_head(response) -> dict:
+    """Procesa ``response`` (abierta con ``stream=True``) hasta cerrar ``<head>``."""
+    parser = ParserHead()
+    leidos = 0
+    decodificador = None
+    for bloque in response.iter_content(TAMANO_BLOQUE):
+        if decodificador is None:
+            decodificador = codecs.getincrementaldecoder(codificacion(response, bloque))(errors="replace")
+        parser.feed(decodificador.decode(bloque))
+        leidos += len(bloque)
+        if parser.terminado or leidos >= MAX_BYTES_HEAD:
+            break
+    else:
+        if decodificador is not None:
+            parser.feed(decodificador.decode(b"", final=True))
+    return parser.resultado()
+
+
+@contextmanager
+def cupo_dominio(dominio: str, duracion: float = sum(TIMEOUT) + 5):
+    """Toma uno de los cupos de descarga del dominio o lanza :class:`DominioOcupado`.
+
+    Los cupos expiran solos tras ``duracion`` segundos por si un worker muere
+    sin liberarlos.
+    """
+    for cupo in range(LIMITE_POR_DOMINIO):
+        clave = f"market:og:dominio:{dominio}:{cupo}"
+        if cache.add(clave, 1, duracion):
+            break
+    else:
+        raise DominioOcupado(dominio)
+    try:
+        yield
+    finally:
+        cache.delete(clave)
+
+
+def _ip_permitida(ip) -> bool:
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    if any(ip in ipaddress.ip_network(red) for red in settings.MARKET_OG_REDES_PERMITIDAS):
+        return True
+    return ip.is_global and not (
+        ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_multicast or ip.is_reserved
+    )
+
+
+def resolver_destino(url: str):
+    """``(partes, ip)`` de ``url`` o :class:`DestinoNoPermitido`.
+
+    Se rechaza si alguna de las direcciones del dominio no es pública;
+    ``ip`` es la primera, la que se debe usar para conectar.
+    """
+    partes = urlsplit(url)
+    if partes.scheme.lower() not in ESQUEMAS or not partes.hostname:
+        raise DestinoNoPermitido(url)
+    try:
+        puerto = partes.port or (443 if partes.scheme.lower() == "https" else 80)
+        direcciones = socket.getaddrinfo(partes.hostname, puerto, type=socket.SOCK_STREAM)
+    except (ValueError, OSError, UnicodeError):
+        raise DestinoNoPermitido(url)
+    ips = [ipaddress.ip_address(direccion[4][0].split("%")[0]) for direccion in direcciones]
+    if not ips or not all(_ip_permitida(ip) for ip in ips):
+        raise DestinoNoPermitido(url)
+    return partes, str(ips[0])
+
+
+def _abrir(url: str):
+    """GET a la IP revisada de ``url``, con su dominio en ``Host`` y sin seguir redirecciones."""
+    partes, ip = resolver_destino(url)
+    puerto = f":{partes.port}" if partes.port else ""
+    dominio = f"[{partes.hostname}]" if ":" in partes.hostname else partes.hostname
+    destino = f"[{ip}]" if ":" in ip else ip
+    fijada = urlunsplit((partes.scheme, destino + puerto, partes.path or "/", partes.query, ""))
+    return sesion().get(
+        fijada, headers={"Host": dominio + puerto}, timeout=TIMEOUT, stream=True, allow_redirects=False
+    )
+
+
+def descargar_metadatos(url: str) -> dict:
+    """Descarga ``url`` y devuelve sus metadatos; ``{}`` si falla o no está permitida."""
+    try:
+        for _ in range(MAX_REDIRECCIONES + 1):
+            with _abrir(url) as response:
+                if response.is_redirect:
+                    url = urljoin(url, response.headers["Location"])
+                    continue
+                response.raise_for_status()
+                if "html" not in response.headers.get("Content-Type", "text/html"):
+                    return {}
+                return leer_head(response)
+    except (requests.RequestException, DestinoNoPermitido):
+        pass
+    return {}
+
+
+def obtener_metadatos(url: str) -> dict:
+    """Metadatos OpenGraph de ``url``, desde la caché si ya se descargaron."""
+    normalizada = normalizar_url(url)
+    if urlsplit(normalizada).scheme not in ESQUEMAS:
+        return {}
+    clave = _clave_cache(normalizada)
+    metadatos = cache.get(clave)
+    if metadatos is not None:
+        return metadatos
+    with cupo_dominio(urlsplit(normalizada).hostname or ""):
+        metadatos = descargar_metadatos(url)
+    cache.set(clave, metadatos, TTL_METADATOS if metadatos else TTL_FALLO)
+    return metadatos
@@ -1,11 +1,17 @@
 """Serializers para el sistema de compra/venta."""
 
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     CategoriaProducto, Producto, ProductoFavorito, 
-    ProductoReporte, ProductoAnalytics
+    ProductoReporte, ProductoAnalytics, VisualizacionDiaria
 )
 
+# Días de la serie diaria que se entregan con los analytics.
+DIAS_SERIE = 30
+
 
 class CategoriaProductoSerializer(serializers.ModelSerializer):
     """Serializer para categorías de productos."""
@@ -15,7 +21,29 @@ class CategoriaProductoSerializer(serializers.ModelSerializer):
         fields = ['id', 'nombre', 'descripcion', 'icono', 'activa']
 
 
-class ProductoSerializer(serializers.ModelSerializer):
+class FavoritoAnotadoMixin:
+    """Lee ``es_favorito`` y ``total_favoritos`` anotados por ``Producto.objects.con_favoritos``.
+    
+    Si el producto no viene anotado (por ejemplo recién creado), se consulta.
+    """
+    
+    def get_es_favorito(self, obj):
+        """Verifica si el producto es favorito del usuario actual."""
+        if hasattr(obj, 'es_favorito'):
+            return obj.es_favorito
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return obj.favoritos.filter(usuario=request.user).exists()
+        return False
+    
+    def get_total_favoritos(self, obj):
+        """Cantidad de usuarios que marcaron el producto como favorito."""
+        if hasattr(obj, 'total_favoritos'):
+            return obj.total_favoritos
+        return obj.favoritos.count()
+
+
+class ProductoSerializer(FavoritoAnotadoMixin, serializers.ModelSerializer):
     """Serializer para productos."""
     
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
@@ -23,6 +51,7 @@ class ProductoSerializer(serializers.ModelSerializer):
     vendedor_nombre = serializers.CharField(source='vendedor.name', read_only=True)
     campus_nombre = serializers.CharField(source='campus.nombre', read_only=True)
     es_favorito = serializers.SerializerMethodField()
+    total_favoritos = serializers.SerializerMethodField()
     tiempo_publicado_humanizado = serializers.SerializerMethodField()
     
     class Meta:
@@ -33,7 +62,8 @@ class ProductoSerializer(serializers.ModelSerializer):
             'og_title', 'og_description', 'og_image', 'og_site_name',
             'estado', 'precio', 'moneda', 'campus', 'campus_nombre', 'carrera',
             'created_at', 'updated_at', 'publicado_at', 'vendido_at',
-            'visualizaciones', 'clicks_enlace', 'es_favorito', 'tiempo_publicado_humanizado'
+            'visualizaciones', 'clicks_enlace', 'es_favorito', 'total_favoritos',
+            'tiempo_publicado_humanizado'
         ]
         read_only_fields = [
             'vendedor', 'og_title', 'og_description', 'og_image', 'og_site_name',
@@ -41,13 +71,6 @@ class ProductoSerializer(serializers.ModelSerializer):
             'visualizaciones', 'clicks_enlace'
         ]
     
-    def get_es_favorito(self, obj):
-        """Verifica si el producto es favorito del usuario actual."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favoritos.filter(usuario=request.user).exists()
-        return False
-    
     def get_tiempo_publicado_humanizado(self, obj):
         """Tiempo transcurrido desde la publicación en formato legible."""
         if obj.publicado_at:
@@ -129,16 +152,28 @@ class ProductoReporteSerializer(serializers.ModelSerializer):
 class ProductoAnalyticsSerializer(serializers.ModelSerializer):
     """Serializer para analytics de productos."""
     
+    serie_diaria = serializers.SerializerMethodField()
+    
     class Meta:
         model = ProductoAnalytics
         fields = [
             'total_visualizaciones', 'total_clicks', 'total_favoritos', 
             'total_reportes', 'visualizaciones_por_campus', 
-            'visualizaciones_por_carrera', 'ultima_actualizacion'
+            'visualizaciones_por_carrera', 'serie_diaria', 'ultima_actualizacion'
+        ]
+    
+    def get_serie_diaria(self, obj):
+        """Visualizaciones por día de los últimos ``DIAS_SERIE`` días."""
+        desde = timezone.localdate() - timedelta(days=DIAS_SERIE)
+        return [
+            {'dia': dia, 'visualizaciones': n}
+            for dia, n in VisualizacionDiaria.objects.filter(
+                producto_id=obj.producto_id, dia__gte=desde
+            ).values_list('dia', 'visualizaciones')
         ]
 
 
-class ProductoListSerializer(serializers.ModelSerializer):
+class ProductoListSerializer(FavoritoAnotadoMixin, serializers.ModelSerializer):
     """Serializer simplificado para listas de productos."""
     
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
@@ -146,6 +181,7 @@ class ProductoListSerializer(serializers.ModelSerializer):
     vendedor_nombre = serializers.CharField(source='vendedor.name', read_only=True)
     campus_nombre = serializers.CharField(source='campus.nombre', read_only=True)
     es_favorito = serializers.SerializerMethodField()
+    total_favoritos = serializers.SerializerMethodField()
     
     class Meta:
         model = Producto
@@ -153,12 +189,5 @@ class ProductoListSerializer(serializers.ModelSerializer):
             'id', 'titulo', 'descripcion', 'categoria_nombre', 'categoria_icono',
             'vendedor_nombre', 'url_principal', 'tipo_enlace', 'og_image',
             'estado', 'precio', 'moneda', 'campus_nombre', 'carrera',
-            'created_at', 'visualizaciones', 'es_favorito'
+            'created_at', 'visualizaciones', 'es_favorito', 'total_favoritos'
         ]
-    
-    def get_es_favorito(self, obj):
-        """Verifica si el producto es favorito del usuario actual."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.favoritos.filter(usuario=request.user).exists()
-        return False
@@ -0,0 +1,39 @@
+"""Tareas periódicas del mercado."""
+
+from celery import shared_task
+
+from .analytics import consolidar, purgar_registro
+from .contadores import volcar
+from .models import Producto
+from .opengraph import DominioOcupado, obtener_metadatos
+
+
+@shared_task
+def volcar_contadores():
+    """Traslada a la base de datos las visualizaciones y clicks acumulados en caché."""
+    return volcar()
+
+
+@shared_task
+def consolidar_visualizaciones():
+    """Consolida el registro de visualizaciones en los analytics y purga días viejos."""
+    procesadas = consolidar()
+    purgar_registro()
+    return procesadas
+
+
+@shared_task(bind=True, max_retries=10)
+def enriquecer_opengraph(self, producto_id):
+    """Completa los campos ``og_*`` del producto a partir de su enlace principal."""
+    url = Producto.objects.filter(pk=producto_id).values_list("url_principal", flat=True).first()
+    if not url:
+        return {}
+    try:
+        metadatos = obtener_metadatos(url)
+    except DominioOcupado as exc:
+        # Otro worker está descargando del mismo sitio; se reintenta luego.
+        raise self.retry(exc=exc, countdown=2 + self.request.retries * 3)
+    if metadatos:
+        # Si el enlace cambió mientras tanto, la tarea del nuevo enlace lo resolverá.
+        Producto.objects.filter(pk=producto_id, url_principal=url).update(**metadatos)
+    return metadatos
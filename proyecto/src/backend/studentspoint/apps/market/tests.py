@@ -1,3 +1,505 @@
-from django.test import TestCase
+"""Pruebas para la app de compra/venta."""
 
-# Create your tests here.
+from unittest import mock
+
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from studentspoint.apps.campuses.models import Sede
+
+from . import analytics, contadores, opengraph
+from .analytics import SIN_CARRERA, consolidar, purgar_registro
+from .models import (
+    CategoriaProducto,
+    Producto,
+    ProductoAnalytics,
+    ProductoFavorito,
+    ProgresoRollup,
+    VisualizacionDiaria,
+    VisualizacionProducto,
+)
+from .tasks import consolidar_visualizaciones, enriquecer_opengraph, volcar_contadores
+
+
+class ContadoresDiferidosTests(APITestCase):
+    """Visualizaciones y clicks acumulados en caché y volcados en lote."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password=None)
+        self.client.force_authenticate(self.user)
+        categoria = CategoriaProducto.objects.create(nombre="Libros")
+        self.productos = [
+            Producto.objects.create(
+                vendedor=self.user,
+                titulo=f"Producto {i}",
+                descripcion="desc",
+                categoria=categoria,
+                url_principal="https://example.com/p",
+                estado=Producto.Estados.PUBLICADO,
+            )
+            for i in range(2)
+        ]
+        self.producto = self.productos[0]
+        self.ahora = 1_000_000.0
+        patcher = mock.patch.object(contadores.time, "time", side_effect=lambda: self.ahora)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _avanzar(self, ventanas):
+        self.ahora += contadores.INTERVALO * ventanas
+
+    def test_detalle_no_escribe_en_la_base(self):
+        url = f"/api/productos/{self.producto.id}/"
+        self.client.get(url)  # calienta la sesión de autenticación
+        # Una sola lectura (favoritos anotados) y ninguna escritura.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["visualizaciones"], 2)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.visualizaciones, 0)
+        self.assertFalse(ProductoAnalytics.objects.exists())
+
+    def test_volcado_suma_con_f_y_crea_analytics(self):
+        for _ in range(3):
+            self.client.get(f"/api/productos/{self.producto.id}/")
+        self.client.post(f"/api/productos/{self.producto.id}/registrar_click/")
+        self.client.get(f"/api/productos/{self.productos[1].id}/")
+
+        # La ventana recién cerrada todavía no se vuelca.
+        self._avanzar(1)
+        self.assertEqual(volcar_contadores(), 0)
+
+        self._avanzar(1)
+        # Cambio concurrente en la base: el volcado no debe pisarlo.
+        Producto.objects.filter(pk=self.producto.pk).update(visualizaciones=10)
+        # Contadores, analytics existentes, INSERT de analytics, dos UPDATE y
+        # el INSERT en lote del registro, más el savepoint de la transacción.
+        with self.assertNumQueries(8):
+            self.assertEqual(volcar_contadores(), 2)
+
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.visualizaciones, self.producto.clicks_enlace), (13, 1))
+        analytics = ProductoAnalytics.objects.get(producto=self.producto)
+        self.assertEqual((analytics.total_visualizaciones, analytics.total_clicks), (13, 1))
+        self.assertEqual(Producto.objects.get(pk=self.productos[1].pk).visualizaciones, 1)
+
+        # Lo ya volcado no se vuelve a sumar.
+        self._avanzar(3)
+        self.assertEqual(volcar_contadores(), 0)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.visualizaciones, 13)
+
+    def test_click_responde_total_con_pendientes(self):
+        Producto.objects.filter(pk=self.producto.pk).update(clicks_enlace=4)
+        url = f"/api/productos/{self.producto.id}/registrar_click/"
+        self.client.post(url)
+        self._avanzar(1)
+        response = self.client.post(url)
+        self.assertEqual(response.data["clicks_total"], 6)
+
+    def test_volcado_ignora_productos_eliminados(self):
+        self.client.get(f"/api/productos/{self.productos[1].id}/")
+        self.productos[1].delete()
+        self._avanzar(2)
+        self.assertEqual(volcar_contadores(), 0)
+        self.assertEqual(cache.get(contadores._clave_total(contadores._ventana(self.ahora) - 2, contadores._CONTADORES)), None)
+
+
+class RegistroVisualizacionesTests(APITestCase):
+    """Registro de visualizaciones por sede/carrera y su consolidación."""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.sedes = [
+            Sede.objects.create(slug=f"s{i}", nombre=f"Sede {i}", direccion="Av 1", lat=0, lng=0)
+            for i in range(2)
+        ]
+        self.vendedor = User.objects.create_user(email="vende@duocuc.cl", password=None)
+        self.lectores = [
+            User.objects.create_user(email="a@duocuc.cl", password=None, campus=self.sedes[0], career="Informática"),
+            User.objects.create_user(email="b@duocuc.cl", password=None, campus=self.sedes[1], career="Informática"),
+            User.objects.create_user(email="c@duocuc.cl", password=None, campus=self.sedes[1], career=""),
+        ]
+        self.producto = Producto.objects.create(
+            vendedor=self.vendedor,
+            titulo="Notebook",
+            descripcion="desc",
+            categoria=CategoriaProducto.objects.create(nombre="Tecnología"),
+            url_principal="https://example.com/p",
+            estado=Producto.Estados.PUBLICADO,
+        )
+        self.ahora = time.time()
+        patcher = mock.patch.object(contadores.time, "time", side_effect=lambda: self.ahora)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Salvo en la prueba del retraso, lo recién volcado se consolida al tiro.
+        patcher = mock.patch.object(analytics, "RETRASO", timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ver(self, lector, veces=1):
+        self.client.force_authenticate(lector)
+        for _ in range(veces):
+            self.client.get(f"/api/productos/{self.producto.id}/")
+
+    def _volcar(self):
+        self.ahora += contadores.INTERVALO * 2
+        volcar_contadores()
+
+    def test_volcado_inserta_segmentos_en_el_registro(self):
+        self._ver(self.lectores[0], 3)
+        self._ver(self.lectores[1])
+        self._volcar()
+        filas = sorted(VisualizacionProducto.objects.values_list("campus_id", "carrera__nombre", "cantidad"))
+        self.assertEqual(
+            filas, [(self.sedes[0].id, "Informática", 3), (self.sedes[1].id, "Informática", 1)]
+        )
+
+    def test_consolidacion_incremental(self):
+        self._ver(self.lectores[0], 2)
+        self._ver(self.lectores[2])
+        self._volcar()
+        self.assertEqual(consolidar_visualizaciones(), 2)
+
+        self._ver(self.lectores[1])
+        self._ver(self.lectores[0])
+        self._volcar()
+        self.assertEqual(consolidar(), 2)
+        # Sin filas nuevas no hay nada que hacer.
+        self.assertEqual(consolidar(), 0)
+
+        analytics = ProductoAnalytics.objects.get(producto=self.producto)
+        self.assertEqual(analytics.visualizaciones_por_campus, {"Sede 0": 3, "Sede 1": 2})
+        self.assertEqual(analytics.visualizaciones_por_carrera, {"Informática": 4, SIN_CARRERA: 1})
+        self.assertEqual(analytics.total_visualizaciones, 5)
+        serie = list(VisualizacionDiaria.objects.values_list("visualizaciones", flat=True))
+        self.assertEqual(sum(serie), 5)
+
+        self.client.force_authenticate(self.vendedor)
+        response = self.client.get(f"/api/productos/{self.producto.id}/analytics/")
+        self.assertEqual(sum(d["visualizaciones"] for d in response.data["serie_diaria"]), 5)
+
+    def test_marca_no_pasa_filas_recientes(self):
+        ahora = timezone.now()
+        hoy = timezone.localdate()
+        vieja, reciente, siguiente = VisualizacionProducto.objects.bulk_create(
+            VisualizacionProducto(dia=hoy, producto=self.producto, registrado_at=ahora - edad)
+            for edad in (timedelta(minutes=10), timedelta(seconds=5), timedelta(minutes=10))
+        )
+        with mock.patch.object(analytics, "RETRASO", timedelta(minutes=5)):
+            # ``siguiente`` es vieja, pero va detrás de una fila que aún podría
+            # tener vecinas sin confirmar: la marca queda antes de ``reciente``.
+            self.assertEqual(consolidar(ahora=ahora), 1)
+            self.assertEqual(ProgresoRollup.objects.get().ultimo_id, vieja.id)
+            self.assertEqual(consolidar(ahora=ahora + timedelta(minutes=5)), 2)
+        self.assertEqual(ProgresoRollup.objects.get().ultimo_id, siguiente.id)
+        self.assertEqual(VisualizacionDiaria.objects.get().visualizaciones, 3)
+
+    def test_recalcular_contadores_no_pisa_la_consolidacion(self):
+        analytics, _ = ProductoAnalytics.objects.get_or_create(producto=self.producto)
+        # Mientras se recalculan los contadores, el rollup fusiona otras visitas.
+        self._ver(self.lectores[0], 2)
+        self._volcar()
+        consolidar()
+        analytics.actualizar_estadisticas()
+        analytics.refresh_from_db()
+        self.assertEqual(analytics.visualizaciones_por_campus, {"Sede 0": 2})
+
+    def test_purga_solo_dias_consolidados(self):
+        viejo = timezone.localdate() - timedelta(days=200)
+        VisualizacionProducto.objects.create(dia=viejo, producto=self.producto, cantidad=4)
+        self.assertEqual(purgar_registro(), 0)
+        consolidar()
+        VisualizacionProducto.objects.create(dia=viejo, producto=self.producto, cantidad=1)
+        self.assertEqual(purgar_registro(), 1)
+        # La fila vieja aún sin consolidar se conserva.
+        self.assertEqual(VisualizacionProducto.objects.count(), 1)
+
+
+PAGINA_OG = (
+    "<html><head><title>Título HTML</title>"
+    '<meta property="og:title" content="Notebook Lenovo">'
+    '<meta property="og:image" content="https://example.com/foto.jpg">'
+    '<meta name="description" content="Usado, buen estado">'
+    "</head><body>"
+)
+
+
+class _ServidorStub(BaseHTTPRequestHandler):
+    """Servidor HTTP local que imita un sitio de ventas."""
+
+    visitas = []
+    enviados = {}
+
+    def do_GET(self):
+        type(self).visitas.append(self.path)
+        if self.path.startswith("/redirige/"):
+            destino = self.path[len("/redirige/"):]
+            self.send_response(302)
+            self.send_header("Location", destino if destino.startswith("http") else "/" + destino)
+            self.end_headers()
+            return
+        if self.path.startswith("/error"):
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(PAGINA_OG.encode())
+        if self.path.startswith("/pesado"):
+            # Cuerpo enorme: el cliente debe cortar la descarga tras ``</head>``.
+            enviados = 0
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b"<p>" + b"x" * 16 * 1024 + b"</p>")
+                    enviados += 16 * 1024
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            type(self).enviados[self.path] = enviados
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenGraphParserTests(SimpleTestCase):
+    def test_normalizar_url(self):
+        self.assertEqual(
+            opengraph.normalizar_url("HTTPS://Yapo.CL/item/123/?utm_source=fb&b=2&a=1#fotos"),
+            "https://yapo.cl/item/123?a=1&b=2",
+        )
+
+    def test_normalizar_url_solo_descarta_parametros_de_seguimiento(self):
+        self.assertEqual(
+            opengraph.normalizar_url("https://yapo.cl/item?ref=home&reference=7&refId=2&utm_medium=x&fbclid=1"),
+            "https://yapo.cl/item?refId=2&reference=7",
+        )
+
+    def test_imagen_demasiado_larga_se_descarta(self):
+        parser = opengraph.ParserHead()
+        parser.feed(f"<head><meta property='og:image' content='https://cdn.example.com/{'x' * 300}.jpg'>")
+        parser.feed("<meta property='og:title' content='Mochila'></head>")
+        self.assertEqual(parser.resultado(), {"og_title": "Mochila"})
+
+    def _respuesta(self, bloques, content_type="text/html"):
+        response = mock.Mock(headers={"Content-Type": content_type}, encoding="ISO-8859-1")
+        response.iter_content.return_value = iter(bloques)
+        return response
+
+    def test_utf8_sin_charset_en_cabecera(self):
+        html = "<html><head><title>Mochila ñandú</title></head>".encode()
+        self.assertEqual(opengraph.leer_head(self._respuesta([html])), {"og_title": "Mochila ñandú"})
+
+    def test_charset_de_meta_y_caracter_partido_entre_bloques(self):
+        html = '<head><meta charset="utf-8"><title>Cañón</title></head>'.encode()
+        corte = html.index("ñ".encode()) + 1
+        self.assertEqual(
+            opengraph.leer_head(self._respuesta([html[:corte], html[corte:]])), {"og_title": "Cañón"}
+        )
+
+    def test_inicio_ascii_no_fija_la_codificacion(self):
+        html = ("<head>" + " " * 20 + "<title>Mochila ñandú</title></head>").encode()
+        self.assertEqual(
+            opengraph.leer_head(self._respuesta([html[:20], html[20:]])), {"og_title": "Mochila ñandú"}
+        )
+
+    def test_charset_de_la_cabecera(self):
+        html = "<head><title>Mochila ñandú</title></head>".encode("latin-1")
+        respuesta = self._respuesta([html], "text/html; charset=ISO-8859-1")
+        self.assertEqual(opengraph.leer_head(respuesta), {"og_title": "Mochila ñandú"})
+
+    def test_parser_usa_fallback_html(self):
+        parser = opengraph.ParserHead()
+        parser.feed("<head><title> Solo título </title><meta name='description' content='desc'>")
+        parser.feed("</head><body><meta property='og:title' content='ignorado'>")
+        self.assertTrue(parser.terminado)
+        self.assertEqual(parser.resultado(), {"og_title": "Solo título", "og_description": "desc"})
+
+
+@override_settings(MARKET_OG_REDES_PERMITIDAS=["127.0.0.1/32"])
+class OpenGraphEnriquecimientoTests(APITestCase):
+    """Pipeline de enriquecimiento contra un servidor HTTP local."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ServidorStub)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.servidor.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        _ServidorStub.visitas = []
+        self.user = get_user_model().objects.create_user(email="vende@duocuc.cl", password=None)
+        self.client.force_authenticate(self.user)
+        self.categoria = CategoriaProducto.objects.create(nombre="Tecnología")
+
+    def test_metadatos_se_cachean_por_url_normalizada(self):
+        esperado = {
+            "og_title": "Notebook Lenovo",
+            "og_image": "https://example.com/foto.jpg",
+            "og_description": "Usado, buen estado",
+        }
+        self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/item/1?utm_source=fb"), esperado)
+        self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/item/1/"), esperado)
+        self.assertEqual(_ServidorStub.visitas, ["/item/1?utm_source=fb"])
+
+    def test_solo_lee_el_head(self):
+        metadatos = opengraph.obtener_metadatos(f"{self.base}/pesado")
+        self.assertEqual(metadatos["og_title"], "Notebook Lenovo")
+        for _ in range(50):
+            if "/pesado" in _ServidorStub.enviados:
+                break
+            time.sleep(0.05)
+        # El servidor tenía 16 MB de cuerpo; el cliente cortó mucho antes.
+        self.assertLess(_ServidorStub.enviados["/pesado"], 4 * 1024 * 1024)
+
+    def test_fallo_devuelve_vacio(self):
+        self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/error"), {})
+
+    def test_destinos_no_publicos_se_rechazan(self):
+        with self.settings(MARKET_OG_REDES_PERMITIDAS=[]):
+            self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/item/4"), {})
+            self.assertEqual(opengraph.obtener_metadatos("http://169.254.169.254/latest/meta-data/"), {})
+            self.assertEqual(opengraph.obtener_metadatos("file:///etc/passwd"), {})
+        self.assertEqual(_ServidorStub.visitas, [])
+
+    def test_redirecciones_se_revisan_en_cada_salto(self):
+        self.assertEqual(
+            opengraph.obtener_metadatos(f"{self.base}/redirige/redirige/item/5")["og_title"], "Notebook Lenovo"
+        )
+        self.assertEqual(
+            opengraph.obtener_metadatos(f"{self.base}/redirige/http://169.254.169.254/latest/meta-data/"), {}
+        )
+        self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/redirige/http://10.0.0.1/"), {})
+        bucle = "/redirige" * (opengraph.MAX_REDIRECCIONES + 1) + "/item/6"
+        self.assertEqual(opengraph.obtener_metadatos(self.base + bucle), {})
+        self.assertNotIn("/item/6", _ServidorStub.visitas)
+
+    def test_https_valida_el_certificado_del_dominio(self):
+        request = requests.Request("GET", "https://93.184.215.14/item", headers={"Host": "yapo.cl"}).prepare()
+        _, pool_kwargs = opengraph.sesion().get_adapter(request.url).build_connection_pool_key_attributes(
+            request, True
+        )
+        self.assertEqual(pool_kwargs["server_hostname"], "yapo.cl")
+        self.assertEqual(pool_kwargs["assert_hostname"], "yapo.cl")
+
+    def test_limite_por_dominio(self):
+        with opengraph.cupo_dominio("127.0.0.1"), opengraph.cupo_dominio("127.0.0.1"):
+            with self.assertRaises(opengraph.DominioOcupado):
+                opengraph.obtener_metadatos(f"{self.base}/item/2")
+            # Otro dominio no se ve afectado.
+            with opengraph.cupo_dominio("yapo.cl"):
+                pass
+        self.assertEqual(opengraph.obtener_metadatos(f"{self.base}/item/2")["og_title"], "Notebook Lenovo")
+
+    def test_crear_y_editar_producto_programan_enriquecimiento(self):
+        with mock.patch.object(enriquecer_opengraph, "delay", side_effect=enriquecer_opengraph) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/api/productos/",
+                    {
+                        "titulo": "Notebook",
+                        "descripcion": "Lenovo",
+                        "categoria": self.categoria.id,
+                        "url_principal": f"{self.base}/item/3",
+                    },
+                    format="json",
+                )
+            self.assertEqual(response.status_code, 201)
+            producto = Producto.objects.get()
+            self.assertEqual(producto.og_title, "Notebook Lenovo")
+            self.assertEqual(delay.call_count, 1)
+            Producto.objects.filter(pk=producto.pk).update(estado=Producto.Estados.PUBLICADO)
+
+            # Editar sin cambiar el enlace no vuelve a descargar.
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f"/api/productos/{producto.id}/", {"precio": 1000}, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(delay.call_count, 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    f"/api/productos/{producto.id}/", {"url_principal": f"{self.base}/error"}, format="json"
+                )
+            self.assertEqual(response.status_code, 200)
+            producto.refresh_from_db()
+            self.assertEqual(producto.og_title, "")
+            self.assertEqual(_ServidorStub.visitas, ["/item/3", "/error"])
+
+
+class FavoritosAnotadosTests(APITestCase):
+    """``es_favorito`` y ``total_favoritos`` sin consultas por fila."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password=None)
+        self.otros = [User.objects.create_user(email=f"o{i}@duocuc.cl", password=None) for i in range(3)]
+        self.client.force_authenticate(self.user)
+        categoria = CategoriaProducto.objects.create(nombre="Libros")
+        self.productos = [
+            Producto.objects.create(
+                vendedor=self.otros[0],
+                titulo=f"Producto {i}",
+                descripcion="desc",
+                categoria=categoria,
+                url_principal="https://example.com/p",
+                estado=Producto.Estados.PUBLICADO,
+            )
+            for i in range(6)
+        ]
+        # Producto i tiene i % 4 favoritos de otros usuarios; además el
+        # usuario marcó los pares.
+        for i, producto in enumerate(self.productos):
+            for otro in self.otros[: i % 4]:
+                ProductoFavorito.objects.create(usuario=otro, producto=producto)
+            if i % 2 == 0:
+                ProductoFavorito.objects.create(usuario=self.user, producto=producto)
+        self.esperado = {
+            p.id: (p.favoritos.filter(usuario=self.user).exists(), p.favoritos.count())
+            for p in self.productos
+        }
+        self.client.get("/api/productos/")  # calienta la sesión de autenticación
+
+    def test_listado_con_consultas_fijas(self):
+        # COUNT de la paginación + página con favoritos anotados.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/productos/")
+        obtenido = {p["id"]: (p["es_favorito"], p["total_favoritos"]) for p in response.data["results"]}
+        self.assertEqual(obtenido, self.esperado)
+
+    def test_detalle(self):
+        producto = self.productos[2]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/productos/{producto.id}/")
+        self.assertEqual(
+            (response.data["es_favorito"], response.data["total_favoritos"]), self.esperado[producto.id]
+        )
+
+    def test_mis_favoritos(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/productos/mis_favoritos/")
+        obtenido = {
+            f["producto"]["id"]: (f["producto"]["es_favorito"], f["producto"]["total_favoritos"])
+            for f in response.data
+        }
+        self.assertEqual(obtenido, {pid: v for pid, v in self.esperado.items() if v[0]})
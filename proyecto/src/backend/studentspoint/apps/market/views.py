@@ -1,7 +1,7 @@
 """Views para el sistema de compra/venta."""
 
-import requests
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
@@ -9,6 +9,9 @@ from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
+from studentspoint.apps.search.indice import buscar
+
+from . import contadores, opengraph
 from .models import (
     CategoriaProducto, Producto, ProductoFavorito, 
     ProductoReporte, ProductoAnalytics
@@ -18,6 +21,7 @@ from .serializers import (
     ProductoFavoritoSerializer, ProductoReporteSerializer, 
     ProductoAnalyticsSerializer, ProductoListSerializer
 )
+from .tasks import enriquecer_opengraph
 
 
 class CategoriaProductoViewSet(viewsets.ReadOnlyModelViewSet):
@@ -38,7 +42,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         """Filtra productos según el usuario y parámetros."""
         queryset = Producto.objects.select_related(
             'categoria', 'vendedor', 'campus'
-        ).prefetch_related('favoritos')
+        ).con_favoritos(self.request.user)
         
         # Filtros básicos
         estado = self.request.query_params.get('estado')
@@ -57,18 +61,15 @@ class ProductoViewSet(viewsets.ModelViewSet):
         if carrera:
             queryset = queryset.filter(carrera__icontains=carrera)
         
-        # Búsqueda
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(titulo__icontains=search) | 
-                Q(descripcion__icontains=search)
-            )
-        
         # Solo productos activos por defecto
         if not estado:
             queryset = queryset.filter(estado=Producto.Estados.PUBLICADO)
         
+        # Búsqueda de texto completo ordenada por relevancia
+        search = self.request.query_params.get('search')
+        if search:
+            return buscar(queryset, 'producto', search).order_by('-relevancia', '-created_at')
+        
         return queryset.order_by('-created_at')
     
     def get_serializer_class(self):
@@ -81,22 +82,35 @@ class ProductoViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Crea un nuevo producto."""
-        serializer.save()
+        producto = serializer.save()
+        self._programar_opengraph(producto)
+    
+    def perform_update(self, serializer):
+        """Actualiza el producto y refresca sus metadatos si cambió el enlace."""
+        anterior = serializer.instance.url_principal
+        if serializer.validated_data.get('url_principal', anterior) != anterior:
+            # Los metadatos del enlace anterior ya no aplican.
+            producto = serializer.save(**dict.fromkeys(opengraph.CAMPOS, ''))
+        else:
+            producto = serializer.save()
+        if producto.url_principal != anterior or not producto.og_title:
+            self._programar_opengraph(producto)
+    
+    @staticmethod
+    def _programar_opengraph(producto):
+        """Encola el enriquecimiento OpenGraph cuando el producto ya está guardado."""
+        transaction.on_commit(lambda: enriquecer_opengraph.delay(producto.pk))
     
     def retrieve(self, request, *args, **kwargs):
         """Obtiene un producto y registra la visualización."""
         instance = self.get_object()
         
-        # Incrementar visualizaciones
-        instance.visualizaciones += 1
-        instance.save()
-        
-        # Actualizar analytics
-        try:
-            analytics = instance.analytics
-            analytics.actualizar_estadisticas()
-        except ProductoAnalytics.DoesNotExist:
-            ProductoAnalytics.objects.create(producto=instance)
+        # La visualización se acumula en caché y se vuelca en lote;
+        # la respuesta ya incluye los incrementos pendientes.
+        contadores.registrar_visualizacion(
+            instance.pk, request.user.campus_id, request.user.career
+        )
+        contadores.aplicar_pendientes(instance)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -135,15 +149,8 @@ class ProductoViewSet(viewsets.ModelViewSet):
     def registrar_click(self, request, pk=None):
         """Registra un click en el enlace del producto."""
         producto = self.get_object()
-        producto.clicks_enlace += 1
-        producto.save()
-        
-        # Actualizar analytics
-        try:
-            analytics = producto.analytics
-            analytics.actualizar_estadisticas()
-        except ProductoAnalytics.DoesNotExist:
-            ProductoAnalytics.objects.create(producto=producto)
+        contadores.registrar_click(producto.pk)
+        contadores.aplicar_pendientes(producto)
         
         return Response({'clicks_total': producto.clicks_enlace})
     
@@ -154,9 +161,20 @@ class ProductoViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def mis_favoritos(self, request):
         """Obtiene los productos favoritos del usuario."""
+        total = ProductoFavorito.objects.filter(
+            producto=OuterRef('producto')
+        ).order_by().values('producto').annotate(n=Count('id')).values('n')
         favoritos = ProductoFavorito.objects.filter(
             usuario=request.user
-        ).select_related('producto__categoria', 'producto__vendedor', 'producto__campus')
+        ).select_related(
+            'producto__categoria', 'producto__vendedor', 'producto__campus'
+        ).annotate(total_favoritos_producto=Subquery(total))
+        
+        # Todos son favoritos del usuario; el total ya viene en la misma consulta.
+        favoritos = list(favoritos)
+        for favorito in favoritos:
+            favorito.producto.es_favorito = True
+            favorito.producto.total_favoritos = favorito.total_favoritos_producto
         
         serializer = ProductoFavoritoSerializer(favoritos, many=True, context={'request': request})
         return Response(serializer.data)
@@ -170,7 +188,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         """Obtiene los productos del usuario."""
         productos = Producto.objects.filter(
             vendedor=request.user
-        ).select_related('categoria', 'campus').prefetch_related('favoritos')
+        ).select_related('categoria', 'vendedor', 'campus').con_favoritos(request.user)
         
         serializer = ProductoListSerializer(productos, many=True, context={'request': request})
         return Response(serializer.data)
@@ -276,52 +294,3 @@ class ProductoAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(producto__vendedor=self.request.user)
         
         return queryset
-
-
-# Funciones auxiliares para OpenGraph
-def obtener_metadatos_opengraph(url):
-    """Obtiene metadatos OpenGraph de una URL."""
-    try:
-        response = requests.get(url, timeout=10, headers={
-            'User-Agent': 'Mozilla/5.0 (compatible; DuocPoint/1.0)'
-        })
-        response.raise_for_status()
-        
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        metadatos = {}
-        
-        # Obtener metadatos OpenGraph
-        og_title = soup.find('meta', property='og:title')
-        if og_title:
-            metadatos['og_title'] = og_title.get('content', '')[:200]
-        
-        og_description = soup.find('meta', property='og:description')
-        if og_description:
-            metadatos['og_description'] = og_description.get('content', '')[:500]
-        
-        og_image = soup.find('meta', property='og:image')
-        if og_image:
-            metadatos['og_image'] = og_image.get('content', '')
-        
-        og_site_name = soup.find('meta', property='og:site_name')
-        if og_site_name:
-            metadatos['og_site_name'] = og_site_name.get('content', '')[:100]
-        
-        # Fallback a metadatos HTML estándar
-        if not metadatos.get('og_title'):
-            title = soup.find('title')
-            if title:
-                metadatos['og_title'] = title.get_text()[:200]
-        
-        if not metadatos.get('og_description'):
-            description = soup.find('meta', attrs={'name': 'description'})
-            if description:
-                metadatos['og_description'] = description.get('content', '')[:500]
-        
-        return metadatos
-        
-    except Exception as e:
-        print(f"Error obteniendo metadatos de {url}: {e}")
-        return {}
\ No newline at end of file
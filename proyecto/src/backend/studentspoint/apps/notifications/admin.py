@@ -2,10 +2,16 @@
 
 from django.contrib import admin
 
-from .models import PushSub
+from .models import AlertaClase, PushSub
 
 
 @admin.register(PushSub)
 class PushSubAdmin(admin.ModelAdmin):
     list_display = ("usuario", "endpoint", "activo", "created_at")
     readonly_fields = ("created_at",)
+
+
+@admin.register(AlertaClase)
+class AlertaClaseAdmin(admin.ModelAdmin):
+    list_display = ("horario", "usuario", "clase_at", "dispara_at")
+    list_select_related = ("horario", "usuario")
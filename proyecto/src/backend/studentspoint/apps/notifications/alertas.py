@@ -0,0 +1,124 @@
+"""Avisos de clase con una fila de "próxima alerta" por bloque de horario.
+
+En vez de encolar una tarea con ETA por cada clase de los próximos 30 días
+(decenas de mensajes por estudiante esperando en el broker, duplicados
+en cada reimportación), cada :class:`Horario` tiene una :class:`AlertaClase`
+con la hora de su próximo aviso.
+
+* :func:`programar` crea o corrige las alertas con ``bulk_create`` y upsert
+  sobre ``horario``: reimportar un horario no duplica avisos.
+* La tarea periódica ``despachar_alertas_clase`` llama cada minuto a
+  :func:`despachar`, que toma las alertas vencidas por lotes usando el
+  índice de ``dispara_at``, encola un envío por lote y mueve cada alerta a
+  la clase de la semana siguiente en la misma transacción.
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+
+import pytz
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from studentspoint.apps.schedules.models import Horario
+
+from .models import AlertaClase
+
+ZONA = pytz.timezone("America/Santiago")
+ANTICIPACION = timedelta(minutes=20)
+TAMANO_LOTE = 500
+
+
+def proxima_clase(dia_semana: int, inicio, despues: datetime) -> datetime:
+    """Inicio de la próxima clase cuyo aviso cae después de ``despues``."""
+    local = despues.astimezone(ZONA)
+    dia = local.date() + timedelta(days=(dia_semana - local.weekday()) % 7)
+    while True:
+        clase = ZONA.localize(datetime.combine(dia, inicio))
+        if clase - ANTICIPACION > despues:
+            return clase
+        dia += timedelta(days=7)
+
+
+def _proximas(ahora):
+    """:func:`proxima_clase` memorizada para ``ahora``: hay pocos bloques distintos."""
+    return lru_cache(maxsize=None)(lambda dia_semana, inicio: proxima_clase(dia_semana, inicio, ahora))
+
+
+def _alerta(horario_id, usuario_id, clase) -> AlertaClase:
+    return AlertaClase(
+        horario_id=horario_id, usuario_id=usuario_id, clase_at=clase, dispara_at=clase - ANTICIPACION
+    )
+
+
+def _guardar(alertas) -> int:
+    AlertaClase.objects.bulk_create(
+        alertas,
+        update_conflicts=True,
+        unique_fields=["horario"],
+        update_fields=["usuario", "clase_at", "dispara_at"],
+        batch_size=TAMANO_LOTE,
+    )
+    return len(alertas)
+
+
+def programar(usuario_ids=None, ahora=None) -> int:
+    """Recalcula la alerta de cada horario de ``usuario_ids`` (o de todos)."""
+    ahora = ahora or timezone.now()
+    horarios = Horario.objects.order_by()
+    if usuario_ids is not None:
+        horarios = horarios.filter(usuario_id__in=usuario_ids)
+    proxima = _proximas(ahora)
+    total = 0
+    lote = []
+    filas = horarios.values_list("id", "usuario_id", "dia_semana", "inicio").iterator(chunk_size=TAMANO_LOTE)
+    for horario_id, usuario_id, dia_semana, inicio in filas:
+        lote.append(_alerta(horario_id, usuario_id, proxima(dia_semana, inicio)))
+        if len(lote) == TAMANO_LOTE:
+            total += _guardar(lote)
+            lote = []
+    if lote:
+        total += _guardar(lote)
+    return total
+
+
+def despachar(encolar, ahora=None) -> int:
+    """Encola los avisos vencidos y adelanta sus alertas a la semana siguiente.
+
+    ``encolar`` recibe la lista de ids de horario de cada lote. Las alertas
+    cuya clase ya empezó (por ejemplo, si la tarea estuvo detenida) se
+    adelantan sin avisar. Devuelve la cantidad de avisos encolados.
+    """
+    ahora = ahora or timezone.now()
+    vencidas = AlertaClase.objects.filter(dispara_at__lte=ahora).order_by("dispara_at")
+    proxima = _proximas(ahora)
+    total = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                vencidas.select_for_update(skip_locked=True, of=("self",))
+                .values_list("id", "horario_id", "clase_at", "horario__dia_semana", "horario__inicio")
+                [:TAMANO_LOTE]
+            )
+            if not lote:
+                return total
+            avisos = [str(horario_id) for _, horario_id, clase_at, _, _ in lote if clase_at > ahora]
+            siguientes = []
+            for id_, _, _, dia_semana, inicio in lote:
+                clase = proxima(dia_semana, inicio)
+                siguientes.append(AlertaClase(id=id_, clase_at=clase, dispara_at=clase - ANTICIPACION))
+            AlertaClase.objects.bulk_update(siguientes, ["clase_at", "dispara_at"])
+            if avisos:
+                transaction.on_commit(partial(encolar, avisos))
+            total += len(avisos)
+
+
+def _al_guardar_horario(sender, instance, **kwargs):
+    inicio = Horario._meta.get_field("inicio").to_python(instance.inicio)
+    clase = proxima_clase(instance.dia_semana, inicio, timezone.now())
+    _guardar([_alerta(instance.pk, instance.usuario_id, clase)])
+
+
+def conectar_senales() -> None:
+    post_save.connect(_al_guardar_horario, sender=Horario, dispatch_uid="notifications-alerta-horario")
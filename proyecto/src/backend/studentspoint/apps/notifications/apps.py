@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'studentspoint.apps.notifications'
+
+    def ready(self):
+        from . import alertas, bandeja
+
+        alertas.conectar_senales()
+        bandeja.conectar_senales()
@@ -0,0 +1,119 @@
+"""Bandeja de notificaciones de un usuario: propias y difundidas.
+
+Las dos fuentes se leen con sus índices ``(usuario, -created_at)`` en el
+mismo orden ``(created_at, id de notificación)`` descendente; una página
+toma hasta ``tamano + 1`` filas de cada una a continuación del cursor y
+las mezcla. El cursor es la clave de la última notificación entregada,
+así que la página N cuesta lo mismo que la primera (ver
+:class:`.pagination.BandejaPagination`).
+
+El contador de no leídas del ícono de la campana se guarda en caché por
+usuario. Se calcula con los índices ``(usuario, leida)`` solo cuando no
+está en caché y se mantiene al día después de cada commit:
+
+* una notificación propia nueva lo incrementa (señal ``post_save``);
+* una difusión borra los contadores de sus destinatarios, por lotes;
+* marcar una como leída lo decrementa solo si estaba sin leer;
+* marcar todas lo deja en cero.
+"""
+
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+from .models import Notificacion, NotificacionDestinatario
+
+TAMANO_PAGINA = 20
+TTL_NO_LEIDAS = 60 * 60
+
+
+def _despues_de(cursor, campo_id) -> Q:
+    creada, notificacion_id = cursor
+    return Q(created_at__lt=creada) | Q(created_at=creada, **{f"{campo_id}__lt": notificacion_id})
+
+
+def pagina(usuario, cursor=None, tamano=TAMANO_PAGINA):
+    """``(notificaciones, hay_mas)`` de la bandeja de ``usuario`` después de ``cursor``.
+
+    ``cursor`` es ``(created_at, id)`` de la última notificación de la
+    página anterior. En las difundidas, ``leida`` es la del destinatario.
+    """
+    propias = Notificacion.objects.filter(usuario=usuario).order_by("-created_at", "-id")
+    difundidas = (
+        NotificacionDestinatario.objects.filter(usuario=usuario)
+        .select_related("notificacion").order_by("-created_at", "-notificacion_id")
+    )
+    if cursor is not None:
+        propias = propias.filter(_despues_de(cursor, "id"))
+        difundidas = difundidas.filter(_despues_de(cursor, "notificacion_id"))
+    notificaciones = list(propias[: tamano + 1])
+    for entrega in difundidas[: tamano + 1]:
+        entrega.notificacion.leida = entrega.leida
+        notificaciones.append(entrega.notificacion)
+    notificaciones.sort(key=lambda n: (n.created_at, n.id), reverse=True)
+    return notificaciones[:tamano], len(notificaciones) > tamano
+
+
+def clave_no_leidas(usuario_id) -> str:
+    return f"notifications:no_leidas:{usuario_id}"
+
+
+def no_leidas(usuario_id) -> int:
+    """Notificaciones sin leer de ``usuario_id``, desde la caché si está."""
+    clave = clave_no_leidas(usuario_id)
+    total = cache.get(clave)
+    if total is None:
+        total = (
+            Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+            + NotificacionDestinatario.objects.filter(usuario_id=usuario_id, leida=False).count()
+        )
+        cache.set(clave, total, TTL_NO_LEIDAS)
+    return total
+
+
+def _sumar(usuario_id, delta) -> None:
+    try:
+        cache.incr(clave_no_leidas(usuario_id), delta)
+    except ValueError:  # sin contador en caché: se calculará al pedirlo
+        pass
+
+
+def ajustar_no_leidas(usuario_id, delta) -> None:
+    """Suma ``delta`` al contador de ``usuario_id`` cuando se confirme la transacción."""
+    transaction.on_commit(partial(_sumar, usuario_id, delta))
+
+
+def olvidar_no_leidas(usuario_ids) -> None:
+    """Descarta los contadores de ``usuario_ids`` cuando se confirme la transacción."""
+    claves = [clave_no_leidas(usuario_id) for usuario_id in usuario_ids]
+    transaction.on_commit(partial(cache.delete_many, claves))
+
+
+def marcar_leida(usuario, notificacion_id) -> bool:
+    """Marca ``notificacion_id`` como leída para ``usuario``; ``False`` si no es suya."""
+    propias = Notificacion.objects.filter(id=notificacion_id, usuario=usuario)
+    difundidas = NotificacionDestinatario.objects.filter(notificacion_id=notificacion_id, usuario=usuario)
+    marcadas = propias.filter(leida=False).update(leida=True) or difundidas.filter(leida=False).update(leida=True)
+    if marcadas:
+        ajustar_no_leidas(usuario.pk, -marcadas)
+        return True
+    return propias.exists() or difundidas.exists()
+
+
+def marcar_todas(usuario) -> None:
+    """Marca como leídas todas las notificaciones de ``usuario``."""
+    Notificacion.objects.filter(usuario=usuario, leida=False).update(leida=True)
+    NotificacionDestinatario.objects.filter(usuario=usuario, leida=False).update(leida=True)
+    transaction.on_commit(partial(cache.set, clave_no_leidas(usuario.pk), 0, TTL_NO_LEIDAS))
+
+
+def _al_crear_notificacion(sender, instance, created, **kwargs):
+    if created and instance.usuario_id is not None and not instance.leida:
+        ajustar_no_leidas(instance.usuario_id, 1)
+
+
+def conectar_senales() -> None:
+    post_save.connect(_al_crear_notificacion, sender=Notificacion, dispatch_uid="notifications-no-leidas")
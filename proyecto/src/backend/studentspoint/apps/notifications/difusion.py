@@ -0,0 +1,89 @@
+"""Notificaciones masivas: un cuerpo y una fila compacta por destinatario.
+
+Avisar a "todos los estudiantes de la sede X / carrera Y" guarda una sola
+:class:`Notificacion` (sin ``usuario``) y una
+:class:`NotificacionDestinatario` por persona, insertadas con
+``bulk_create`` por lotes mientras se leen los ids de usuario con un
+iterador; nunca se cargan los usuarios completos. Los contadores de no
+leídas de cada lote se descartan de la caché (ver :mod:`.bandeja`).
+
+El push se reparte después del commit: ``repartir_difusion`` recorre los
+destinatarios pendientes en rangos de id y encola un ``enviar_difusion``
+por rango, que envía con el motor de :mod:`.push` y marca el rango como
+entregado con un ``UPDATE``. Si una tarea se reintenta, los destinatarios
+ya entregados no se vuelven a avisar.
+"""
+
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .bandeja import olvidar_no_leidas
+from .models import Notificacion, NotificacionDestinatario, PushSub
+from .push import motor
+
+TAMANO_LOTE = 2000
+TAMANO_ENVIO = 500
+
+
+def usuarios_para(sede_id=None, carrera=None):
+    """Usuarios activos de ``sede_id`` y ``carrera`` (``None`` o vacío = todas)."""
+    usuarios = get_user_model().objects.filter(is_active=True)
+    if sede_id is not None:
+        usuarios = usuarios.filter(campus_id=sede_id)
+    if carrera:
+        usuarios = usuarios.filter(career=carrera)
+    return usuarios
+
+
+def _lotes(valores, tamano):
+    valores = iter(valores)
+    while lote := list(islice(valores, tamano)):
+        yield lote
+
+
+def difundir(usuarios, titulo, mensaje, tipo="info", data_extra=None, push=True) -> Notificacion:
+    """Crea una notificación para todos los ``usuarios`` (queryset) y programa el push."""
+    with transaction.atomic():
+        notificacion = Notificacion.objects.create(
+            usuario=None, titulo=titulo, mensaje=mensaje, tipo=tipo, data_extra=data_extra or {}
+        )
+        ids = usuarios.order_by().values_list("id", flat=True).iterator(chunk_size=TAMANO_LOTE)
+        for lote in _lotes(ids, TAMANO_LOTE):
+            NotificacionDestinatario.objects.bulk_create(
+                NotificacionDestinatario(
+                    notificacion=notificacion, usuario_id=usuario_id, created_at=notificacion.created_at
+                )
+                for usuario_id in lote
+            )
+            olvidar_no_leidas(lote)
+        if push:
+            from .tasks import repartir_difusion
+
+            transaction.on_commit(lambda: repartir_difusion.delay(str(notificacion.pk)))
+    return notificacion
+
+
+def rangos(notificacion_id, tamano=TAMANO_ENVIO):
+    """``(desde, hasta)`` de ids de destinatarios pendientes, de a ``tamano``."""
+    ids = (
+        NotificacionDestinatario.objects.filter(notificacion_id=notificacion_id, entregada=False)
+        .order_by("id").values_list("id", flat=True).iterator(chunk_size=TAMANO_LOTE)
+    )
+    for lote in _lotes(ids, tamano):
+        yield lote[0], lote[-1]
+
+
+def enviar(notificacion_id, desde, hasta):
+    """Envía el push a los destinatarios pendientes del rango y los marca entregados."""
+    notificacion = Notificacion.objects.get(pk=notificacion_id)
+    pendientes = NotificacionDestinatario.objects.filter(
+        notificacion_id=notificacion_id, id__range=(desde, hasta), entregada=False
+    )
+    subs = PushSub.objects.filter(usuario_id__in=pendientes.values("usuario_id"), activo=True)
+    payload = json.dumps({"title": notificacion.titulo, "body": notificacion.mensaje})
+    resultado = motor().enviar((sub, payload) for sub in subs)
+    pendientes.update(entregada=True)
+    return resultado
@@ -0,0 +1,91 @@
+import time
+from datetime import datetime, time as hora, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from studentspoint.apps.notifications import alertas
+from studentspoint.apps.notifications.models import AlertaClase
+from studentspoint.apps.schedules.models import Horario
+
+BLOQUES = [hora(8, 30), hora(10, 0), hora(11, 30), hora(14, 0), hora(15, 30), hora(17, 0)]
+
+
+def _mensajes_anteriores(usuario_ids, hoy) -> int:
+    """Tareas con ETA que encolaba ``schedule_class_alerts`` antes (una por clase en 30 días)."""
+    mensajes = 0
+    for usuario_id in usuario_ids:
+        for horario in Horario.objects.filter(usuario_id=usuario_id):
+            for i in range(30):
+                if (hoy + timedelta(days=i)).weekday() == horario.dia_semana:
+                    mensajes += 1
+    return mensajes
+
+
+class Command(BaseCommand):
+    help = "Mide la programación y el despacho de avisos de clase para muchos estudiantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--estudiantes", type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        estudiantes = User.objects.bulk_create(
+            (User(email=f"bench-alertas-{i}@duocuc.cl") for i in range(options["estudiantes"])),
+            batch_size=2000,
+        )
+        try:
+            self._ejecutar(estudiantes)
+        finally:
+            User.objects.filter(pk__in=[e.pk for e in estudiantes]).delete()
+
+    def _ejecutar(self, estudiantes):
+        # Horarios cargados en bloque, como una importación masiva (sin señales).
+        Horario.objects.bulk_create(
+            (
+                Horario(
+                    usuario=estudiante, dia_semana=(i + k) % 5, inicio=inicio,
+                    fin=hora(inicio.hour + 1, inicio.minute), asignatura=f"Asignatura {k}",
+                )
+                for i, estudiante in enumerate(estudiantes)
+                for k, inicio in enumerate(BLOQUES)
+            ),
+            batch_size=5000,
+        )
+        ids = [e.pk for e in estudiantes]
+        self.stdout.write(f"  {len(ids)} estudiantes, {len(ids) * len(BLOQUES)} bloques")
+
+        lunes = alertas.ZONA.localize(datetime(2026, 10, 19))
+        inicio = time.perf_counter()
+        anteriores = _mensajes_anteriores(ids, lunes.date())
+        self.stdout.write(
+            f"  anterior   {time.perf_counter() - inicio:6.2f} s  {anteriores} tareas con ETA en el broker"
+        )
+
+        for intento in ("programar", "reimportar"):
+            inicio = time.perf_counter()
+            filas = alertas.programar(ids, ahora=lunes)
+            self.stdout.write(
+                f"  {intento:10} {time.perf_counter() - inicio:6.2f} s  {filas} filas, "
+                f"{AlertaClase.objects.filter(usuario_id__in=ids).count()} alertas"
+            )
+
+        lotes = []
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        # Minuto pico: los avisos de las 08:30 del lunes.
+        pico = lunes + timedelta(hours=8, minutes=10)
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            avisos = alertas.despachar(lotes.append, ahora=pico)
+            duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f"  despachar  {duracion:6.2f} s  {avisos} avisos en {len(lotes)} lotes, {consultas} consultas"
+        )
+        self.stdout.write(f"  repetido   {alertas.despachar(lotes.append, ahora=pico)} avisos")
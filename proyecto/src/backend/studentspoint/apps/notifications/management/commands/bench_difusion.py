@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.notifications import difusion
+from studentspoint.apps.notifications.models import Notificacion
+
+CARRERA = "Ingeniería en Informática"
+
+
+def _difusion_anterior(usuarios, titulo, mensaje) -> int:
+    """Una ``Notificacion`` por usuario, como se haría sin difusiones."""
+    creadas = 0
+    with transaction.atomic():
+        for usuario in usuarios:
+            Notificacion.objects.create(usuario=usuario, titulo=titulo, mensaje=mensaje, tipo="info")
+            creadas += 1
+    return creadas
+
+
+class Command(BaseCommand):
+    help = "Mide una difusión a todos los estudiantes de una sede y carrera"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--destinatarios", type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        sede = Sede.objects.create(slug="bench-difusion", nombre="Bench Difusión", direccion="-", lat=0, lng=0)
+        User.objects.bulk_create(
+            (
+                User(email=f"bench-difusion-{i}@duocuc.cl", campus=sede, career=CARRERA)
+                for i in range(options["destinatarios"])
+            ),
+            batch_size=2000,
+        )
+        try:
+            self._ejecutar(difusion.usuarios_para(sede.id, CARRERA))
+        finally:
+            Notificacion.objects.filter(titulo__startswith="Bench").delete()
+            User.objects.filter(campus=sede).delete()
+            sede.delete()
+
+    def _ejecutar(self, usuarios):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        for nombre in ("anterior", "difundir"):
+            consultas = 0
+            with connection.execute_wrapper(contar):
+                inicio = time.perf_counter()
+                if nombre == "anterior":
+                    filas = _difusion_anterior(usuarios.iterator(), "Bench", "Corte de agua")
+                else:
+                    notificacion = difusion.difundir(usuarios, "Bench", "Corte de agua", push=False)
+                    filas = notificacion.destinatarios.count()
+                duracion = time.perf_counter() - inicio
+            self.stdout.write(f"  {nombre:9} {duracion:6.2f} s  {filas} destinatarios, {consultas} consultas")
+
+        inicio = time.perf_counter()
+        rangos = list(difusion.rangos(notificacion.pk))
+        self.stdout.write(
+            f"  rangos    {time.perf_counter() - inicio:6.2f} s  {len(rangos)} tareas enviar_difusion "
+            f"de hasta {difusion.TAMANO_ENVIO}"
+        )
@@ -0,0 +1,101 @@
+import base64
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from pywebpush import WebPushException, webpush
+
+from studentspoint.apps.notifications import push
+from studentspoint.apps.notifications.models import PushSub
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+def _servicio(latencia: float):
+    """Servicio de push local: 410 para rutas ``/gone``, 201 para el resto."""
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latencia)
+            self.send_response(410 if self.path.startswith("/gone") else 201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _envio_anterior(subs, payload):
+    """Una llamada a ``webpush`` por suscripción y un ``save()`` por rechazo, como antes."""
+    for sub in subs:
+        try:
+            webpush(
+                {"endpoint": sub.endpoint, "keys": {"p256dh": sub.p256dh, "auth": sub.auth}},
+                data=payload,
+                vapid_private_key=push.PUSH_CONF["vapid_private"],
+                vapid_claims={"sub": push.PUSH_CONF["subject"]},
+            )
+        except WebPushException:
+            sub.activo = False
+            sub.save(update_fields=["activo"])
+
+
+class Command(BaseCommand):
+    help = "Mide mensajes por segundo del envío de Web Push contra un servicio local"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suscripciones", type=int, default=1000)
+        parser.add_argument("--latencia-ms", type=float, default=20)
+        parser.add_argument("--concurrencia", type=int, default=push.CONCURRENCIA)
+
+    def handle(self, *args, **options):
+        servidor = _servicio(options["latencia_ms"] / 1000)
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+        usuario = get_user_model().objects.create_user(email="bench-push@duocuc.cl", password=None)
+        p256dh = _b64(ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            Encoding.X962, PublicFormat.UncompressedPoint
+        ))
+        auth = _b64(os.urandom(16))
+        try:
+            payload = '{"title": "Tienes clase en 20 minutos", "body": "Bench"}'
+            for nombre in ("anterior", "motor"):
+                PushSub.objects.filter(usuario=usuario).delete()
+                PushSub.objects.bulk_create(
+                    PushSub(
+                        usuario=usuario, p256dh=p256dh, auth=auth,
+                        endpoint=f"{url}/{'gone' if i % 10 == 0 else 'ok'}/{nombre}/{i}",
+                    )
+                    for i in range(options["suscripciones"])
+                )
+                subs = list(PushSub.objects.filter(usuario=usuario))
+                inicio = time.perf_counter()
+                if nombre == "anterior":
+                    _envio_anterior(subs, payload)
+                else:
+                    firma = push.FirmaVapid(push.PUSH_CONF["vapid_private"], push.PUSH_CONF["subject"])
+                    push.MotorPush(firma, concurrencia=options["concurrencia"]).enviar(
+                        (sub, payload) for sub in subs
+                    )
+                duracion = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"  {nombre:9} {duracion:6.2f} s  {len(subs) / duracion:7.1f} msg/s  "
+                    f"{PushSub.objects.filter(usuario=usuario, activo=False).count()} desactivadas"
+                )
+        finally:
+            usuario.delete()
+            servidor.shutdown()
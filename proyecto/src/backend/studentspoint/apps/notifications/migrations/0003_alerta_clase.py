@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificacion'),
+        ('schedules', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaClase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clase_at', models.DateTimeField()),
+                ('dispara_at', models.DateTimeField()),
+                ('horario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerta', to='schedules.horario')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Alerta de clase',
+                'verbose_name_plural': 'Alertas de clase',
+                'indexes': [models.Index(fields=['dispara_at'], name='alerta_clase_dispara_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_alerta_clase'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(choices=[('info', 'Información'), ('success', 'Éxito'), ('warning', 'Advertencia'), ('error', 'Error'), ('forum', 'Foro'), ('market', 'Mercado'), ('portfolio', 'Portafolio'), ('campus', 'Campus'), ('encuesta', 'Encuesta')], default='info', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='NotificacionDestinatario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leida', models.BooleanField(default=False)),
+                ('entregada', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('notificacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='destinatarios', to='notifications.notificacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Destinatario de notificación',
+                'verbose_name_plural': 'Destinatarios de notificación',
+                'constraints': [models.UniqueConstraint(fields=('notificacion', 'usuario'), name='notificacion_destinatario_unico')],
+            },
+        ),
+    ]
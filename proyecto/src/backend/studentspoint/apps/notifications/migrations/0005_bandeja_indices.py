@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_difusion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', '-created_at', '-id'], name='notificacion_bandeja_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida'], name='notificacion_no_leidas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificaciondestinatario',
+            index=models.Index(fields=['usuario', '-created_at', '-notificacion'], name='destinatario_bandeja_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificaciondestinatario',
+            index=models.Index(fields=['usuario', 'leida'], name='destinatario_no_leidas_idx'),
+        ),
+    ]
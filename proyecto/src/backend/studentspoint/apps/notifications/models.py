@@ -1,4 +1,4 @@
-"""Models for storing Web Push subscriptions."""
+"""Models for Web Push subscriptions, notifications and class alerts."""
 
 import uuid
 
@@ -33,10 +33,12 @@ class Notificacion(models.Model):
         ('market', 'Mercado'),
         ('portfolio', 'Portafolio'),
         ('campus', 'Campus'),
+        ('encuesta', 'Encuesta'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Sin usuario es una difusión: los destinatarios están en NotificacionDestinatario.
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     titulo = models.CharField(max_length=200)
     mensaje = models.TextField()
     tipo = models.CharField(max_length=20, choices=TIPOS_NOTIFICACION, default='info')
@@ -48,6 +50,62 @@ class Notificacion(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
+        indexes = [
+            # Bandeja por cursor y contador de no leídas (ver ``bandeja``).
+            models.Index(fields=["usuario", "-created_at", "-id"], name="notificacion_bandeja_idx"),
+            models.Index(fields=["usuario", "leida"], name="notificacion_no_leidas_idx"),
+        ]
     
     def __str__(self):
-        return f"{self.titulo} - {self.usuario.email}"
+        return f"{self.titulo} - {self.usuario.email if self.usuario_id else 'difusión'}"
+
+
+class NotificacionDestinatario(models.Model):
+    """Entrega de una notificación difundida a un usuario.
+
+    ``created_at`` copia la fecha de la notificación para ordenar la bandeja
+    sin ``JOIN``; ``entregada`` indica que ya se intentó el push.
+    """
+
+    notificacion = models.ForeignKey(Notificacion, on_delete=models.CASCADE, related_name="destinatarios")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    leida = models.BooleanField(default=False)
+    entregada = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Destinatario de notificación'
+        verbose_name_plural = 'Destinatarios de notificación'
+        constraints = [
+            models.UniqueConstraint(fields=["notificacion", "usuario"], name="notificacion_destinatario_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["usuario", "-created_at", "-notificacion"], name="destinatario_bandeja_idx"),
+            models.Index(fields=["usuario", "leida"], name="destinatario_no_leidas_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.notificacion_id} → {self.usuario_id}"
+
+
+class AlertaClase(models.Model):
+    """Próximo aviso de clase de un :class:`~studentspoint.apps.schedules.models.Horario`.
+
+    Hay una sola fila por bloque: al despacharse, ``dispara_at`` y
+    ``clase_at`` avanzan a la semana siguiente (ver ``alertas``).
+    """
+
+    horario = models.OneToOneField(
+        "schedules.Horario", on_delete=models.CASCADE, related_name="alerta"
+    )
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    clase_at = models.DateTimeField()
+    dispara_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Alerta de clase'
+        verbose_name_plural = 'Alertas de clase'
+        indexes = [models.Index(fields=["dispara_at"], name="alerta_clase_dispara_idx")]
+
+    def __str__(self):
+        return f"{self.horario_id} @ {self.dispara_at}"
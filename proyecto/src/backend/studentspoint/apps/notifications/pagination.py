@@ -0,0 +1,27 @@
+"""Paginación por cursor de la bandeja de notificaciones."""
+
+from studentspoint.apps.forum.pagination import KeysetPagination
+
+from . import bandeja
+from .models import Notificacion
+
+
+class BandejaPagination(KeysetPagination):
+    """Cursor sobre ``(created_at, id)`` de la bandeja mezclada de :mod:`.bandeja`.
+
+    Reutiliza la codificación del cursor y la respuesta ``{next, results}``
+    del feed del foro; las filas salen de :func:`.bandeja.pagina` en vez de
+    un único queryset.
+    """
+
+    page_size = bandeja.TAMANO_PAGINA
+
+    def paginate_bandeja(self, usuario, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [Notificacion._meta.get_field("created_at"), Notificacion._meta.pk]
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.page, self.has_next = bandeja.pagina(
+            usuario, self.decode_cursor(cursor) if cursor else None, self.page_size
+        )
+        return self.page
@@ -0,0 +1,168 @@
+"""Motor de envío de Web Push.
+
+``pywebpush.webpush`` firma un JWT VAPID nuevo y abre una conexión HTTPS
+nueva en cada llamada. Aquí:
+
+* :class:`FirmaVapid` firma una vez por servicio de push (origen del
+  endpoint) y reutiliza la cabecera hasta poco antes de que expire.
+* :class:`MotorPush` mantiene una ``requests.Session`` por origen (con su
+  pool de conexiones) y envía con concurrencia acotada en un
+  ``ThreadPoolExecutor``; cifrar el mensaje sigue siendo por suscripción.
+* Las suscripciones que el servicio da por inexistentes (404 o 410) se
+  desactivan todas juntas con un ``UPDATE`` al final del envío.
+
+El resultado de cada envío (:class:`ResultadoEnvio`) incluye el
+rendimiento en mensajes por segundo.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+from urllib.parse import urlsplit
+
+import requests
+import yaml
+from django.conf import settings
+from py_vapid import Vapid
+from pywebpush import WebPusher
+from requests.adapters import HTTPAdapter
+
+from .models import PushSub
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = Path(settings.BASE_DIR).parent.parent / "config"
+PUSH_CONFIG_FILE = CONFIG_DIR / "push.yaml"
+
+# Cargar configuración de push con valores por defecto
+try:
+    PUSH_CONF = yaml.safe_load(PUSH_CONFIG_FILE.read_text())
+except FileNotFoundError:
+    # Configuración por defecto para desarrollo
+    PUSH_CONF = {
+        "vapid_public": "BEl62iUYgUivxIkv69yViEuiBIa40HI8l8V6V1V8H3BZ7pRJvnSW4UPHW3v3T1td1K3_fSqiNI2j_lLQ6Ypy1XM",
+        "vapid_private": "3K1XdXz0L8Fz0aJSOdwuSeiJfZ5JWY7BdI3R2kS2aJ8",
+        "subject": "mailto:admin@duocuc.cl"
+    }
+
+CONCURRENCIA = 16
+TIMEOUT = 10
+VIGENCIA_VAPID = 12 * 60 * 60
+MARGEN_VAPID = 10 * 60
+CODIGOS_CADUCADOS = {404, 410}
+
+
+def origen(endpoint: str) -> str:
+    partes = urlsplit(endpoint)
+    return f"{partes.scheme}://{partes.netloc}"
+
+
+class FirmaVapid:
+    """Cabeceras VAPID firmadas por origen, reutilizadas hasta su expiración."""
+
+    def __init__(self, clave_privada: str, sujeto: str, vigencia: int = VIGENCIA_VAPID):
+        self._vapid = Vapid.from_string(private_key=clave_privada)
+        self.sujeto = sujeto
+        self.vigencia = vigencia
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def cabeceras(self, endpoint: str) -> dict:
+        aud = origen(endpoint)
+        ahora = time.time()
+        with self._lock:
+            guardada = self._cache.get(aud)
+            if guardada is None or guardada[0] - MARGEN_VAPID <= ahora:
+                exp = int(ahora) + self.vigencia
+                guardada = self._cache[aud] = (
+                    exp, self._vapid.sign({"sub": self.sujeto, "aud": aud, "exp": exp})
+                )
+        return guardada[1]
+
+
+@dataclass
+class ResultadoEnvio:
+    """Totales de un envío."""
+
+    enviados: int = 0
+    fallidos: int = 0
+    desactivados: List = field(default_factory=list)
+    duracion: float = 0.0
+
+    @property
+    def por_segundo(self) -> float:
+        total = self.enviados + self.fallidos
+        return total / self.duracion if self.duracion else 0.0
+
+
+class MotorPush:
+    """Envía mensajes a muchas suscripciones con sesiones y firmas compartidas."""
+
+    def __init__(self, firma: FirmaVapid, concurrencia: int = CONCURRENCIA, timeout: float = TIMEOUT):
+        self.firma = firma
+        self.concurrencia = concurrencia
+        self.timeout = timeout
+        self._sesiones = {}
+        self._lock = threading.Lock()
+
+    def sesion(self, endpoint: str) -> requests.Session:
+        """Sesión HTTP del servicio de push de ``endpoint``."""
+        aud = origen(endpoint)
+        with self._lock:
+            sesion = self._sesiones.get(aud)
+            if sesion is None:
+                sesion = self._sesiones[aud] = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrencia)
+                sesion.mount(aud, adaptador)
+        return sesion
+
+    def _enviar_uno(self, envio):
+        sub, payload, ttl = envio
+        try:
+            respuesta = WebPusher(
+                {"endpoint": sub.endpoint, "keys": {"p256dh": sub.p256dh, "auth": sub.auth}},
+                requests_session=self.sesion(sub.endpoint),
+            ).send(payload, headers=dict(self.firma.cabeceras(sub.endpoint)), ttl=ttl, timeout=self.timeout)
+            return respuesta.status_code
+        except Exception as exc:  # error de red o de cifrado de esta suscripción
+            logger.warning("Push fallido a %s: %s", sub.endpoint, exc)
+            return None
+
+    def enviar(self, envios, ttl: int = 0) -> ResultadoEnvio:
+        """Envía cada ``(suscripcion, payload)`` de ``envios``."""
+        envios = [(sub, payload, ttl) for sub, payload in envios]
+        resultado = ResultadoEnvio()
+        if not envios:
+            return resultado
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.concurrencia, len(envios))) as pool:
+            for (sub, _, _), codigo in zip(envios, pool.map(self._enviar_uno, envios)):
+                if codigo is not None and codigo <= 202:
+                    resultado.enviados += 1
+                else:
+                    resultado.fallidos += 1
+                    if codigo in CODIGOS_CADUCADOS:
+                        resultado.desactivados.append(sub.pk)
+        if resultado.desactivados:
+            PushSub.objects.filter(pk__in=resultado.desactivados).update(activo=False)
+        resultado.duracion = time.perf_counter() - inicio
+        logger.info(
+            "Push: %s enviados, %s fallidos, %s desactivados, %.1f msg/s",
+            resultado.enviados, resultado.fallidos, len(resultado.desactivados), resultado.por_segundo,
+        )
+        return resultado
+
+
+_motor = None
+
+
+def motor() -> MotorPush:
+    """Motor del proceso con las claves VAPID de ``push.yaml``."""
+    global _motor
+    if _motor is None:
+        _motor = MotorPush(FirmaVapid(PUSH_CONF["vapid_private"], PUSH_CONF["subject"]))
+    return _motor
@@ -1,6 +1,8 @@
 """Serializers for push notification subscriptions."""
 
 from rest_framework import serializers
+
+from studentspoint.apps.campuses.models import Sede
 from .models import PushSub, Notificacion
 
 
@@ -29,6 +31,12 @@ class SimpleStatusSerializer(serializers.Serializer):
     status = serializers.CharField()
 
 
+class UnreadCountSerializer(serializers.Serializer):
+    """Cantidad de notificaciones sin leer."""
+
+    unread_count = serializers.IntegerField()
+
+
 class NotificacionSerializer(serializers.ModelSerializer):
     """Serializer for notifications."""
     
@@ -39,3 +47,13 @@ class NotificacionSerializer(serializers.ModelSerializer):
             'created_at', 'data_extra'
         ]
         read_only_fields = ['id', 'created_at']
+
+
+class DifusionSerializer(serializers.Serializer):
+    """Notificación para todos los usuarios de una sede y/o carrera."""
+
+    sede = serializers.PrimaryKeyRelatedField(queryset=Sede.objects.all(), required=False, allow_null=True)
+    carrera = serializers.CharField(required=False, allow_blank=True)
+    titulo = serializers.CharField(max_length=200)
+    mensaje = serializers.CharField()
+    tipo = serializers.ChoiceField(choices=Notificacion.TIPOS_NOTIFICACION, required=False)
@@ -1,50 +1,53 @@
 """Celery tasks for scheduling and sending push notifications."""
 
 import json
-from datetime import datetime, timedelta
-from pathlib import Path
+from collections import defaultdict
 
 from celery import shared_task
-from django.conf import settings
-import pytz
-from pywebpush import WebPushException, webpush
-import yaml
 
+from . import alertas, difusion
 from .models import PushSub
+from .push import motor
 from studentspoint.apps.schedules.models import Horario
 
-CONFIG_DIR = Path(settings.BASE_DIR).parent.parent / "config"
-PUSH_CONFIG_FILE = CONFIG_DIR / "push.yaml"
 
-# Cargar configuración de push con valores por defecto
-try:
-    PUSH_CONF = yaml.safe_load(PUSH_CONFIG_FILE.read_text())
-except FileNotFoundError:
-    # Configuración por defecto para desarrollo
-    PUSH_CONF = {
-        "vapid_public": "BEl62iUYgUivxIkv69yViEuiBIa40HI8l8V6V1V8H3BZ7pRJvnSW4UPHW3v3T1td1K3_fSqiNI2j_lLQ6Ypy1XM",
-        "vapid_private": "3K1XdXz0L8Fz0aJSOdwuSeiJfZ5JWY7BdI3R2kS2aJ8",
-        "subject": "mailto:admin@duocuc.cl"
-    }
+@shared_task
+def schedule_class_alerts(user_id: str):
+    """Create or refresh the next class alert of each of the user's :class:`Horario`."""
+
+    alertas.programar([user_id])
 
 
 @shared_task
-def schedule_class_alerts(user_id: str):
-    """Schedule push notifications 20 minutes before each class for 30 days."""
-
-    tz = pytz.timezone("America/Santiago")
-    today = datetime.now(tz).date()
-    for horario in Horario.objects.filter(usuario_id=user_id):
-        for i in range(30):
-            day = today + timedelta(days=i)
-            if day.weekday() != horario.dia_semana:
-                continue
-            start_dt = datetime.combine(day, horario.inicio, tz)
-            alert_dt = start_dt - timedelta(minutes=20)
-            send_class_push.apply_async(
-                args=[user_id, str(horario.id), start_dt.isoformat(), alert_dt.isoformat()],
-                eta=alert_dt,
-            )
+def despachar_alertas_clase():
+    """Periodic task: enqueue due class alerts, one ``enviar_alertas_clase`` per batch."""
+
+    return alertas.despachar(enviar_alertas_clase.delay)
+
+
+@shared_task
+def enviar_alertas_clase(horario_ids):
+    """Send the class alerts of one dispatch batch with two queries for the whole batch.
+
+    All subscriptions of the batch go through the push engine together.
+    """
+
+    horarios = Horario.objects.filter(id__in=horario_ids)
+    subs = defaultdict(list)
+    for sub in PushSub.objects.filter(
+        usuario_id__in=horarios.values("usuario_id"), activo=True
+    ):
+        subs[sub.usuario_id].append(sub)
+    envios = []
+    for horario in horarios:
+        if subs[horario.usuario_id]:
+            payload = json.dumps({
+                "title": "Tienes clase en 20 minutos",
+                "body": f"{horario.asignatura} - {horario.sala} ({horario.inicio})",
+            })
+            envios.extend((sub, payload) for sub in subs[horario.usuario_id])
+    # Pasada la hora de la clase el aviso ya no sirve.
+    motor().enviar(envios, ttl=int(alertas.ANTICIPACION.total_seconds()))
 
 
 @shared_task
@@ -64,19 +67,19 @@ def send_class_push(user_id: str, horario_id, fecha_clase, hora_alerta, test_onl
         body = f"{horario.asignatura} - {horario.sala} ({horario.inicio})"
 
     payload = json.dumps({"title": title, "body": body})
+    motor().enviar((sub, payload) for sub in subs)
+
+
+@shared_task
+def repartir_difusion(notificacion_id: str):
+    """Split the pending recipients of a broadcast into ``enviar_difusion`` chunks."""
+
+    for desde, hasta in difusion.rangos(notificacion_id):
+        enviar_difusion.delay(notificacion_id, desde, hasta)
+
+
+@shared_task
+def enviar_difusion(notificacion_id: str, desde: int, hasta: int):
+    """Push one chunk of a broadcast and mark it delivered."""
 
-    for sub in subs:
-        try:
-            webpush(
-                {
-                    "endpoint": sub.endpoint,
-                    "keys": {"p256dh": sub.p256dh, "auth": sub.auth},
-                },
-                data=payload,
-                vapid_private_key=PUSH_CONF["vapid_private"],
-                vapid_public_key=PUSH_CONF["vapid_public"],
-                vapid_claims={"sub": PUSH_CONF["subject"]},
-            )
-        except WebPushException:
-            sub.activo = False
-            sub.save(update_fields=["activo"])
+    difusion.enviar(notificacion_id, desde, hasta)
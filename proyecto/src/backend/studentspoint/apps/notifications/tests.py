@@ -1,16 +1,86 @@
+import base64
+import os
+import threading
+from datetime import datetime, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 from rest_framework.test import APIClient
 
 from studentspoint.apps.accounts.models import User
-from .models import PushSub
-from .tasks import send_class_push
-from pywebpush import WebPushException
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.schedules.models import Horario
+from . import alertas, bandeja, difusion, push
+from .models import AlertaClase, Notificacion, NotificacionDestinatario, PushSub
+from .tasks import enviar_alertas_clase, enviar_difusion, repartir_difusion, send_class_push
 
 
-class PushTests(TestCase):
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+# Claves de un navegador suscrito: el mensaje se cifra de verdad.
+P256DH = _b64(ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+    Encoding.X962, PublicFormat.UncompressedPoint
+))
+AUTH = _b64(os.urandom(16))
+CODIGOS = {"ok": 201, "gone": 410, "missing": 404, "error": 500}
+
+
+class ServicioPushFalso:
+    """Servicio de push local: responde según el primer tramo de la ruta."""
+
+    def __init__(self):
+        self.recibidos = []
+        servicio = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                servicio.recibidos.append((self.path, {k.lower(): v for k, v in self.headers.items()}))
+                self.send_response(CODIGOS[self.path.split("/")[1]])
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class ConServicioPush:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servicio = ServicioPushFalso()
+        cls.addClassCleanup(cls.servicio.cerrar)
+
+    def setUp(self):
+        super().setUp()
+        self.servicio.recibidos.clear()
+
+    def _sub(self, usuario, ruta):
+        return PushSub.objects.create(
+            usuario=usuario, endpoint=f"{self.servicio.url}/{ruta}", p256dh=P256DH, auth=AUTH
+        )
+
+
+class PushTests(ConServicioPush, TestCase):
     def setUp(self):
+        super().setUp()
         self.user = User.objects.create_user(email="b@duocuc.cl", password="x")
         self.client = APIClient()
         self.client.force_authenticate(self.user)
@@ -26,24 +96,262 @@ class PushTests(TestCase):
         self.assertTrue(PushSub.objects.filter(usuario=self.user, endpoint=payload["endpoint"]).exists())
 
     def test_send_push_handles_invalid(self):
-        sub = PushSub.objects.create(
-            usuario=self.user,
-            endpoint="https://bad/1",
-            p256dh="k",
-            auth="a",
-        )
-        with patch("duocpoint.apps.notifications.tasks.webpush", side_effect=WebPushException("bad")):
-            send_class_push(self.user.id, None, None, None, test_only=True)
-        sub.refresh_from_db()
-        self.assertFalse(sub.activo)
+        caducada = self._sub(self.user, "gone/1")
+        con_error = self._sub(self.user, "error/1")
+        send_class_push(self.user.id, None, None, None, test_only=True)
+        caducada.refresh_from_db()
+        con_error.refresh_from_db()
+        self.assertFalse(caducada.activo)
+        # Un error del servicio no significa que la suscripción ya no exista.
+        self.assertTrue(con_error.activo)
 
     def test_send_push_success(self):
-        PushSub.objects.create(
-            usuario=self.user,
-            endpoint="https://good/1",
-            p256dh="k",
-            auth="a",
-        )
-        with patch("duocpoint.apps.notifications.tasks.webpush") as mock_webpush:
-            send_class_push(self.user.id, None, None, None, test_only=True)
-            self.assertTrue(mock_webpush.called)
+        self._sub(self.user, "ok/1")
+        send_class_push(self.user.id, None, None, None, test_only=True)
+        self.assertEqual(len(self.servicio.recibidos), 1)
+        ruta, cabeceras = self.servicio.recibidos[0]
+        self.assertEqual(ruta, "/ok/1")
+        self.assertTrue(cabeceras["authorization"].startswith("vapid t="))
+        self.assertEqual(cabeceras["content-encoding"], "aes128gcm")
+
+
+class MotorPushTests(ConServicioPush, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="m@duocuc.cl", password="x")
+        self.firma = push.FirmaVapid(push.PUSH_CONF["vapid_private"], push.PUSH_CONF["subject"])
+        self.motor = push.MotorPush(self.firma, concurrencia=4)
+
+    def test_firma_por_origen_hasta_expirar(self):
+        with patch.object(self.firma._vapid, "sign", wraps=self.firma._vapid.sign) as sign:
+            primera = self.firma.cabeceras("https://fcm.googleapis.com/fcm/send/a")
+            self.assertIs(self.firma.cabeceras("https://fcm.googleapis.com/fcm/send/b"), primera)
+            self.firma.cabeceras("https://updates.push.services.mozilla.com/wpush/v2/c")
+            self.assertEqual(sign.call_count, 2)
+            vence = push.time.time() + push.VIGENCIA_VAPID - push.MARGEN_VAPID
+            with patch.object(push.time, "time", return_value=vence):
+                self.assertIsNot(self.firma.cabeceras("https://fcm.googleapis.com/fcm/send/a"), primera)
+            self.assertEqual(sign.call_count, 3)
+
+    def test_sesion_por_origen(self):
+        self.assertIs(self.motor.sesion("https://a.push/1"), self.motor.sesion("https://a.push/2"))
+        self.assertIsNot(self.motor.sesion("https://a.push/1"), self.motor.sesion("https://b.push/1"))
+
+    def test_desactiva_caducadas_en_un_update(self):
+        subs = [self._sub(self.user, f"{ruta}/{i}") for i, ruta in enumerate(["ok", "gone", "missing", "ok", "gone"])]
+        with self.assertNumQueries(1):
+            resultado = self.motor.enviar((sub, '{"title": "Hola"}') for sub in subs)
+        self.assertEqual((resultado.enviados, resultado.fallidos), (2, 3))
+        self.assertGreater(resultado.por_segundo, 0)
+        self.assertEqual(
+            set(PushSub.objects.filter(activo=False).values_list("pk", flat=True)),
+            {subs[1].pk, subs[2].pk, subs[4].pk},
+        )
+        self.assertEqual(len(self.servicio.recibidos), 5)
+
+
+class AlertaClaseTests(ConServicioPush, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email="c@duocuc.cl", password="x")
+        # Lunes 19 de octubre de 2026, 08:00 en Santiago.
+        self.ahora = alertas.ZONA.localize(datetime(2026, 10, 19, 8, 0))
+
+    def _horario(self, inicio, dia_semana=0, asignatura="Algebra"):
+        return Horario.objects.create(
+            usuario=self.user, dia_semana=dia_semana, inicio=inicio, fin=time(23, 0), asignatura=asignatura
+        )
+
+    def test_proxima_clase(self):
+        self.assertEqual(
+            alertas.proxima_clase(0, time(9, 0), self.ahora), alertas.ZONA.localize(datetime(2026, 10, 19, 9, 0))
+        )
+        # El aviso de las 08:10 ya pasó: queda para el lunes siguiente.
+        self.assertEqual(
+            alertas.proxima_clase(0, time(8, 10), self.ahora), alertas.ZONA.localize(datetime(2026, 10, 26, 8, 10))
+        )
+        self.assertEqual(
+            alertas.proxima_clase(2, time(8, 0), self.ahora), alertas.ZONA.localize(datetime(2026, 10, 21, 8, 0))
+        )
+
+    def test_programar_es_idempotente(self):
+        self._horario(time(9, 0))
+        self._horario(time(14, 0), dia_semana=3)
+        self.assertEqual(AlertaClase.objects.count(), 2)
+        alertas.programar([self.user.id], ahora=self.ahora)
+        alertas.programar([self.user.id], ahora=self.ahora)
+        self.assertEqual(AlertaClase.objects.count(), 2)
+        self.assertEqual(
+            sorted(AlertaClase.objects.values_list("dispara_at", flat=True)),
+            [
+                alertas.ZONA.localize(datetime(2026, 10, 19, 8, 40)),
+                alertas.ZONA.localize(datetime(2026, 10, 22, 13, 40)),
+            ],
+        )
+
+    def test_despachar_por_lotes(self):
+        vencidas = [self._horario(time(8, 10 + i)) for i in range(3)]
+        futura = self._horario(time(12, 0))
+        iniciada = self._horario(time(7, 50))
+        alertas.programar(ahora=self.ahora - timedelta(hours=1))
+        lotes = []
+        with patch.object(alertas, "TAMANO_LOTE", 2), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(alertas.despachar(lotes.append, ahora=self.ahora), 3)
+        # El primer lote incluye la clase ya iniciada, que se adelanta sin avisar.
+        self.assertEqual([len(lote) for lote in lotes], [1, 2])
+        self.assertEqual(sorted(sum(lotes, [])), sorted(str(h.id) for h in vencidas))
+        siguiente = alertas.ZONA.localize(datetime(2026, 10, 26, 0, 0))
+        for horario in vencidas + [iniciada]:
+            self.assertGreater(AlertaClase.objects.get(horario=horario).clase_at, siguiente)
+        self.assertLess(AlertaClase.objects.get(horario=futura).clase_at, siguiente)
+        self.assertEqual(alertas.despachar(lotes.append, ahora=self.ahora), 0)
+
+    def test_enviar_alertas_clase(self):
+        horario = self._horario(time(9, 0))
+        otro = User.objects.create_user(email="d@duocuc.cl", password="x")
+        Horario.objects.create(usuario=otro, dia_semana=0, inicio=time(9, 0), fin=time(10, 0), asignatura="Sin push")
+        self._sub(self.user, "ok/2")
+        ids = [str(h) for h in Horario.objects.values_list("id", flat=True)]
+        with self.assertNumQueries(2):
+            enviar_alertas_clase(ids)
+        self.assertEqual([ruta for ruta, _ in self.servicio.recibidos], ["/ok/2"])
+        self.assertEqual(self.servicio.recibidos[0][1]["ttl"], "1200")
+
+
+class DifusionTests(ConServicioPush, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sede = Sede.objects.create(slug="central", nombre="Central", direccion="Av 1", lat=0, lng=0)
+        otra = Sede.objects.create(slug="norte", nombre="Norte", direccion="Av 2", lat=0, lng=0)
+        self.alumnos = [
+            User.objects.create_user(email=f"a{i}@duocuc.cl", password=None, campus=self.sede, career="Ing")
+            for i in range(3)
+        ]
+        User.objects.create_user(email="otra@duocuc.cl", password=None, campus=otra, career="Ing")
+        User.objects.create_user(email="otra-carrera@duocuc.cl", password=None, campus=self.sede, career="Diseño")
+        self.moderador = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+
+    def test_un_cuerpo_y_una_fila_por_destinatario(self):
+        with patch.object(repartir_difusion, "delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            notificacion = difusion.difundir(difusion.usuarios_para(self.sede.id, "Ing"), "Aviso", "Hola")
+        self.assertEqual(Notificacion.objects.count(), 1)
+        self.assertIsNone(notificacion.usuario)
+        self.assertEqual(
+            set(notificacion.destinatarios.values_list("usuario_id", flat=True)),
+            {u.id for u in self.alumnos},
+        )
+        delay.assert_called_once_with(str(notificacion.pk))
+
+    def test_envio_por_rangos_marca_entregados(self):
+        for i, alumno in enumerate(self.alumnos):
+            self._sub(alumno, f"ok/{i}")
+        notificacion = difusion.difundir(difusion.usuarios_para(self.sede.id, "Ing"), "Aviso", "Hola", push=False)
+        rangos = list(difusion.rangos(notificacion.pk, tamano=2))
+        self.assertEqual(len(rangos), 2)
+        for desde, hasta in rangos:
+            enviar_difusion(str(notificacion.pk), desde, hasta)
+        self.assertEqual(len(self.servicio.recibidos), 3)
+        self.assertFalse(notificacion.destinatarios.filter(entregada=False).exists())
+        # Un reintento no vuelve a avisar a los ya entregados.
+        self.assertEqual(list(difusion.rangos(notificacion.pk)), [])
+
+    def test_repartir_encola_un_envio_por_rango(self):
+        notificacion = difusion.difundir(difusion.usuarios_para(), "Aviso", "Hola", push=False)
+        with patch.object(enviar_difusion, "delay") as delay:
+            repartir_difusion(str(notificacion.pk))
+        self.assertEqual(delay.call_count, 1)
+
+    def test_endpoint_y_bandeja(self):
+        client = APIClient()
+        client.force_authenticate(self.moderador)
+        with patch.object(repartir_difusion, "delay"):
+            response = client.post(
+                reverse("notifications-difusion"),
+                {"sede": self.sede.id, "carrera": "Ing", "titulo": "Corte de agua", "mensaje": "Mañana"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["destinatarios"], 3)
+
+        client.force_authenticate(self.alumnos[0])
+        Notificacion.objects.create(usuario=self.alumnos[0], titulo="Propia", mensaje="m")
+        bandeja = client.get(reverse("notifications-list")).data["results"]
+        self.assertEqual([n["titulo"] for n in bandeja], ["Propia", "Corte de agua"])
+        self.assertEqual(client.post(reverse("notification-read", args=[response.data["id"]])).status_code, 200)
+        self.assertTrue(NotificacionDestinatario.objects.get(usuario=self.alumnos[0]).leida)
+        self.assertFalse(NotificacionDestinatario.objects.get(usuario=self.alumnos[1]).leida)
+
+    def test_endpoint_solo_moderadores(self):
+        client = APIClient()
+        client.force_authenticate(self.alumnos[0])
+        response = client.post(reverse("notifications-difusion"), {"titulo": "t", "mensaje": "m"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class BandejaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="b@duocuc.cl", password=None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _difundir(self, titulo):
+        with patch.object(repartir_difusion, "delay"), self.captureOnCommitCallbacks(execute=True):
+            return difusion.difundir(User.objects.filter(pk=self.user.pk), titulo, "m")
+
+    def _propia(self, titulo):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notificacion.objects.create(usuario=self.user, titulo=titulo, mensaje="m")
+
+    def _no_leidas(self):
+        return self.client.get(reverse("notifications-unread-count")).data["unread_count"]
+
+    def test_paginacion_por_cursor_mezcla_propias_y_difundidas(self):
+        for i in range(5):
+            if i % 2:
+                self._difundir(f"d{i}")
+            else:
+                self._propia(f"p{i}")
+        esperados = list(
+            Notificacion.objects.order_by("-created_at", "-id").values_list("titulo", flat=True)
+        )
+        vistos = []
+        url = reverse("notifications-list") + "?page_size=2"
+        while url:
+            datos = self.client.get(url).data
+            vistos += [n["titulo"] for n in datos["results"]]
+            url = datos["next"]
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(self.client.get(reverse("notifications-list") + "?cursor=x").status_code, 404)
+
+    def test_contador_desde_cache_y_sincronizado(self):
+        propia = self._propia("p")
+        difundida = self._difundir("d")
+        self.assertEqual(self._no_leidas(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._no_leidas(), 2)
+
+        self._propia("p2")
+        self.assertEqual(self._no_leidas(), 3)
+        for notificacion in (propia, difundida, propia):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("notification-read", args=[notificacion.id]))
+            self.assertEqual(response.status_code, 200)
+        # Releer una notificación no descuenta dos veces.
+        self.assertEqual(self._no_leidas(), 1)
+
+        self._difundir("d2")
+        self.assertEqual(self._no_leidas(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("notifications-mark-all-read"))
+        with self.assertNumQueries(0):
+            self.assertEqual(self._no_leidas(), 0)
+        self.assertEqual(cache.get(bandeja.clave_no_leidas(self.user.pk)), 0)
+
+    def test_leer_ajena_es_404(self):
+        otro = User.objects.create_user(email="otro@duocuc.cl", password=None)
+        ajena = Notificacion.objects.create(usuario=otro, titulo="t", mensaje="m")
+        response = self.client.post(reverse("notification-read", args=[ajena.id]))
+        self.assertEqual(response.status_code, 404)
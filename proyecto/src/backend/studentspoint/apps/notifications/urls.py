@@ -1,17 +1,21 @@
 from django.urls import path
 
 from .views import (
+    DifusionView,
     PushSubscribeView, 
     PushTestView, 
     get_notifications, 
     mark_notification_read, 
-    mark_all_notifications_read
+    mark_all_notifications_read,
+    unread_count,
 )
 
 urlpatterns = [
     path("push/subscribe", PushSubscribeView.as_view()),
     path("push/test", PushTestView.as_view()),
-    path("", get_notifications, name="notifications-list"),
-    path("<int:notification_id>/read", mark_notification_read, name="notification-read"),
-    path("mark-all-read", mark_all_notifications_read, name="notifications-mark-all-read"),
+    path("notifications/", get_notifications, name="notifications-list"),
+    path("notifications/unread-count", unread_count, name="notifications-unread-count"),
+    path("notifications/<uuid:notification_id>/read", mark_notification_read, name="notification-read"),
+    path("notifications/mark-all-read", mark_all_notifications_read, name="notifications-mark-all-read"),
+    path("notifications/difusion", DifusionView.as_view(), name="notifications-difusion"),
 ]
@@ -3,12 +3,20 @@
 from django.conf import settings
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
 
-from .models import PushSub, Notificacion
-from .serializers import PushSubSerializer, SimpleStatusSerializer, NotificacionSerializer
+from studentspoint.apps.accounts.permissions import IsModeratorOrDirector
+from . import bandeja, difusion
+from .pagination import BandejaPagination
+from .serializers import (
+    DifusionSerializer,
+    NotificacionSerializer,
+    PushSubSerializer,
+    SimpleStatusSerializer,
+    UnreadCountSerializer,
+)
 from .tasks import send_class_push
 
 
@@ -35,16 +43,32 @@ class PushTestView(generics.GenericAPIView):
 
 @extend_schema(
     summary="Obtener notificaciones del usuario",
+    parameters=[
+        OpenApiParameter("cursor", str, description="Cursor de la página siguiente (campo ``next``)"),
+        OpenApiParameter("page_size", int, description="Notificaciones por página (máximo 100)"),
+    ],
     responses={200: NotificacionSerializer(many=True)}
 )
 @csrf_exempt
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_notifications(request):
-    """Obtiene las notificaciones del usuario actual."""
-    notifications = Notificacion.objects.filter(usuario=request.user).order_by('-created_at')[:20]
-    serializer = NotificacionSerializer(notifications, many=True)
-    return Response(serializer.data)
+    """Bandeja del usuario actual, propias y difundidas, paginada por cursor."""
+    paginator = BandejaPagination()
+    page = paginator.paginate_bandeja(request.user, request)
+    serializer = NotificacionSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@extend_schema(
+    summary="Cantidad de notificaciones sin leer",
+    responses={200: UnreadCountSerializer}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def unread_count(request):
+    """Contador para el ícono de notificaciones, servido desde la caché."""
+    return Response({"unread_count": bandeja.no_leidas(request.user.pk)})
 
 
 @extend_schema(
@@ -56,13 +80,9 @@ def get_notifications(request):
 @permission_classes([permissions.IsAuthenticated])
 def mark_notification_read(request, notification_id):
     """Marca una notificación como leída."""
-    try:
-        notification = Notificacion.objects.get(id=notification_id, usuario=request.user)
-        notification.leida = True
-        notification.save()
-        return Response({"status": "ok"})
-    except Notificacion.DoesNotExist:
+    if not bandeja.marcar_leida(request.user, notification_id):
         return Response({"error": "Notificación no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"status": "ok"})
 
 
 @extend_schema(
@@ -74,5 +94,29 @@ def mark_notification_read(request, notification_id):
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_notifications_read(request):
     """Marca todas las notificaciones del usuario como leídas."""
-    Notificacion.objects.filter(usuario=request.user, leida=False).update(leida=True)
+    bandeja.marcar_todas(request.user)
     return Response({"status": "ok"})
+
+
+class DifusionView(generics.GenericAPIView):
+    """Notifica a todos los usuarios de una sede y/o carrera."""
+
+    permission_classes = [permissions.IsAuthenticated, IsModeratorOrDirector]
+    serializer_class = DifusionSerializer
+
+    @extend_schema(summary="Difundir notificación", request=DifusionSerializer, responses={202: DifusionSerializer})
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        sede = datos.get("sede")
+        notificacion = difusion.difundir(
+            difusion.usuarios_para(sede.id if sede else None, datos.get("carrera")),
+            datos["titulo"],
+            datos["mensaje"],
+            tipo=datos.get("tipo", "info"),
+        )
+        return Response(
+            {**serializer.data, "id": notificacion.id, "destinatarios": notificacion.destinatarios.count()},
+            status=status.HTTP_202_ACCEPTED,
+        )
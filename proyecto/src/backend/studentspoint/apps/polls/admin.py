@@ -6,6 +6,7 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 
 from .models import Poll, PollOpcion, PollVoto, PollAnalytics
+from .resultados import anotar_opciones, anotar_polls, porcentaje
 
 
 class PollOpcionInline(admin.TabularInline):
@@ -56,7 +57,7 @@ class PollAdmin(admin.ModelAdmin):
     
     def total_votos_display(self, obj):
         """Muestra total de votos únicos."""
-        return obj.total_votos
+        return obj.participantes
     total_votos_display.short_description = "Total Votos"
     
     def analytics_link(self, obj):
@@ -73,7 +74,9 @@ class PollAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         """Optimiza consultas."""
-        return super().get_queryset(request).select_related("creador").prefetch_related("sedes")
+        return anotar_polls(
+            super().get_queryset(request).select_related("creador").prefetch_related("sedes")
+        )
 
 
 @admin.register(PollOpcion)
@@ -87,13 +90,17 @@ class PollOpcionAdmin(admin.ModelAdmin):
     
     def total_votos_display(self, obj):
         """Muestra total de votos para la opción."""
-        return obj.total_votos
+        return obj.votos_total
     total_votos_display.short_description = "Votos"
     
     def porcentaje_display(self, obj):
         """Muestra porcentaje de votos."""
-        return f"{obj.porcentaje_votos}%"
+        return f"{porcentaje(obj.votos_total, obj.participantes_poll)}%"
     porcentaje_display.short_description = "Porcentaje"
+    
+    def get_queryset(self, request):
+        """Conteos de la página en la misma consulta del listado."""
+        return anotar_opciones(super().get_queryset(request).select_related("poll"))
 
 
 @admin.register(PollVoto)
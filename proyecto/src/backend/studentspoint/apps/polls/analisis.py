@@ -0,0 +1,243 @@
+"""Análisis cruzado de los votos de una encuesta.
+
+Los votos se leen una sola vez, con una consulta, a un formato columnar:
+un arreglo de enteros por dimensión (opción, sede, carrera, hora) cuyos
+valores son índices de categoría. Cada tabla se arma aplanando las
+dimensiones a un único índice (``sede × carrera × opción`` → entero) y
+contando ocurrencias, con ``numpy.bincount`` si ``numpy`` está instalado y
+con un recorrido en Python si no.
+
+Desgloses (parámetro ``breakdown`` de ``PollAnalyticsView``):
+
+* ``cruce``: votos por sede × carrera × opción.
+* ``horas``: histograma de votos por hora.
+* ``participacion``: participantes sobre usuarios habilitados, por sede ×
+  carrera.
+
+Los tres se calculan juntos y se cachean por versión de la encuesta
+(``participantes_count`` cambia con cada voto), así un voto nuevo deja la
+entrada anterior sin uso y no hace falta invalidar.
+"""
+
+import math
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from itertools import compress
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import audiencia
+from .exportacion import SIN_CARRERA, SIN_SEDE, TAMANO_BLOQUE
+from .models import PollOpcion, PollVoto
+from .resultados import porcentaje
+
+try:
+    import numpy
+except ImportError:  # dependencia opcional
+    numpy = None
+
+DESGLOSES = ("cruce", "horas", "participacion")
+TTL = 600
+SEGUNDOS_HORA = 3600
+
+
+class Categorias:
+    """Asigna un índice correlativo a cada valor distinto."""
+
+    def __init__(self, valores=()):
+        self.indices = {}
+        self.valores = []
+        for valor in valores:
+            self.indice(valor)
+
+    def indice(self, valor) -> int:
+        i = self.indices.get(valor)
+        if i is None:
+            i = self.indices[valor] = len(self.valores)
+            self.valores.append(valor)
+        return i
+
+    def __len__(self):
+        return len(self.valores)
+
+
+@dataclass
+class Columnas:
+    """Votos de una encuesta, una columna de enteros por dimensión."""
+
+    opciones: list
+    sedes: Categorias
+    carreras: Categorias
+    opcion: array
+    sede: array
+    carrera: array
+    hora: array
+    principal: array
+
+    def __len__(self):
+        return len(self.opcion)
+
+
+def cargar(poll) -> Columnas:
+    """Lee los votos de ``poll`` en columnas con una consulta (más la de opciones)."""
+    opciones = list(
+        PollOpcion.objects.filter(poll=poll).order_by("orden", "id").values_list("id", "texto")
+    )
+    indice_opcion = {pk: i for i, (pk, _) in enumerate(opciones)}
+    sedes, carreras = Categorias(), Categorias()
+    columnas = Columnas(
+        opciones=[texto for _, texto in opciones], sedes=sedes, carreras=carreras,
+        opcion=array("q"), sede=array("q"), carrera=array("q"), hora=array("q"), principal=array("B"),
+    )
+    votos = (
+        PollVoto.objects.filter(poll=poll).order_by()
+        .values_list("opcion_id", "sede_voto__nombre", "carrera_voto", "created_at", "principal")
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    for opcion_id, sede, carrera, fecha, principal in votos:
+        columnas.opcion.append(indice_opcion[opcion_id])
+        columnas.sede.append(sedes.indice(sede or SIN_SEDE))
+        columnas.carrera.append(carreras.indice(carrera or SIN_CARRERA))
+        columnas.hora.append(int(fecha.timestamp()) // SEGUNDOS_HORA)
+        columnas.principal.append(principal)
+    return columnas
+
+
+def _vector(columna):
+    return numpy.frombuffer(columna, dtype=numpy.int64 if columna.typecode == "q" else numpy.bool_)
+
+
+def contar(columnas, tamanos, mascara=None) -> list:
+    """Filas por combinación de ``columnas``, como lista plana en orden C.
+
+    La combinación ``(a, b, c)`` queda en ``(a * tamanos[1] + b) * tamanos[2] + c``.
+    Con ``mascara`` solo se cuentan las filas marcadas.
+    """
+    total = math.prod(tamanos)
+    if not total or not len(columnas[0]):
+        return [0] * total
+    if numpy is not None:
+        plano = numpy.ravel_multi_index([_vector(c) for c in columnas], tamanos)
+        if mascara is not None:
+            plano = plano[_vector(mascara)]
+        return numpy.bincount(plano, minlength=total).tolist()
+    conteo = [0] * total
+    filas = zip(*columnas)
+    if mascara is not None:
+        filas = compress(filas, mascara)
+    for fila in filas:
+        i = 0
+        for valor, tamano in zip(fila, tamanos):
+            i = i * tamano + valor
+        conteo[i] += 1
+    return conteo
+
+
+def _histograma_horas(hora) -> tuple:
+    """``(primera_hora, conteos)`` con una posición por hora, incluidas las vacías."""
+    if not len(hora):
+        return None, []
+    if numpy is not None:
+        horas = _vector(hora)
+        inicio = int(horas.min())
+        return inicio, numpy.bincount(horas - inicio).tolist()
+    inicio = min(hora)
+    conteo = [0] * (max(hora) - inicio + 1)
+    for h in hora:
+        conteo[h - inicio] += 1
+    return inicio, conteo
+
+
+def cruce(columnas: Columnas) -> dict:
+    """Votos por sede × carrera × opción; solo las combinaciones con votos."""
+    ns, nc, no = len(columnas.sedes), len(columnas.carreras), len(columnas.opciones)
+    conteo = contar((columnas.sede, columnas.carrera, columnas.opcion), (ns, nc, no))
+    filas = []
+    for s, sede in enumerate(columnas.sedes.valores):
+        for c, carrera in enumerate(columnas.carreras.valores):
+            inicio = (s * nc + c) * no
+            votos = conteo[inicio:inicio + no]
+            total = sum(votos)
+            if total:
+                filas.append({"sede": sede, "carrera": carrera, "votos": votos, "total": total})
+    filas.sort(key=lambda fila: (fila["sede"], fila["carrera"]))
+    return {"opciones": columnas.opciones, "filas": filas}
+
+
+def horas(columnas: Columnas) -> dict:
+    """Histograma de votos por hora (UTC)."""
+    inicio, conteo = _histograma_horas(columnas.hora)
+    return {
+        "horas": [
+            {
+                "hora": datetime.fromtimestamp((inicio + i) * SEGUNDOS_HORA, tz=dt_timezone.utc),
+                "votos": votos,
+            }
+            for i, votos in enumerate(conteo)
+        ]
+    }
+
+
+def poblacion(poll) -> dict:
+    """Usuarios activos dentro de la audiencia de ``poll``, por ``(sede, carrera)``."""
+    habilitados = (
+        audiencia.usuarios(poll).order_by()
+        .values_list("campus__nombre", "career").annotate(n=Count("id"))
+    )
+    return {(sede or SIN_SEDE, carrera or SIN_CARRERA): n for sede, carrera, n in habilitados}
+
+
+def participacion(columnas: Columnas, habilitados: dict) -> dict:
+    """Participantes (votos principales) sobre habilitados, por sede × carrera."""
+    nc = len(columnas.carreras)
+    conteo = contar(
+        (columnas.sede, columnas.carrera), (len(columnas.sedes), nc), mascara=columnas.principal
+    )
+    participantes = {
+        (sede, carrera): conteo[s * nc + c]
+        for s, sede in enumerate(columnas.sedes.valores)
+        for c, carrera in enumerate(columnas.carreras.valores)
+        if conteo[s * nc + c]
+    }
+    filas = [
+        {
+            "sede": sede,
+            "carrera": carrera,
+            "participantes": participantes.get((sede, carrera), 0),
+            "habilitados": habilitados.get((sede, carrera), 0),
+            "tasa": porcentaje(participantes.get((sede, carrera), 0), habilitados.get((sede, carrera), 0)),
+        }
+        for sede, carrera in sorted(participantes.keys() | habilitados.keys())
+    ]
+    total_participantes = sum(participantes.values())
+    total_habilitados = sum(habilitados.values())
+    return {
+        "filas": filas,
+        "total": {
+            "participantes": total_participantes,
+            "habilitados": total_habilitados,
+            "tasa": porcentaje(total_participantes, total_habilitados),
+        },
+    }
+
+
+def calcular(poll) -> dict:
+    """Los tres desgloses de ``poll`` a partir de una sola lectura de votos."""
+    columnas = cargar(poll)
+    return {
+        "cruce": cruce(columnas),
+        "horas": horas(columnas),
+        "participacion": participacion(columnas, poblacion(poll)),
+    }
+
+
+def obtener(poll, breakdown: str) -> dict:
+    """Desglose ``breakdown`` de ``poll``, cacheado por versión de la encuesta."""
+    clave = f"polls:analisis:{poll.pk}:{poll.participantes_count}"
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular(poll)
+        cache.set(clave, datos, TTL)
+    return datos[breakdown]
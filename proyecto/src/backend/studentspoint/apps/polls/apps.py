@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'studentspoint.apps.polls'
+
+    def ready(self):
+        from . import audiencia, dashboard
+
+        audiencia.conectar_senales()
+        dashboard.conectar_senales()
@@ -0,0 +1,115 @@
+"""Audiencia de las encuestas: quién puede verlas y votar.
+
+``Poll.sedes`` (M2M) y ``Poll.carreras`` (JSON) se normalizan en
+:class:`~.models.PollAudiencia`, una fila por par sede × carrera con
+comodines para "todas". Con el índice ``(sede, carrera, poll)``, saber qué
+encuestas ve un usuario son a lo sumo cuatro búsquedas de igualdad
+(su sede o comodín × su carrera o comodín), sin ``JOIN`` al M2M, sin
+``DISTINCT`` y sin recorrer el JSON de carreras.
+
+Las filas se regeneran con señales cada vez que cambian las sedes o las
+carreras de una encuesta; ``reconstruir_audiencia_polls`` las recalcula
+todas si se modificaron por fuera del ORM.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_save
+
+from .models import Poll, PollAudiencia
+
+TAMANO_LOTE = 1000
+
+
+def filas_audiencia(poll_id, sede_ids, carreras):
+    """Filas de audiencia para las sedes y carreras dadas (vacías = todas)."""
+    return [
+        PollAudiencia(poll_id=poll_id, sede_id=sede_id, carrera=carrera)
+        for sede_id in (sorted(set(sede_ids)) or [None])
+        for carrera in (sorted({c for c in carreras or [] if c}) or [""])
+    ]
+
+
+def sincronizar(poll: Poll) -> None:
+    """Regenera la audiencia de ``poll``."""
+    sede_ids = poll.sedes.values_list("id", flat=True)
+    with transaction.atomic():
+        PollAudiencia.objects.filter(poll=poll).delete()
+        PollAudiencia.objects.bulk_create(filas_audiencia(poll.pk, sede_ids, poll.carreras))
+
+
+def reconstruir() -> int:
+    """Regenera la audiencia de todas las encuestas; devuelve las filas creadas."""
+    sedes = {}
+    for poll_id, sede_id in Poll.sedes.through.objects.values_list("poll_id", "sede_id"):
+        sedes.setdefault(poll_id, []).append(sede_id)
+    creadas = 0
+    with transaction.atomic():
+        PollAudiencia.objects.all().delete()
+        filas = []
+        for poll_id, carreras in Poll.objects.values_list("id", "carreras").iterator(chunk_size=TAMANO_LOTE):
+            filas.extend(filas_audiencia(poll_id, sedes.get(poll_id, []), carreras))
+            if len(filas) >= TAMANO_LOTE:
+                creadas += len(PollAudiencia.objects.bulk_create(filas, batch_size=TAMANO_LOTE))
+                filas = []
+        creadas += len(PollAudiencia.objects.bulk_create(filas, batch_size=TAMANO_LOTE))
+    return creadas
+
+
+def visibles_para(queryset, usuario):
+    """Restringe un queryset de :class:`Poll` a las encuestas dirigidas a ``usuario``."""
+    return queryset.filter(pk__in=PollAudiencia.objects.para(usuario).values("poll_id"))
+
+
+def usuarios(poll):
+    """Usuarios activos a los que está dirigida ``poll``."""
+    filtro = None
+    for sede_id, carrera in poll.audiencia.values_list("sede_id", "carrera"):
+        condicion = Q()
+        if sede_id is not None:
+            condicion &= Q(campus_id=sede_id)
+        if carrera:
+            condicion &= Q(career=carrera)
+        if not condicion:
+            filtro = Q()
+            break
+        filtro = condicion if filtro is None else filtro | condicion
+    User = get_user_model()
+    if filtro is None:
+        return User.objects.none()
+    return User.objects.filter(filtro, is_active=True)
+
+
+def anotar_elegible(queryset, usuario):
+    """Anota ``elegible`` (sede y carrera habilitadas) en un queryset de :class:`Poll`."""
+    return queryset.annotate(
+        elegible=Exists(PollAudiencia.objects.para(usuario).filter(poll=OuterRef("pk")))
+    )
+
+
+def _al_guardar(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "carreras" in update_fields:
+        sincronizar(instance)
+
+
+def _al_cambiar_sedes(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # ``sede.poll_set.add(...)``: ``instance`` es la sede. Tras ``clear()``
+        # no hay ``pk_set``; las encuestas afectadas son las que la tenían.
+        pk_set = kwargs.get("pk_set")
+        if pk_set is None:
+            pk_set = PollAudiencia.objects.filter(sede=instance).values_list("poll_id", flat=True)
+        for poll in Poll.objects.filter(pk__in=list(pk_set)):
+            sincronizar(poll)
+    else:
+        sincronizar(instance)
+
+
+def conectar_senales() -> None:
+    post_save.connect(_al_guardar, sender=Poll, dispatch_uid="polls-audiencia-guardar")
+    m2m_changed.connect(
+        _al_cambiar_sedes, sender=Poll.sedes.through, dispatch_uid="polls-audiencia-sedes"
+    )
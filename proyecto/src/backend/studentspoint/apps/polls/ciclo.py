@@ -0,0 +1,100 @@
+"""Ciclo de vida de las encuestas: BORRADOR → ACTIVA → CERRADA.
+
+La tarea periódica :func:`~.tasks.avanzar_ciclo_polls` mueve las encuestas
+cuyo límite ya pasó con ``UPDATE`` en lote, usando los índices
+``(estado, inicia_at)`` y ``(estado, cierra_at)``:
+
+* Un borrador programado (``inicia_at`` posterior a su creación) se
+  publica al llegar ``inicia_at`` y se avisa a su audiencia con una
+  difusión (:func:`anunciar`) después de confirmar el lote. Los borradores sin programar siguen
+  esperando a que alguien los publique.
+* Una encuesta activa se cierra al llegar ``cierra_at`` y sus resultados
+  quedan congelados en :class:`~.models.PollResultadoFinal`.
+
+Así el estado guardado coincide con ``Poll.esta_activa`` salvo por el
+intervalo de la tarea, y listar encuestas activas es un filtro por
+``estado``.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from studentspoint.apps.notifications.difusion import difundir
+
+from . import audiencia, dashboard
+from .models import Poll
+from .resultados import congelar
+from .tiempo_real import publicar_cierre
+
+TAMANO_LOTE = 500
+
+
+def _en_lotes(pendientes, aplicar) -> int:
+    """Aplica ``aplicar(ids)`` a ``pendientes`` por lotes hasta agotarlos."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(pendientes.order_by().values_list("id", flat=True)[:TAMANO_LOTE])
+            if not ids:
+                return total
+            total += aplicar(ids)
+
+
+def anunciar(polls) -> None:
+    """Avisa a la audiencia de cada encuesta recién abierta."""
+    for poll in polls:
+        difundir(
+            audiencia.usuarios(poll),
+            f"Nueva encuesta: {poll.titulo}",
+            poll.descripcion or "Ya puedes votar.",
+            tipo="encuesta",
+            data_extra={"poll_id": poll.id},
+        )
+
+
+def _anunciar_activadas(ids) -> None:
+    anunciar(Poll.objects.filter(id__in=ids, estado=Poll.Estado.ACTIVA).only("id", "titulo", "descripcion"))
+
+
+def activar_programadas(ahora=None) -> int:
+    """Publica los borradores programados cuyo ``inicia_at`` ya pasó."""
+    ahora = ahora or timezone.now()
+    pendientes = Poll.objects.filter(
+        estado=Poll.Estado.BORRADOR, inicia_at__lte=ahora, inicia_at__gt=F("created_at")
+    )
+
+    def activar(ids):
+        activadas = Poll.objects.filter(id__in=ids).update(estado=Poll.Estado.ACTIVA, updated_at=ahora)
+        # Las difusiones van fuera de la transacción del lote, ya confirmado.
+        transaction.on_commit(partial(_anunciar_activadas, ids))
+        return activadas
+
+    return _en_lotes(pendientes, activar)
+
+
+def cerrar(ids, ahora) -> int:
+    """Cierra las encuestas activas de ``ids``, congela sus resultados y lo avisa en vivo."""
+    cerradas = Poll.objects.filter(id__in=ids, estado=Poll.Estado.ACTIVA).update(
+        estado=Poll.Estado.CERRADA, updated_at=ahora
+    )
+    congelar(ids, ahora)
+    publicar_cierre(ids)
+    return cerradas
+
+
+def cerrar_vencidas(ahora=None) -> int:
+    """Cierra las encuestas activas cuyo ``cierra_at`` ya pasó."""
+    ahora = ahora or timezone.now()
+    pendientes = Poll.objects.filter(estado=Poll.Estado.ACTIVA, cierra_at__lte=ahora)
+    return _en_lotes(pendientes, lambda ids: cerrar(ids, ahora))
+
+
+def avanzar(ahora=None) -> dict:
+    ahora = ahora or timezone.now()
+    resultado = {"activadas": activar_programadas(ahora), "cerradas": cerrar_vencidas(ahora)}
+    if any(resultado.values()):
+        dashboard.invalidar()
+    return resultado
@@ -0,0 +1,94 @@
+"""Datos del dashboard de encuestas, cacheados.
+
+Las cifras generales salen de un solo ``aggregate`` con conteos
+condicionales y el top de participación del contador
+``Poll.participantes_count`` (índice ``poll_participantes_idx``). El
+resultado se guarda en caché por rol, y el conteo "mis encuestas" por
+usuario, bajo una versión común: :func:`invalidar` la incrementa cuando se
+crea, cierra o publica una encuesta, y todas las entradas anteriores
+quedan inaccesibles de inmediato. El top además expira a los
+:data:`TTL` segundos porque cambia con cada voto.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Poll
+
+TTL = 60
+TOP = 5
+DIAS_ACTIVIDAD = 30
+
+_PREFIJO = "polls:dashboard"
+_CLAVE_VERSION = f"{_PREFIJO}:version"
+
+
+def _version() -> int:
+    version = cache.get(_CLAVE_VERSION)
+    if version is None:
+        cache.add(_CLAVE_VERSION, 1, None)
+        version = cache.get(_CLAVE_VERSION, 1)
+    return version
+
+
+def invalidar() -> None:
+    """Descarta todas las entradas cacheadas del dashboard."""
+    try:
+        cache.incr(_CLAVE_VERSION)
+    except ValueError:
+        cache.add(_CLAVE_VERSION, 1, None)
+
+
+def _calcular(usuario) -> dict:
+    estadisticas = Poll.objects.aggregate(
+        total_encuestas=Count("id"),
+        encuestas_activas=Count("id", filter=Q(estado=Poll.Estado.ACTIVA)),
+        encuestas_cerradas=Count("id", filter=Q(estado=Poll.Estado.CERRADA)),
+        mis_encuestas=Count("id", filter=Q(creador=usuario)),
+        actividad_reciente=Count(
+            "id", filter=Q(created_at__gte=timezone.now() - timedelta(days=DIAS_ACTIVIDAD))
+        ),
+    )
+    top = [
+        {"id": pk, "titulo": titulo, "participantes": participantes, "estado": estado}
+        for pk, titulo, participantes, estado in Poll.objects.order_by("-participantes_count", "id")
+        .values_list("id", "titulo", "participantes_count", "estado")[:TOP]
+    ]
+    return {"estadisticas": estadisticas, "top_encuestas": top}
+
+
+def obtener(usuario) -> dict:
+    """``{"estadisticas": ..., "top_encuestas": ...}`` para ``usuario``."""
+    version = _version()
+    clave_rol = f"{_PREFIJO}:{version}:rol:{usuario.role}"
+    clave_usuario = f"{_PREFIJO}:{version}:usuario:{usuario.pk}"
+    cacheado = cache.get_many([clave_rol, clave_usuario])
+    general = cacheado.get(clave_rol)
+    mis_encuestas = cacheado.get(clave_usuario)
+
+    if general is None:
+        datos = _calcular(usuario)
+        mis_encuestas = datos["estadisticas"].pop("mis_encuestas")
+        general = datos
+        cache.set_many({clave_rol: general, clave_usuario: mis_encuestas}, TTL)
+    elif mis_encuestas is None:
+        mis_encuestas = Poll.objects.filter(creador=usuario).count()
+        cache.set(clave_usuario, mis_encuestas, TTL)
+
+    return {
+        "estadisticas": {**general["estadisticas"], "mis_encuestas": mis_encuestas},
+        "top_encuestas": general["top_encuestas"],
+    }
+
+
+def _al_cambiar_poll(sender, **kwargs):
+    invalidar()
+
+
+def conectar_senales() -> None:
+    post_save.connect(_al_cambiar_poll, sender=Poll, dispatch_uid="polls-dashboard-guardar")
+    post_delete.connect(_al_cambiar_poll, sender=Poll, dispatch_uid="polls-dashboard-eliminar")
@@ -0,0 +1,94 @@
+"""Actualización de :class:`~.models.PollAnalytics` fuera de la votación.
+
+Votar ya no recalcula las estadísticas: marca la encuesta como pendiente
+con una bandera en la caché y, si la bandera no existía, programa la tarea
+:func:`~.tasks.recalcular_analytics` para dentro de :data:`INTERVALO`
+segundos. Los votos que llegan mientras tanto encuentran la bandera puesta
+y no programan nada, así cada encuesta se recalcula a lo sumo una vez por
+intervalo sin importar cuántos votos reciba.
+
+Las encuestas cortas (duración de hasta :data:`DURACION_CORTA`) no pueden
+esperar el intervalo: en ellas cada participante suma su sede y carrera a
+las distribuciones dentro de la misma transacción del voto, sin volver a
+agregar los votos.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Poll, PollAnalytics, PollVoto
+
+INTERVALO = 30
+# La bandera dura más que el intervalo por si la tarea se atrasa; si el
+# worker nunca la ejecuta, expira y el siguiente voto vuelve a programarla.
+TTL_PENDIENTE = INTERVALO * 4
+DURACION_CORTA = timedelta(hours=24)
+SIN_SEDE = "Sin sede"
+SIN_CARRERA = "Sin carrera"
+
+_PREFIJO = "polls:analytics"
+
+
+def _clave_pendiente(poll_id) -> str:
+    return f"{_PREFIJO}:pendiente:{poll_id}"
+
+
+def es_incremental(poll: Poll) -> bool:
+    """``True`` si las estadísticas de ``poll`` se actualizan voto a voto."""
+    return poll.cierra_at is not None and poll.cierra_at - poll.inicia_at <= DURACION_CORTA
+
+
+def marcar_pendiente(poll_id: int) -> bool:
+    """Programa el recálculo de ``poll_id`` si no hay uno en espera.
+
+    Devuelve ``True`` si se programó una tarea nueva.
+    """
+    if not cache.add(_clave_pendiente(poll_id), 1, TTL_PENDIENTE):
+        return False
+    from .tasks import recalcular_analytics
+
+    transaction.on_commit(
+        lambda: recalcular_analytics.apply_async((poll_id,), countdown=INTERVALO)
+    )
+    return True
+
+
+def recalcular(poll_id: int) -> PollAnalytics:
+    """Recalcula las estadísticas completas de ``poll_id``."""
+    # Se borra antes de leer los votos: los que lleguen durante el cálculo
+    # vuelven a marcar la encuesta.
+    cache.delete(_clave_pendiente(poll_id))
+    analytics, _ = PollAnalytics.objects.get_or_create(poll_id=poll_id)
+    analytics.actualizar_estadisticas()
+    return analytics
+
+
+def _sumar_participante(poll: Poll, voto: PollVoto) -> None:
+    analytics, _ = PollAnalytics.objects.select_for_update().get_or_create(poll=poll)
+    sede = voto.sede_voto.nombre if voto.sede_voto_id else SIN_SEDE
+    carrera = voto.carrera_voto or SIN_CARRERA
+    analytics.total_participantes += 1
+    analytics.distribucion_sedes[sede] = analytics.distribucion_sedes.get(sede, 0) + 1
+    analytics.distribucion_carreras[carrera] = analytics.distribucion_carreras.get(carrera, 0) + 1
+    analytics.save(
+        update_fields=[
+            "total_participantes",
+            "distribucion_sedes",
+            "distribucion_carreras",
+            "ultima_actualizacion",
+        ]
+    )
+
+
+def registrar_participante(poll: Poll, voto: PollVoto) -> None:
+    """Refleja en las estadísticas a quien acaba de emitir ``voto``.
+
+    Debe llamarse dentro de la transacción del voto, una vez por
+    participante aunque haya marcado varias opciones.
+    """
+    if es_incremental(poll):
+        _sumar_participante(poll, voto)
+    else:
+        marcar_pendiente(poll.pk)
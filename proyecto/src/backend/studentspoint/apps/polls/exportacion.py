@@ -0,0 +1,190 @@
+"""Exportación de resultados de encuestas en *streaming*.
+
+Las exportaciones se entregan con ``StreamingHttpResponse``: los votos se
+leen con una sola consulta ordenada (con la opción y la sede unidas por
+``JOIN``) mediante ``.iterator(chunk_size=TAMANO_BLOQUE)`` y se van
+escribiendo por bloques, así la memoria no crece con la cantidad de votos.
+
+Formatos:
+
+* ``csv``: totales por opción o, con metadatos, una fila por voto.
+* ``json``: el detalle de la encuesta más, con metadatos, la lista de votos.
+* ``columnar``: una fila por voto para análisis. Arrow IPC (*streaming
+  format*) si ``pyarrow`` está instalado; si no, JSON delimitado por líneas.
+"""
+
+import csv
+import io
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import PollVoto
+from .resultados import calcular_resultados
+
+try:
+    import pyarrow
+except ImportError:  # dependencia opcional
+    pyarrow = None
+
+TAMANO_BLOQUE = 2000
+SIN_SEDE = "Sin sede"
+SIN_CARRERA = "Sin carrera"
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+
+def votos_exportables(poll, justificaciones=False):
+    """Tuplas ``(opcion, sede, carrera, fecha[, justificacion])`` en orden de opción."""
+    campos = ["opcion__texto", "sede_voto__nombre", "carrera_voto", "created_at"]
+    if justificaciones:
+        campos.append("justificacion")
+    return (
+        PollVoto.objects.filter(poll=poll)
+        .order_by("opcion__orden", "opcion_id", "id")
+        .values_list(*campos)
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+
+
+def _normalizar(voto):
+    opcion, sede, carrera, fecha, *resto = voto
+    return (opcion, sede or SIN_SEDE, carrera or SIN_CARRERA, fecha, *resto)
+
+
+def _bloques(filas, escribir):
+    """Agrupa ``filas`` en cadenas de hasta :data:`TAMANO_BLOQUE` filas."""
+    buffer = io.StringIO()
+    pendientes = 0
+    for fila in filas:
+        escribir(buffer, fila)
+        pendientes += 1
+        if pendientes == TAMANO_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    if pendientes:
+        yield buffer.getvalue()
+
+
+def iter_csv(poll, metadatos=True, justificaciones=False):
+    """CSV de resultados en bloques de texto."""
+    encabezados = ["Opción", "Votos", "Porcentaje"]
+    if metadatos:
+        encabezados.extend(["Sede", "Carrera", "Fecha Voto"])
+        if justificaciones:
+            encabezados.append("Justificación")
+        filas = (
+            [opcion, 1, "", sede, carrera, fecha.strftime(FORMATO_FECHA) if fecha else "", *resto]
+            for opcion, sede, carrera, fecha, *resto in map(
+                _normalizar, votos_exportables(poll, justificaciones)
+            )
+        )
+    else:
+        filas = (
+            [opcion.texto, opcion.votos_total, f"{opcion.porcentaje}%"]
+            for opcion in calcular_resultados(poll).opciones
+        )
+
+    def escribir(buffer, fila):
+        csv.writer(buffer).writerow(fila)
+
+    yield from _bloques([encabezados], escribir)
+    yield from _bloques(filas, escribir)
+
+
+def _voto_dict(voto, justificaciones):
+    opcion, sede, carrera, fecha, *resto = _normalizar(voto)
+    datos = {"opcion": opcion, "sede": sede, "carrera": carrera, "fecha": fecha}
+    if justificaciones:
+        datos["justificacion"] = resto[0]
+    return datos
+
+
+def iter_json(poll, detalle, metadatos=True, justificaciones=False):
+    """``{"encuesta": detalle, "votos": [...]}`` en bloques de texto."""
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield '{"encuesta": ' + encoder.encode(detalle) + ', "votos": ['
+    if metadatos:
+        primero = True
+
+        def escribir(buffer, voto):
+            nonlocal primero
+            if not primero:
+                buffer.write(", ")
+            primero = False
+            buffer.write(encoder.encode(_voto_dict(voto, justificaciones)))
+
+        yield from _bloques(votos_exportables(poll, justificaciones), escribir)
+    yield "]}"
+
+
+def iter_ndjson(poll, justificaciones=False):
+    """Un objeto JSON por voto y por línea."""
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def escribir(buffer, voto):
+        buffer.write(encoder.encode(_voto_dict(voto, justificaciones)))
+        buffer.write("\n")
+
+    yield from _bloques(votos_exportables(poll, justificaciones), escribir)
+
+
+class _Acumulador(io.RawIOBase):
+    """Destino de escritura que entrega y descarta lo escrito en cada ``vaciar``."""
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        contenido = b"".join(self._partes)
+        self._partes = []
+        return contenido
+
+
+def iter_arrow(poll, justificaciones=False):
+    """Votos en formato Arrow IPC, un *record batch* por bloque."""
+    campos = [
+        ("opcion", pyarrow.string()),
+        ("sede", pyarrow.string()),
+        ("carrera", pyarrow.string()),
+        ("fecha", pyarrow.timestamp("us", tz="UTC")),
+    ]
+    if justificaciones:
+        campos.append(("justificacion", pyarrow.string()))
+    esquema = pyarrow.schema(campos)
+    sink = _Acumulador()
+
+    def lote_arrow(lote):
+        columnas = zip(*lote)
+        return pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(valores, type=tipo) for valores, (_, tipo) in zip(columnas, campos)],
+            schema=esquema,
+        )
+
+    with pyarrow.ipc.new_stream(sink, esquema) as writer:
+        yield sink.vaciar()
+        lote = []
+        for voto in votos_exportables(poll, justificaciones):
+            lote.append(_normalizar(voto))
+            if len(lote) == TAMANO_BLOQUE:
+                writer.write_batch(lote_arrow(lote))
+                lote = []
+                yield sink.vaciar()
+        if lote:
+            writer.write_batch(lote_arrow(lote))
+    yield sink.vaciar()
+
+
+def exportacion_columnar(poll, justificaciones=False):
+    """``(content_type, extension, bloques)`` del formato columnar disponible."""
+    if pyarrow is not None:
+        return "application/vnd.apache.arrow.stream", "arrows", iter_arrow(poll, justificaciones)
+    return "application/x-ndjson", "ndjson", iter_ndjson(poll, justificaciones)
@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.polls import analisis
+from studentspoint.apps.polls.models import Poll, PollOpcion, PollVoto
+from studentspoint.apps.polls.resultados import reconciliar
+
+
+def _agrupado_en_sql(poll):
+    """Los mismos desgloses con un ``GROUP BY`` por tabla."""
+    votos = PollVoto.objects.filter(poll=poll).order_by()
+    return (
+        list(votos.values_list("sede_voto__nombre", "carrera_voto", "opcion_id").annotate(n=Count("id"))),
+        list(votos.annotate(hora=TruncHour("created_at")).values_list("hora").annotate(n=Count("id"))),
+        list(votos.filter(principal=True).values_list("sede_voto__nombre", "carrera_voto").annotate(n=Count("id"))),
+        analisis.poblacion(poll),
+    )
+
+
+class Command(BaseCommand):
+    help = "Mide el análisis cruzado de una encuesta con muchos votos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votantes", type=int, default=50_000)
+        parser.add_argument("--opciones", type=int, default=4)
+        parser.add_argument("--sedes", type=int, default=8)
+        parser.add_argument("--carreras", type=int, default=40)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        sedes = [
+            Sede.objects.create(
+                slug=f"bench-analisis-{i}", nombre=f"Bench análisis {i}", direccion="-", lat=0, lng=0
+            )
+            for i in range(options["sedes"])
+        ]
+        creador = User.objects.create_user(email="bench-analisis@duocuc.cl", password=None)
+        votantes = User.objects.bulk_create(
+            (
+                User(
+                    email=f"bench-analisis-{i}@duocuc.cl", campus=sedes[i % len(sedes)],
+                    career=f"Carrera {i % options['carreras']}",
+                )
+                for i in range(options["votantes"])
+            ),
+            batch_size=2000,
+        )
+        try:
+            self._ejecutar(options, sedes, creador, votantes)
+        finally:
+            Poll.objects.filter(creador=creador).delete()
+            User.objects.filter(pk__in=[v.pk for v in votantes]).delete()
+            creador.delete()
+            Sede.objects.filter(pk__in=[s.pk for s in sedes]).delete()
+
+    def _ejecutar(self, options, sedes, creador, votantes):
+        poll = Poll.objects.create(titulo="Bench análisis", creador=creador, multi=True)
+        poll.sedes.set(sedes)
+        opciones = PollOpcion.objects.bulk_create(
+            PollOpcion(poll=poll, texto=f"Opción {i}", orden=i) for i in range(options["opciones"])
+        )
+        inicio = timezone.now() - timedelta(days=7)
+        PollVoto.objects.bulk_create(
+            (
+                PollVoto(
+                    poll=poll, opcion=opcion, usuario=votante, sede_voto_id=votante.campus_id,
+                    carrera_voto=votante.career, principal=j == 0,
+                    created_at=inicio + timedelta(seconds=i * 7 * 86400 // len(votantes)),
+                )
+                for i, votante in enumerate(votantes)
+                for j, opcion in enumerate(opciones)
+            ),
+            batch_size=5000,
+        )
+        reconciliar(reparar=True)
+        poll.refresh_from_db()
+        self.stdout.write(f"  {PollVoto.objects.filter(poll=poll).count()} votos")
+
+        def columnar_sin_numpy():
+            with mock.patch.object(analisis, "numpy", None):
+                return analisis.calcular(poll)
+
+        casos = [
+            ("sql", lambda: _agrupado_en_sql(poll)),
+            ("python", columnar_sin_numpy),
+        ]
+        if analisis.numpy is not None:
+            casos.insert(2, ("numpy", lambda: analisis.calcular(poll)))
+        for nombre, calcular in casos:
+            cache.clear()
+            inicio = time.perf_counter()
+            calcular()
+            self.stdout.write(f"  {nombre:9} {time.perf_counter() - inicio:6.2f} s")
+
+        analisis.obtener(poll, "cruce")
+        inicio = time.perf_counter()
+        analisis.obtener(poll, "cruce")
+        self.stdout.write(f"  cacheado  {(time.perf_counter() - inicio) * 1000:6.1f} ms")
+
+        columnas = analisis.cargar(poll)
+        for nombre, ruta in (("python", None), ("numpy", analisis.numpy)):
+            if nombre == "numpy" and ruta is None:
+                continue
+            with mock.patch.object(analisis, "numpy", ruta):
+                inicio = time.perf_counter()
+                analisis.cruce(columnas)
+                analisis.horas(columnas)
+                analisis.participacion(columnas, {})
+                self.stdout.write(
+                    f"  tablas {nombre:6} {(time.perf_counter() - inicio) * 1000:7.1f} ms (sin la lectura)"
+                )
@@ -0,0 +1,145 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.polls.audiencia import reconstruir
+from studentspoint.apps.polls.models import Poll
+from studentspoint.apps.polls.serializers import PollListSerializer
+from studentspoint.apps.polls.views import PollListCreateView
+
+CARRERAS = [f"Carrera {i}" for i in range(12)]
+
+
+def _puede_votar_anterior(poll, usuario):
+    if not poll.esta_activa:
+        return False
+    if poll.sedes.exists() and usuario.campus:
+        if not poll.sedes.filter(id=usuario.campus_id).exists():
+            return False
+    if poll.carreras and usuario.career:
+        if usuario.career not in poll.carreras:
+            return False
+    return True
+
+
+class _PollListSerializerAnterior(PollListSerializer):
+    puede_votar = serializers.SerializerMethodField()
+
+    def get_puede_votar(self, obj) -> bool:
+        return _puede_votar_anterior(obj, self.context["request"].user)
+
+
+class _PollListActual(PollListCreateView):
+    # Sin límite de peticiones, para medir solo la vista.
+    throttle_classes = []
+
+
+class _PollListAnterior(_PollListActual):
+    """Filtro por M2M + JSON con DISTINCT y ``puede_votar`` fila a fila, como antes."""
+
+    def get_serializer_class(self):
+        return _PollListSerializerAnterior
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Poll.objects.select_related("creador").prefetch_related("sedes").filter(
+            estado__in=[Poll.Estado.ACTIVA, Poll.Estado.CERRADA]
+        )
+        if user.campus:
+            queryset = queryset.filter(Q(sedes__isnull=True) | Q(sedes=user.campus)).distinct()
+        if user.career:
+            if connection.vendor == "postgresql":
+                contiene = Q(carreras__contains=[user.career])
+            else:
+                # SQLite no soporta ``contains`` sobre JSON; se aproxima sobre el texto.
+                contiene = Q(carreras__icontains=f'"{user.career}"')
+            queryset = queryset.filter(Q(carreras=[]) | contiene)
+        return queryset.alias(total_votos=F("participantes_count"))
+
+
+class Command(BaseCommand):
+    help = "Mide el listado de encuestas con la audiencia normalizada frente al filtro anterior"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=5000)
+        parser.add_argument("--sedes", type=int, default=20)
+        parser.add_argument("--peticiones", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        sedes = Sede.objects.bulk_create(
+            Sede(slug=f"bench-aud-{i}", nombre=f"Bench {i}", direccion="-", lat=0, lng=0)
+            for i in range(options["sedes"])
+        )
+        creador = User.objects.create_user(email="bench-audiencia@duocuc.cl", password=None)
+        try:
+            self._ejecutar(options, sedes, creador)
+        finally:
+            Poll.objects.filter(creador=creador).delete()
+            User.objects.filter(email__startswith="bench-audiencia").delete()
+            Sede.objects.filter(pk__in=[s.pk for s in sedes]).delete()
+
+    def _ejecutar(self, options, sedes, creador):
+        User = get_user_model()
+        rng = random.Random(options["seed"])
+        polls = Poll.objects.bulk_create(
+            (
+                Poll(
+                    titulo=f"Encuesta {i}",
+                    creador=creador,
+                    estado=Poll.Estado.ACTIVA,
+                    carreras=rng.sample(CARRERAS, rng.choice([0, 0, 1, 2, 3])),
+                )
+                for i in range(options["polls"])
+            ),
+            batch_size=1000,
+        )
+        Poll.sedes.through.objects.bulk_create(
+            (
+                Poll.sedes.through(poll_id=poll.pk, sede_id=sede.pk)
+                for poll in polls
+                for sede in rng.sample(sedes, rng.choice([0, 0, 1, 2, 5]))
+            ),
+            batch_size=2000,
+        )
+        filas = reconstruir()
+        self.stdout.write(f"  {len(polls)} encuestas, {len(sedes)} sedes, {filas} filas de audiencia")
+
+        usuarios = [
+            User.objects.create_user(
+                email=f"bench-audiencia-{i}@duocuc.cl", password=None,
+                campus=sedes[i % len(sedes)], career=CARRERAS[i % len(CARRERAS)],
+            )
+            for i in range(20)
+        ]
+        factory = APIRequestFactory()
+        for nombre, vista_clase in (("anterior", _PollListAnterior), ("audiencia", _PollListActual)):
+            vista = vista_clase.as_view()
+            consultas = []
+
+            def contar(execute, sql, params, many, context):
+                consultas.append(sql)
+                return execute(sql, params, many, context)
+
+            inicio = time.perf_counter()
+            for i in range(options["peticiones"]):
+                request = factory.get("/api/polls/", {"page": 1 + i % 5})
+                force_authenticate(request, user=usuarios[i % len(usuarios)])
+                with connection.execute_wrapper(contar):
+                    respuesta = vista(request)
+                    respuesta.render()
+                assert respuesta.status_code == 200, respuesta.status_code
+            duracion = time.perf_counter() - inicio
+            n = options["peticiones"]
+            self.stdout.write(
+                f"  {nombre:10} {n / duracion:7.0f} req/s "
+                f"({duracion * 1000 / n:.2f} ms y {len(consultas) / n:.1f} consultas por petición)"
+            )
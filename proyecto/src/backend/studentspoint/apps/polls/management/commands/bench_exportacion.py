@@ -0,0 +1,99 @@
+import csv
+import io
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.polls.exportacion import exportacion_columnar, iter_csv
+from studentspoint.apps.polls.models import Poll, PollOpcion, PollVoto
+from studentspoint.apps.polls.resultados import calcular_resultados, reconciliar
+
+
+def _csv_anterior(poll):
+    """CSV armado completo en memoria, con una consulta por opción."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Opción", "Votos", "Porcentaje", "Sede", "Carrera", "Fecha Voto"])
+    for opcion in calcular_resultados(poll).opciones:
+        for voto in opcion.votos.select_related("usuario", "sede_voto"):
+            writer.writerow([
+                opcion.texto,
+                1,
+                "",
+                voto.sede_voto.nombre if voto.sede_voto else "Sin sede",
+                voto.carrera_voto or "Sin carrera",
+                voto.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            ])
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo y memoria máxima de la exportación de una encuesta con muchos votos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votantes", type=int, default=25_000)
+        parser.add_argument("--opciones", type=int, default=4)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        sede = Sede.objects.create(
+            slug="bench-exportacion", nombre="Bench exportación", direccion="-", lat=0, lng=0
+        )
+        creador = User.objects.create_user(email="bench-exportacion@duocuc.cl", password=None)
+        votantes = User.objects.bulk_create(
+            (
+                User(email=f"bench-export-{i}@duocuc.cl", campus=sede, career=f"Carrera {i % 7}")
+                for i in range(options["votantes"])
+            ),
+            batch_size=2000,
+        )
+        try:
+            self._ejecutar(options, sede, creador, votantes)
+        finally:
+            Poll.objects.filter(creador=creador).delete()
+            User.objects.filter(pk__in=[v.pk for v in votantes]).delete()
+            creador.delete()
+            sede.delete()
+
+    def _ejecutar(self, options, sede, creador, votantes):
+        poll = Poll.objects.create(titulo="Bench exportación", creador=creador, multi=True)
+        opciones = PollOpcion.objects.bulk_create(
+            PollOpcion(poll=poll, texto=f"Opción {i}", orden=i) for i in range(options["opciones"])
+        )
+        PollVoto.objects.bulk_create(
+            (
+                PollVoto(
+                    poll=poll, opcion=opcion, usuario=votante,
+                    sede_voto=sede, carrera_voto=votante.career, principal=j == 0,
+                )
+                for votante in votantes
+                for j, opcion in enumerate(opciones)
+            ),
+            batch_size=5000,
+        )
+        reconciliar(reparar=True)
+        self.stdout.write(f"  {len(votantes) * len(opciones)} votos")
+
+        def consumir(bloques):
+            return sum(len(bloque) for bloque in bloques)
+
+        _, _, columnar = exportacion_columnar(poll)
+        casos = (
+            ("anterior", lambda: len(_csv_anterior(poll))),
+            ("streaming", lambda: consumir(iter_csv(poll))),
+            ("columnar", lambda: consumir(columnar)),
+        )
+        for nombre, exportar in casos:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            tamano = exportar()
+            duracion = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(
+                f"  {nombre:10} {duracion:6.2f} s  pico {pico / 2**20:7.1f} MiB  "
+                f"({tamano / 2**20:.1f} MiB exportados)"
+            )
@@ -0,0 +1,108 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.polls.models import Poll, PollAnalytics, PollOpcion, PollVoto
+from studentspoint.apps.polls.tasks import recalcular_analytics
+from studentspoint.apps.polls.views import PollVoteView
+
+
+class _PollVoteViewActual(PollVoteView):
+    # Sin límite de peticiones, para medir solo la vista.
+    throttle_classes = []
+
+
+class _PollVoteViewAnterior(_PollVoteViewActual):
+    """Validación consulta por consulta e inserción voto a voto, como antes."""
+
+    def post(self, request, pk):
+        poll = Poll.objects.get(pk=pk)
+        user = request.user
+        opcion_ids = request.data["opciones"]
+        assert poll.esta_activa
+        if poll.sedes.exists() and user.campus:
+            assert poll.sedes.filter(id=user.campus_id).exists()
+        opciones = PollOpcion.objects.filter(poll=poll, id__in=opcion_ids)
+        assert opciones.count() == len(opcion_ids)
+        assert not PollVoto.objects.filter(poll=poll, usuario=user).exists()
+        for opcion in list(opciones):
+            voto = PollVoto(poll=poll, opcion=opcion, usuario=user)
+            voto.save()
+            analytics, created = PollAnalytics.objects.get_or_create(poll=poll)
+            if not created:
+                analytics.actualizar_estadisticas()
+        return Response({"status": "success"})
+
+
+class Command(BaseCommand):
+    help = "Mide el registro de votos multi-opción, con el camino anterior y el actual"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--votantes", type=int, default=300)
+        parser.add_argument("--opciones", type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Sin transacción envolvente, como en producción; se limpia al final.
+        User = get_user_model()
+        sede = Sede.objects.create(
+            slug="bench-votacion", nombre="Bench votación", direccion="-", lat=0, lng=0
+        )
+        creador = User.objects.create_user(email="bench-votacion@duocuc.cl", password=None)
+        votantes = User.objects.bulk_create(
+            User(email=f"bench-votante-{i}@duocuc.cl", campus=sede, career=f"Carrera {i % 7}")
+            for i in range(options["votantes"])
+        )
+        try:
+            # El recálculo diferido corre en un worker, fuera de la petición.
+            with mock.patch.object(recalcular_analytics, "apply_async"):
+                self._ejecutar(options, sede, creador, votantes)
+        finally:
+            Poll.objects.filter(creador=creador).delete()
+            User.objects.filter(pk__in=[v.pk for v in votantes]).delete()
+            creador.delete()
+            sede.delete()
+
+    def _ejecutar(self, options, sede, creador, votantes):
+        factory = APIRequestFactory()
+        cache.clear()
+        for nombre, vista_clase in (("anterior", _PollVoteViewAnterior), ("actual", _PollVoteViewActual)):
+            poll = Poll.objects.create(
+                titulo=f"Bench {nombre}", creador=creador, estado=Poll.Estado.ACTIVA, multi=True
+            )
+            poll.sedes.add(sede)
+            PollAnalytics.objects.create(poll=poll)
+            opcion_ids = [
+                o.id
+                for o in PollOpcion.objects.bulk_create(
+                    PollOpcion(poll=poll, texto=f"Opción {i}", orden=i) for i in range(options["opciones"])
+                )
+            ]
+            vista = vista_clase.as_view()
+            consultas = []
+
+            def contar(execute, sql, params, many, context):
+                consultas.append(sql)
+                return execute(sql, params, many, context)
+
+            inicio = time.perf_counter()
+            for votante in votantes:
+                request = factory.post(
+                    f"/api/polls/{poll.pk}/votar/", {"opciones": opcion_ids}, format="json"
+                )
+                force_authenticate(request, user=votante)
+                with connection.execute_wrapper(contar):
+                    respuesta = vista(request, pk=poll.pk)
+                assert respuesta.status_code == 200, respuesta.data
+            duracion = time.perf_counter() - inicio
+            n = len(votantes)
+            self.stdout.write(
+                f"  {nombre:9} {n / duracion:8.0f} votos/s "
+                f"({duracion * 1000 / n:.2f} ms y {len(consultas) / n:.1f} consultas por voto)"
+            )
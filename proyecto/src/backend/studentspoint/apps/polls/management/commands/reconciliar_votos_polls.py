@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from studentspoint.apps.polls.resultados import reconciliar
+
+
+class Command(BaseCommand):
+    help = "Verifica los contadores votos_count y participantes_count contra los votos registrados"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reparar", action="store_true", help="Corrige los contadores que no coinciden"
+        )
+
+    def handle(self, *args, **options):
+        diferencias = reconciliar(reparar=options["reparar"])
+        for d in diferencias:
+            self.stdout.write(f"{d.modelo} {d.id}: guardado={d.guardado} real={d.real}")
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Contadores consistentes"))
+        elif options["reparar"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(diferencias)} contadores reparados"))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"{len(diferencias)} contadores con diferencias (usa --reparar)")
+            )
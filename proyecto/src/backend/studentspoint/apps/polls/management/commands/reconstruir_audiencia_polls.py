@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from studentspoint.apps.polls.audiencia import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Regenera la tabla de audiencia (sede × carrera) de todas las encuestas"
+
+    def handle(self, *args, **options):
+        creadas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Audiencia reconstruida: {creadas} filas"))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def calcular_contadores(apps, schema_editor):
+    Poll = apps.get_model("polls", "Poll")
+    PollOpcion = apps.get_model("polls", "PollOpcion")
+    PollVoto = apps.get_model("polls", "PollVoto")
+
+    votos = PollVoto.objects.order_by().values("opcion").annotate(n=Count("id"))
+    opciones = [PollOpcion(id=fila["opcion"], votos_count=fila["n"]) for fila in votos]
+    PollOpcion.objects.bulk_update(opciones, ["votos_count"], batch_size=500)
+
+    participantes = (
+        PollVoto.objects.order_by().values("poll").annotate(n=Count("usuario", distinct=True))
+    )
+    polls = [Poll(id=fila["poll"], participantes_count=fila["n"]) for fila in participantes]
+    Poll.objects.bulk_update(polls, ["participantes_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campuses', '0002_recorridopaso_imagen_360_thumbnail_and_more'),
+        ('forum', '0005_post_hot_rank'),
+        ('polls', '0002_pollanalytics_alter_poll_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='participantes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pollopcion',
+            name='votos_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['-participantes_count', 'id'], name='poll_participantes_idx'),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def marcar_principales(apps, schema_editor):
+    PollVoto = apps.get_model("polls", "PollVoto")
+    primeros = (
+        PollVoto.objects.order_by().values("poll", "usuario").annotate(primero=Min("id")).values("primero")
+    )
+    PollVoto.objects.filter(id__in=primeros).update(principal=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campuses', '0002_recorridopaso_imagen_360_thumbnail_and_more'),
+        ('polls', '0003_contadores_votos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pollvoto',
+            name='principal',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(marcar_principales, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pollvoto',
+            constraint=models.UniqueConstraint(condition=models.Q(('principal', True)), fields=('poll', 'usuario'), name='poll_voto_unico_por_usuario'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_audiencia(apps, schema_editor):
+    Poll = apps.get_model("polls", "Poll")
+    PollAudiencia = apps.get_model("polls", "PollAudiencia")
+
+    sedes = {}
+    for poll_id, sede_id in Poll.sedes.through.objects.values_list("poll_id", "sede_id"):
+        sedes.setdefault(poll_id, set()).add(sede_id)
+    filas = [
+        PollAudiencia(poll_id=poll_id, sede_id=sede_id, carrera=carrera)
+        for poll_id, carreras in Poll.objects.values_list("id", "carreras").iterator()
+        for sede_id in (sorted(sedes.get(poll_id, ())) or [None])
+        for carrera in (sorted({c for c in carreras or [] if c}) or [""])
+    ]
+    PollAudiencia.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campuses', '0002_recorridopaso_imagen_360_thumbnail_and_more'),
+        ('polls', '0004_voto_principal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollAudiencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrera', models.CharField(blank=True, max_length=150)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audiencia', to='polls.poll')),
+                ('sede', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='campuses.sede')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sede', 'carrera', 'poll'], name='poll_audiencia_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_audiencia, migrations.RunPython.noop),
+    ]
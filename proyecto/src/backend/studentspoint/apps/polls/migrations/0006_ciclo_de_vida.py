@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campuses', '0002_recorridopaso_imagen_360_thumbnail_and_more'),
+        ('forum', '0005_post_hot_rank'),
+        ('polls', '0005_audiencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollResultadoFinal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participantes', models.PositiveIntegerField(default=0)),
+                ('opciones', models.JSONField(default=list)),
+                ('cerrada_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['estado', 'cierra_at'], name='poll_estado_cierre_idx'),
+        ),
+        migrations.AddField(
+            model_name='pollresultadofinal',
+            name='poll',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resultado_final', to='polls.poll'),
+        ),
+    ]
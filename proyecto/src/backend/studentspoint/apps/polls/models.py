@@ -64,12 +64,18 @@ class Poll(models.Model):
     post = models.OneToOneField(
         "forum.Post", on_delete=models.CASCADE, related_name="poll", null=True, blank=True
     )
+    
+    # Usuarios distintos que votaron; se incrementa junto con el voto
+    # (ver ``resultados.registrar_votos``).
+    participantes_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["estado", "inicia_at"]),
+            models.Index(fields=["estado", "cierra_at"], name="poll_estado_cierre_idx"),
             models.Index(fields=["creador", "created_at"]),
+            models.Index(fields=["-participantes_count", "id"], name="poll_participantes_idx"),
         ]
 
     def __str__(self) -> str:
@@ -88,24 +94,19 @@ class Poll(models.Model):
     @property
     def total_votos(self) -> int:
         """Total de votos únicos (usuarios que han votado)."""
-        return self.votos.values("usuario").distinct().count()
+        return self.participantes_count
     
     def puede_votar(self, usuario) -> bool:
         """Verifica si un usuario puede votar en esta encuesta."""
         if not self.esta_activa:
             return False
             
-        # Verificar sede
-        if self.sedes.exists() and usuario.campus:
-            if not self.sedes.filter(id=usuario.campus_id).exists():
-                return False
-                
-        # Verificar carrera
-        if self.carreras and usuario.career:
-            if usuario.career not in self.carreras:
-                return False
-                
-        return True
+        # Verificar sede y carrera en la audiencia (``audiencia.anotar_elegible``
+        # la deja precalculada en listados y votación)
+        elegible = getattr(self, "elegible", None)
+        if elegible is None:
+            elegible = self.audiencia.para(usuario).exists()
+        return elegible
     
     def puede_ver_resultados(self, usuario) -> bool:
         """Verifica si un usuario puede ver los resultados."""
@@ -131,6 +132,7 @@ class PollOpcion(models.Model):
     color = models.CharField(
         max_length=7, blank=True, help_text="Color hexadecimal para gráficos (#RRGGBB)"
     )
+    votos_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ["orden", "id"]
@@ -142,7 +144,7 @@ class PollOpcion(models.Model):
     @property
     def total_votos(self) -> int:
         """Total de votos para esta opción."""
-        return self.votos.count()
+        return self.votos_count
     
     @property
     def porcentaje_votos(self) -> float:
@@ -173,9 +175,19 @@ class PollVoto(models.Model):
         "campuses.Sede", on_delete=models.SET_NULL, null=True, blank=True
     )
     carrera_voto = models.CharField(max_length=150, blank=True)
+    # Uno de los votos de cada participante lleva la marca; la restricción
+    # única sobre ella impide votar dos veces aunque sean opciones distintas.
+    principal = models.BooleanField(default=False, editable=False)
 
     class Meta:
         unique_together = ("poll", "usuario", "opcion")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poll", "usuario"],
+                condition=models.Q(principal=True),
+                name="poll_voto_unico_por_usuario",
+            ),
+        ]
         indexes = [
             models.Index(fields=["poll", "created_at"]),
             models.Index(fields=["usuario", "created_at"]),
@@ -190,11 +202,6 @@ class PollVoto(models.Model):
             self.sede_voto = self.usuario.campus
             self.carrera_voto = self.usuario.career
         super().save(*args, **kwargs)
-        
-        # Actualizar analytics cuando se crea un nuevo voto
-        analytics, created = PollAnalytics.objects.get_or_create(poll=self.poll)
-        if not created:
-            analytics.actualizar_estadisticas()
 
 
 class PollAnalytics(models.Model):
@@ -245,4 +252,54 @@ class PollAnalytics(models.Model):
         self.save()
     
     def __str__(self):
-        return f"Analytics: {self.poll.titulo}"
\ No newline at end of file
+        return f"Analytics: {self.poll.titulo}"
+
+class PollResultadoFinal(models.Model):
+    """Resultados congelados cuando la encuesta se cierra.
+
+    ``opciones`` guarda, en orden, los datos de cada opción con sus
+    ``votos`` y ``porcentaje``; así una encuesta cerrada se muestra sin
+    volver a contar (ver ``ciclo`` y ``resultados.calcular_resultados``).
+    """
+
+    poll = models.OneToOneField(Poll, on_delete=models.CASCADE, related_name="resultado_final")
+    participantes = models.PositiveIntegerField(default=0)
+    opciones = models.JSONField(default=list)
+    cerrada_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Resultado final: {self.poll_id}"
+
+
+class PollAudienciaQuerySet(models.QuerySet):
+    def para(self, usuario):
+        """Filas que habilitan a ``usuario`` (las comodín incluidas)."""
+        filtro = models.Q()
+        if usuario.campus_id:
+            filtro &= models.Q(sede__isnull=True) | models.Q(sede_id=usuario.campus_id)
+        if usuario.career:
+            filtro &= models.Q(carrera="") | models.Q(carrera=usuario.career)
+        return self.filter(filtro)
+
+
+class PollAudiencia(models.Model):
+    """Combinación sede × carrera habilitada para una encuesta.
+
+    Es la forma normalizada de ``Poll.sedes`` y ``Poll.carreras``: una fila
+    por par, con ``sede`` nula para "todas las sedes" y ``carrera`` vacía
+    para "todas las carreras". La mantiene ``audiencia.sincronizar``.
+    """
+
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name="audiencia")
+    sede = models.ForeignKey("campuses.Sede", on_delete=models.CASCADE, null=True, blank=True)
+    carrera = models.CharField(max_length=150, blank=True)
+
+    objects = PollAudienciaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sede", "carrera", "poll"], name="poll_audiencia_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.poll_id}: {self.sede_id or '*'} / {self.carrera or '*'}"
@@ -0,0 +1,194 @@
+"""Motor de resultados de encuestas.
+
+Los totales se mantienen desnormalizados: ``PollOpcion.votos_count`` y
+``Poll.participantes_count`` se incrementan con ``F()`` en la misma
+transacción que crea los votos (:func:`.votacion.registrar_votos`), así leer los
+resultados no agrupa ni cuenta ``PollVoto``. El conteo completo sale de
+una sola consulta sobre ``PollOpcion``; lo usan el detalle de la encuesta,
+la exportación y el admin. :func:`reconciliar` compara los contadores con
+los votos reales y corrige las diferencias.
+
+Al cerrarse una encuesta, :func:`congelar` copia sus resultados a
+:class:`~.models.PollResultadoFinal`; desde entonces se sirven desde ahí.
+
+El porcentaje de una opción es sobre participantes (usuarios distintos),
+como en :attr:`PollOpcion.porcentaje_votos`; en encuestas ``multi`` la
+suma puede superar 100.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Poll, PollOpcion, PollResultadoFinal, PollVoto
+
+TAMANO_LOTE = 500
+
+
+def porcentaje(votos: int, participantes: int) -> float:
+    if not participantes:
+        return 0.0
+    return round(votos / participantes * 100, 2)
+
+
+def anotar_polls(queryset):
+    """Anota ``participantes`` en un queryset de :class:`Poll`."""
+    return queryset.annotate(participantes=F("participantes_count"))
+
+
+def anotar_opciones(queryset):
+    """Anota ``votos_total`` y ``participantes_poll`` en un queryset de :class:`PollOpcion`."""
+    return queryset.annotate(
+        votos_total=F("votos_count"),
+        participantes_poll=F("poll__participantes_count"),
+    )
+
+
+@dataclass
+class Resultados:
+    """Conteo completo de una encuesta."""
+
+    participantes: int
+    opciones: List[PollOpcion] = field(default_factory=list)
+
+    @property
+    def total_votos(self) -> int:
+        """Votos emitidos (en encuestas ``multi`` un participante suma varios)."""
+        return sum(opcion.votos_total for opcion in self.opciones)
+
+    def por_opcion(self) -> Dict[int, PollOpcion]:
+        return {opcion.id: opcion for opcion in self.opciones}
+
+
+def _campos_opcion(opcion) -> dict:
+    return {
+        "id": opcion.id,
+        "texto": opcion.texto,
+        "descripcion": opcion.descripcion,
+        "orden": opcion.orden,
+        "color": opcion.color,
+        "votos": opcion.votos_count,
+    }
+
+
+def congelar(poll_ids, ahora) -> int:
+    """Guarda los resultados finales de ``poll_ids`` en una consulta de lectura."""
+    por_poll = {}
+    opciones = (
+        PollOpcion.objects.filter(poll_id__in=poll_ids)
+        .select_related("poll")
+        .only("id", "texto", "descripcion", "orden", "color", "votos_count", "poll__participantes_count")
+        .order_by("poll_id", "orden", "id")
+    )
+    for opcion in opciones:
+        final = por_poll.get(opcion.poll_id)
+        if final is None:
+            final = por_poll[opcion.poll_id] = PollResultadoFinal(
+                poll_id=opcion.poll_id, participantes=opcion.poll.participantes_count,
+                opciones=[], cerrada_at=ahora,
+            )
+        datos = _campos_opcion(opcion)
+        datos["porcentaje"] = porcentaje(datos["votos"], final.participantes)
+        final.opciones.append(datos)
+    PollResultadoFinal.objects.bulk_create(
+        por_poll.values(),
+        update_conflicts=True,
+        unique_fields=["poll"],
+        update_fields=["participantes", "opciones", "cerrada_at"],
+    )
+    return len(por_poll)
+
+
+def _resultados_congelados(poll: Poll, final: PollResultadoFinal) -> Resultados:
+    opciones = []
+    for datos in final.opciones:
+        opcion = PollOpcion(
+            id=datos["id"], poll=poll, texto=datos["texto"], descripcion=datos["descripcion"],
+            orden=datos["orden"], color=datos["color"], votos_count=datos["votos"],
+        )
+        opcion.votos_total = datos["votos"]
+        opcion.porcentaje = datos["porcentaje"]
+        opciones.append(opcion)
+    return Resultados(participantes=final.participantes, opciones=opciones)
+
+
+def calcular_resultados(poll: Poll) -> Resultados:
+    """Opciones de ``poll`` con ``votos_total`` y ``porcentaje``, en una consulta.
+
+    Las encuestas cerradas con resultados congelados no cuentan nada.
+    """
+    if poll.estado == Poll.Estado.CERRADA:
+        try:
+            return _resultados_congelados(poll, poll.resultado_final)
+        except PollResultadoFinal.DoesNotExist:
+            pass
+    opciones = list(anotar_opciones(PollOpcion.objects.filter(poll=poll)))
+    participantes = opciones[0].participantes_poll if opciones else 0
+    for opcion in opciones:
+        opcion.porcentaje = porcentaje(opcion.votos_total, participantes)
+    return Resultados(participantes=participantes, opciones=opciones)
+
+
+@dataclass
+class Diferencia:
+    """Contador que no coincide con los votos registrados."""
+
+    modelo: str
+    id: int
+    guardado: int
+    real: int
+
+
+def _lotes(ids):
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        yield ids[inicio:inicio + TAMANO_LOTE]
+
+
+def reconciliar(reparar: bool = False) -> List[Diferencia]:
+    """Compara los contadores con ``PollVoto`` y, si ``reparar``, los corrige.
+
+    La reparación no escribe los conteos leídos antes: cada lote es un
+    ``UPDATE ... SET contador = (subconsulta de conteo)``, así los votos que
+    se confirmen entre la comparación y la reparación (incrementos con
+    ``F()``) no se pisan.
+    """
+    diferencias = []
+    votos = dict(
+        PollVoto.objects.order_by().values("opcion").annotate(n=Count("id")).values_list("opcion", "n")
+    )
+    for opcion in PollOpcion.objects.only("id", "votos_count").iterator(chunk_size=TAMANO_LOTE):
+        real = votos.get(opcion.id, 0)
+        if opcion.votos_count != real:
+            diferencias.append(Diferencia("opcion", opcion.id, opcion.votos_count, real))
+
+    participantes = dict(
+        PollVoto.objects.order_by().values("poll")
+        .annotate(n=Count("usuario", distinct=True)).values_list("poll", "n")
+    )
+    for poll in Poll.objects.only("id", "participantes_count").iterator(chunk_size=TAMANO_LOTE):
+        real = participantes.get(poll.id, 0)
+        if poll.participantes_count != real:
+            diferencias.append(Diferencia("poll", poll.id, poll.participantes_count, real))
+
+    if reparar:
+        conteo_opcion = (
+            PollVoto.objects.filter(opcion=OuterRef("pk")).order_by().values("opcion")
+            .annotate(n=Count("id")).values("n")
+        )
+        conteo_poll = (
+            PollVoto.objects.filter(poll=OuterRef("pk")).order_by().values("poll")
+            .annotate(n=Count("usuario", distinct=True)).values("n")
+        )
+        opciones = [d.id for d in diferencias if d.modelo == "opcion"]
+        polls = [d.id for d in diferencias if d.modelo == "poll"]
+        for lote in _lotes(opciones):
+            PollOpcion.objects.filter(id__in=lote).update(
+                votos_count=Coalesce(Subquery(conteo_opcion), Value(0))
+            )
+        for lote in _lotes(polls):
+            Poll.objects.filter(id__in=lote).update(
+                participantes_count=Coalesce(Subquery(conteo_poll), Value(0))
+            )
+    return diferencias
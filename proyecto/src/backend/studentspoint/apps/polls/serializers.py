@@ -1,14 +1,16 @@
 """Serializadores mejorados para el sistema completo de encuestas."""
 
-import csv
-import io
 from rest_framework import serializers
 from django.http import HttpResponse
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema_field
 
 from studentspoint.apps.campuses.models import Sede
+from .ciclo import anunciar
 from .models import Poll, PollOpcion, PollVoto, PollAnalytics
+from .exportacion import exportacion_columnar, iter_csv, iter_json
+from .resultados import calcular_resultados
+from .votacion import VotoDuplicado, registrar_votos
 
 
 class PollOpcionSerializer(serializers.ModelSerializer):
@@ -62,7 +64,7 @@ class PollDetailSerializer(serializers.ModelSerializer):
     
     opciones = serializers.SerializerMethodField()
     creador_nombre = serializers.CharField(source="creador.name", read_only=True)
-    total_votos = serializers.IntegerField(read_only=True)
+    total_votos = serializers.SerializerMethodField()
     esta_activa = serializers.BooleanField(read_only=True)
     puede_votar = serializers.SerializerMethodField()
     puede_ver_resultados = serializers.SerializerMethodField()
@@ -79,10 +81,20 @@ class PollDetailSerializer(serializers.ModelSerializer):
             "created_at", "updated_at"
         ]
     
+    def _resultados(self, obj):
+        """Resultados de ``obj`` calculados una sola vez por serialización."""
+        cache = self.__dict__.setdefault("_resultados_por_poll", {})
+        if obj.pk not in cache:
+            cache[obj.pk] = calcular_resultados(obj)
+        return cache[obj.pk]
+    
+    def get_total_votos(self, obj) -> int:
+        return self._resultados(obj).participantes
+    
     @extend_schema_field(PollOpcionSerializer(many=True))
     def get_opciones(self, obj):
         user = self.context.get("request").user
-        opciones = obj.opciones.all()
+        opciones = self._resultados(obj).opciones
         
         if obj.puede_ver_resultados(user):
             # Mostrar con estadísticas
@@ -94,8 +106,8 @@ class PollDetailSerializer(serializers.ModelSerializer):
                     "descripcion": opcion.descripcion,
                     "orden": opcion.orden,
                     "color": opcion.color,
-                    "votos": opcion.total_votos,
-                    "porcentaje": opcion.porcentaje_votos
+                    "votos": opcion.votos_total,
+                    "porcentaje": opcion.porcentaje
                 })
             return opciones_data
         else:
@@ -169,7 +181,13 @@ class PollCreateSerializer(serializers.ModelSerializer):
         
         # Asignar creador
         validated_data["creador"] = self.context["request"].user
-        validated_data["estado"] = Poll.Estado.ACTIVA  # Activar automáticamente
+        # Activar automáticamente; si empieza más adelante queda programada
+        # y la publica ``ciclo.activar_programadas``
+        inicia_at = validated_data.get("inicia_at")
+        if inicia_at and inicia_at > timezone.now():
+            validated_data["estado"] = Poll.Estado.BORRADOR
+        else:
+            validated_data["estado"] = Poll.Estado.ACTIVA
         
         poll = Poll.objects.create(**validated_data)
         
@@ -186,6 +204,9 @@ class PollCreateSerializer(serializers.ModelSerializer):
         # Crear analytics
         PollAnalytics.objects.create(poll=poll)
         
+        if poll.estado == Poll.Estado.ACTIVA:
+            anunciar([poll])
+        
         return poll
 
 
@@ -232,24 +253,29 @@ class PollVoteSerializer(serializers.Serializer):
         if not poll.puede_votar(user):
             raise serializers.ValidationError("No tienes permisos para votar en esta encuesta")
         
-        # Validar opciones
-        opciones = PollOpcion.objects.filter(poll=poll, id__in=opcion_ids)
-        if opciones.count() != len(opcion_ids):
-            raise serializers.ValidationError("Una o más opciones no son válidas")
-        
         # Verificar si permite múltiples opciones
         if not poll.multi and len(opcion_ids) > 1:
             raise serializers.ValidationError("Esta encuesta solo permite una opción")
         
-        # Verificar votos existentes
-        if PollVoto.objects.filter(poll=poll, usuario=user).exists():
-            raise serializers.ValidationError("Ya has votado en esta encuesta")
+        # Verificar votos existentes (``ya_voto`` viene de ``anotar_votacion``)
+        ya_voto = getattr(poll, "ya_voto", None)
+        if ya_voto is None:
+            ya_voto = PollVoto.objects.filter(poll=poll, usuario=user).exists()
+        if ya_voto:
+            raise VotoDuplicado()
         
         # Verificar justificación requerida
         if poll.requiere_justificacion and not attrs.get("justificacion"):
             raise serializers.ValidationError("Esta encuesta requiere justificación")
         
-        attrs["_opciones_objs"] = list(opciones)
+        # Validar opciones
+        opciones = set(
+            PollOpcion.objects.filter(poll=poll, id__in=opcion_ids).values_list("id", flat=True)
+        )
+        if len(opciones) != len(opcion_ids):
+            raise serializers.ValidationError("Una o más opciones no son válidas")
+        
+        attrs["_opcion_ids"] = sorted(opciones)
         return attrs
     
     def create(self, validated_data):
@@ -262,16 +288,20 @@ class PollVoteSerializer(serializers.Serializer):
         ip_address = self.get_client_ip(request)
         user_agent = request.META.get("HTTP_USER_AGENT", "")
         
-        # Crear votos
-        for opcion in validated_data["_opciones_objs"]:
-            PollVoto.objects.create(
+        # Crear votos y actualizar los contadores en la misma transacción
+        registrar_votos(poll, [
+            PollVoto(
                 poll=poll,
-                opcion=opcion,
+                opcion_id=opcion_id,
                 usuario=user,
                 justificacion=justificacion,
                 ip_address=ip_address,
-                user_agent=user_agent
+                user_agent=user_agent,
+                sede_voto_id=user.campus_id,
+                carrera_voto=user.career or ""
             )
+            for opcion_id in validated_data["_opcion_ids"]
+        ])
         
         return poll
     
@@ -288,51 +318,36 @@ class PollVoteSerializer(serializers.Serializer):
 class PollExportSerializer(serializers.Serializer):
     """Serializa parámetros para exportación de resultados."""
     
-    formato = serializers.ChoiceField(choices=["csv", "json"], default="csv")
+    formato = serializers.ChoiceField(choices=["csv", "json", "columnar"], default="csv")
     incluir_metadatos = serializers.BooleanField(default=True)
     incluir_justificaciones = serializers.BooleanField(default=False)
     
     def export_csv(self, poll):
         """Exporta resultados de encuesta a CSV."""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Encabezados
-        headers = ["Opción", "Votos", "Porcentaje"]
-        if self.validated_data.get("incluir_metadatos"):
-            headers.extend(["Sede", "Carrera", "Fecha Voto"])
-        if self.validated_data.get("incluir_justificaciones"):
-            headers.append("Justificación")
-        
-        writer.writerow(headers)
-        
-        # Datos por opción
-        for opcion in poll.opciones.all():
-            votos = opcion.votos.select_related("usuario", "sede_voto")
-            
-            if not self.validated_data.get("incluir_metadatos"):
-                # Solo totales por opción
-                writer.writerow([
-                    opcion.texto,
-                    opcion.total_votos,
-                    f"{opcion.porcentaje_votos}%"
-                ])
-            else:
-                # Detalle por voto
-                for voto in votos:
-                    row = [
-                        opcion.texto,
-                        1,  # Un voto
-                        "",  # Porcentaje se calcula al final
-                        voto.sede_voto.nombre if voto.sede_voto else "Sin sede",
-                        voto.carrera_voto or "Sin carrera",
-                        voto.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                    ]
-                    if self.validated_data.get("incluir_justificaciones"):
-                        row.append(voto.justificacion)
-                    writer.writerow(row)
-        
-        return output.getvalue()
+        return "".join(self.iter_csv(poll))
+    
+    def iter_csv(self, poll):
+        """CSV de resultados en bloques, para ``StreamingHttpResponse``."""
+        return iter_csv(
+            poll,
+            metadatos=self.validated_data.get("incluir_metadatos"),
+            justificaciones=self.validated_data.get("incluir_justificaciones"),
+        )
+    
+    def iter_json(self, poll, detalle):
+        """JSON con el detalle de la encuesta y sus votos, en bloques."""
+        return iter_json(
+            poll,
+            detalle,
+            metadatos=self.validated_data.get("incluir_metadatos"),
+            justificaciones=self.validated_data.get("incluir_justificaciones"),
+        )
+    
+    def export_columnar(self, poll):
+        """``(content_type, extension, bloques)`` del formato columnar."""
+        return exportacion_columnar(
+            poll, justificaciones=self.validated_data.get("incluir_justificaciones")
+        )
 
 
 class PollAnalyticsSerializer(serializers.ModelSerializer):
@@ -0,0 +1,18 @@
+"""Tareas de encuestas."""
+
+from celery import shared_task
+
+from .ciclo import avanzar
+from .estadisticas import recalcular
+
+
+@shared_task
+def recalcular_analytics(poll_id):
+    """Recalcula ``PollAnalytics`` de una encuesta marcada como pendiente."""
+    return recalcular(poll_id).total_participantes
+
+
+@shared_task
+def avanzar_ciclo_polls():
+    """Publica borradores programados y cierra encuestas vencidas."""
+    return avanzar()
@@ -1,12 +1,32 @@
 """Tests completos para el sistema mejorado de encuestas."""
 
+import asyncio
+import json
+from array import array
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from studentspoint.apps.campuses.models import Sede
-from .models import Poll, PollOpcion, PollVoto, PollAnalytics
+from studentspoint.apps.notifications.models import Notificacion
+from . import analisis, ciclo, estadisticas, exportacion, resultados, tiempo_real
+from .models import Poll, PollAudiencia, PollOpcion, PollResultadoFinal, PollVoto, PollAnalytics
+from .resultados import reconciliar
+from .serializers import PollExportSerializer, PollVoteSerializer
+from .tasks import recalcular_analytics
+from .votacion import VotoDuplicado, anotar_votacion, registrar_votos
 
 User = get_user_model()
 
@@ -94,4 +114,758 @@ class PollAPITests(APITestCase):
         poll = Poll.objects.get(id=response.data['id'])
         self.assertEqual(poll.titulo, data['titulo'])
         self.assertTrue(poll.multi)
-        self.assertEqual(poll.opciones.count(), 2)
\ No newline at end of file
+        self.assertEqual(poll.opciones.count(), 2)
+
+class PollResultadosTests(APITestCase):
+    """Motor de resultados: una consulta sin importar la cantidad de opciones."""
+    
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.votantes = [
+            User.objects.create_user(email=f"v{i}@duocuc.cl", password=None) for i in range(4)
+        ]
+        self.client.force_authenticate(self.moderator)
+    
+    def _crear_poll(self, n_opciones):
+        poll = Poll.objects.create(
+            titulo="Encuesta de resultados", creador=self.moderator,
+            estado=Poll.Estado.ACTIVA, multi=True
+        )
+        opciones = [
+            PollOpcion.objects.create(poll=poll, texto=f"Opción {i}", orden=i)
+            for i in range(n_opciones)
+        ]
+        # El votante i marca las opciones 0..i.
+        for i, votante in enumerate(self.votantes):
+            for opcion in opciones[: i + 1]:
+                PollVoto.objects.create(poll=poll, opcion=opcion, usuario=votante)
+        reconciliar(reparar=True)
+        return poll
+    
+    def _contar_consultas_detalle(self, poll):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(f"/api/polls/{poll.id}/")
+        self.assertEqual(response.status_code, 200)
+        return len(capturadas), response.data
+    
+    def test_detalle_con_conteo_correcto(self):
+        poll = self._crear_poll(3)
+        _, data = self._contar_consultas_detalle(poll)
+        self.assertEqual(data["total_votos"], 4)
+        self.assertEqual(
+            [(o["votos"], o["porcentaje"]) for o in data["opciones"]],
+            [(4, 100.0), (3, 75.0), (2, 50.0)],
+        )
+    
+    def test_consultas_no_dependen_de_las_opciones(self):
+        pocas, _ = self._contar_consultas_detalle(self._crear_poll(2))
+        muchas, _ = self._contar_consultas_detalle(self._crear_poll(6))
+        self.assertEqual(pocas, muchas)
+    
+    def test_export_csv_usa_los_mismos_totales(self):
+        poll = self._crear_poll(2)
+        serializer = PollExportSerializer(data={"incluir_metadatos": False})
+        serializer.is_valid(raise_exception=True)
+        with self.assertNumQueries(1):
+            contenido = serializer.export_csv(poll)
+        self.assertIn("Opción 0,4,100.0%", contenido)
+        self.assertIn("Opción 1,3,75.0%", contenido)
+
+
+class PollContadoresTests(APITestCase):
+    """Contadores desnormalizados de votos y participantes."""
+    
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.estudiante = User.objects.create_user(email="est@duocuc.cl", password=None)
+        self.poll = Poll.objects.create(
+            titulo="Contadores", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=True
+        )
+        self.opciones = [
+            PollOpcion.objects.create(poll=self.poll, texto=f"Opción {i}", orden=i)
+            for i in range(3)
+        ]
+    
+    def test_votar_incrementa_los_contadores(self):
+        self.client.force_authenticate(self.estudiante)
+        response = self.client.post(
+            f"/api/polls/{self.poll.id}/votar/",
+            {"opciones": [self.opciones[0].id, self.opciones[2].id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.participantes_count, 1)
+        self.assertEqual(
+            list(PollOpcion.objects.filter(poll=self.poll).values_list("votos_count", flat=True)),
+            [1, 0, 1],
+        )
+        self.assertEqual(reconciliar(), [])
+    
+    def test_reconciliar_detecta_y_repara(self):
+        PollVoto.objects.create(poll=self.poll, opcion=self.opciones[1], usuario=self.estudiante)
+        salida = StringIO()
+        call_command("reconciliar_votos_polls", stdout=salida)
+        self.assertIn("2 contadores con diferencias", salida.getvalue())
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.participantes_count, 0)
+        
+        call_command("reconciliar_votos_polls", "--reparar", stdout=StringIO())
+        self.poll.refresh_from_db()
+        self.opciones[1].refresh_from_db()
+        self.assertEqual(self.poll.participantes_count, 1)
+        self.assertEqual(self.opciones[1].votos_count, 1)
+        self.assertEqual(reconciliar(), [])
+    
+    def test_reparar_no_pisa_votos_registrados_durante_la_reconciliacion(self):
+        PollVoto.objects.create(poll=self.poll, opcion=self.opciones[1], usuario=self.estudiante)
+        otro = User.objects.create_user(email="otro@duocuc.cl", password=None)
+        lotes = resultados._lotes
+        
+        def votar_y_seguir(ids):
+            # Un voto se confirma entre la comparación y la reparación.
+            if not PollVoto.objects.filter(usuario=otro).exists():
+                registrar_votos(self.poll, [PollVoto(poll=self.poll, opcion=self.opciones[1], usuario=otro)])
+            return lotes(ids)
+        
+        with mock.patch.object(resultados, "_lotes", side_effect=votar_y_seguir):
+            reconciliar(reparar=True)
+        self.poll.refresh_from_db()
+        self.opciones[1].refresh_from_db()
+        self.assertEqual((self.poll.participantes_count, self.opciones[1].votos_count), (2, 2))
+        self.assertEqual(reconciliar(), [])
+    
+    def test_listado_ordena_por_contador_sin_agrupar(self):
+        otra = Poll.objects.create(titulo="Popular", creador=self.moderator, estado=Poll.Estado.ACTIVA)
+        Poll.objects.filter(pk=otra.pk).update(participantes_count=5)
+        self.client.force_authenticate(self.moderator)
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get("/api/polls/", {"ordering": "-total_votos"})
+        self.assertEqual(response.status_code, 200)
+        resultados = response.data["results"]
+        self.assertEqual([p["id"] for p in resultados], [otra.id, self.poll.id])
+        self.assertEqual(resultados[0]["total_votos"], 5)
+        sql = " ".join(q["sql"] for q in capturadas.captured_queries)
+        self.assertNotIn("COUNT(DISTINCT", sql)
+        self.assertIn('ORDER BY "polls_poll"."participantes_count" DESC', sql)
+
+
+class PollEstadisticasTests(APITestCase):
+    """Estadísticas recalculadas fuera del voto."""
+    
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(
+            slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0
+        )
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.votantes = [
+            User.objects.create_user(email="a@duocuc.cl", password=None, campus=self.sede, career="Informática"),
+            User.objects.create_user(email="b@duocuc.cl", password=None, campus=self.sede, career="Diseño"),
+            User.objects.create_user(email="c@duocuc.cl", password=None),
+        ]
+    
+    def _crear_poll(self, **extra):
+        poll = Poll.objects.create(
+            titulo="Estadísticas", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=True, **extra
+        )
+        opciones = [PollOpcion.objects.create(poll=poll, texto=f"Opción {i}", orden=i) for i in range(2)]
+        return poll, [opcion.id for opcion in opciones]
+    
+    def _votar(self, poll, votante, opciones):
+        self.client.force_authenticate(votante)
+        response = self.client.post(f"/api/polls/{poll.id}/votar/", {"opciones": opciones}, format="json")
+        self.assertEqual(response.status_code, 200)
+    
+    def test_votos_programan_un_solo_recalculo(self):
+        poll, opciones = self._crear_poll()
+        with mock.patch.object(recalcular_analytics, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                for votante in self.votantes:
+                    self._votar(poll, votante, opciones)
+        apply_async.assert_called_once_with((poll.id,), countdown=estadisticas.INTERVALO)
+        self.assertFalse(PollAnalytics.objects.filter(poll=poll).exists())
+        
+        recalcular_analytics(poll.id)
+        analytics = PollAnalytics.objects.get(poll=poll)
+        self.assertEqual(analytics.total_participantes, 3)
+        self.assertEqual(analytics.distribucion_sedes, {"Sede Central": 2, "Sin sede": 1})
+        # Tras el recálculo, el siguiente voto vuelve a programar la tarea.
+        self.assertTrue(estadisticas.marcar_pendiente(poll.id))
+    
+    def test_encuesta_corta_actualiza_de_forma_incremental(self):
+        ahora = timezone.now()
+        poll, opciones = self._crear_poll(inicia_at=ahora - timedelta(hours=1), cierra_at=ahora + timedelta(hours=2))
+        with mock.patch.object(recalcular_analytics, "apply_async") as apply_async:
+            for votante in self.votantes:
+                self._votar(poll, votante, opciones)
+        apply_async.assert_not_called()
+        
+        analytics = PollAnalytics.objects.get(poll=poll)
+        incremental = (
+            analytics.total_participantes, analytics.distribucion_sedes, analytics.distribucion_carreras
+        )
+        analytics.actualizar_estadisticas()
+        self.assertEqual(
+            incremental,
+            (analytics.total_participantes, analytics.distribucion_sedes, analytics.distribucion_carreras),
+        )
+        self.assertEqual(analytics.distribucion_carreras, {"Informática": 1, "Diseño": 1, "Sin carrera": 1})
+
+
+class PollVotacionTests(APITestCase):
+    """Votación con validación e inserción en consultas fijas."""
+    
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(
+            slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0
+        )
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.estudiante = User.objects.create_user(
+            email="est@duocuc.cl", password=None, campus=self.sede, career="Informática"
+        )
+        self.client.force_authenticate(self.estudiante)
+    
+    def _crear_poll(self, n_opciones, multi=True):
+        poll = Poll.objects.create(
+            titulo="Votación", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=multi
+        )
+        poll.sedes.add(self.sede)
+        opciones = PollOpcion.objects.bulk_create(
+            PollOpcion(poll=poll, texto=f"Opción {i}", orden=i) for i in range(n_opciones)
+        )
+        return poll, [opcion.id for opcion in opciones]
+    
+    def _votar(self, poll, opciones):
+        return self.client.post(f"/api/polls/{poll.id}/votar/", {"opciones": opciones}, format="json")
+    
+    def test_consultas_no_dependen_de_las_opciones(self):
+        conteos = []
+        for n in (2, 10):
+            poll, opciones = self._crear_poll(n)
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self._votar(poll, opciones)
+            self.assertEqual(response.status_code, 200)
+            conteos.append(len(capturadas))
+            self.assertEqual(PollVoto.objects.filter(poll=poll, principal=True).count(), 1)
+            self.assertEqual(
+                set(PollVoto.objects.filter(poll=poll).values_list("sede_voto", "carrera_voto")),
+                {(self.sede.id, "Informática")},
+            )
+        self.assertEqual(conteos[0], conteos[1])
+    
+    def test_segundo_voto_responde_409(self):
+        poll, opciones = self._crear_poll(2, multi=False)
+        self.assertEqual(self._votar(poll, opciones[:1]).status_code, 200)
+        response = self._votar(poll, opciones[1:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(PollVoto.objects.filter(poll=poll).count(), 1)
+    
+    def test_carrera_entre_envios_responde_409(self):
+        poll, opciones = self._crear_poll(2, multi=False)
+        # Ambos envíos validan antes de que el otro inserte.
+        validados = []
+        for opcion_id in opciones:
+            anotada = anotar_votacion(Poll.objects.all(), self.estudiante).get(pk=poll.pk)
+            request = mock.Mock(user=self.estudiante, META={})
+            serializer = PollVoteSerializer(
+                data={"opciones": [opcion_id]}, context={"poll": anotada, "request": request}
+            )
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            validados.append(serializer)
+        validados[0].save()
+        with self.assertRaises(VotoDuplicado):
+            validados[1].save()
+        poll.refresh_from_db()
+        self.assertEqual(poll.participantes_count, 1)
+        self.assertEqual(reconciliar(), [])
+    
+    def test_sede_no_habilitada(self):
+        otra = Sede.objects.create(slug="norte", nombre="Sede Norte", direccion="Av 2", lat=0, lng=0)
+        poll, opciones = self._crear_poll(2)
+        poll.sedes.set([otra])
+        response = self._votar(poll, opciones[:1])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PollVoto.objects.filter(poll=poll).exists())
+
+
+class PollExportacionTests(APITestCase):
+    """Exportación en streaming con una sola consulta de votos."""
+    
+    def setUp(self):
+        self.sede = Sede.objects.create(
+            slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0
+        )
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.poll = Poll.objects.create(
+            titulo="Exportación", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=True
+        )
+        opciones = [
+            PollOpcion.objects.create(poll=self.poll, texto=f"Opción {i}", orden=i) for i in range(2)
+        ]
+        for i in range(5):
+            votante = User.objects.create_user(
+                email=f"v{i}@duocuc.cl", password=None,
+                campus=self.sede if i % 2 else None, career="Informática" if i % 2 else ""
+            )
+            for opcion in opciones[: 1 + i % 2]:
+                PollVoto.objects.create(
+                    poll=self.poll, opcion=opcion, usuario=votante, justificacion=f"Motivo {i}"
+                )
+        reconciliar(reparar=True)
+        self.client.force_authenticate(self.moderator)
+    
+    def _exportar(self, **datos):
+        response = self.client.post(f"/api/polls/{self.poll.id}/export/", datos, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as capturadas:
+            contenido = b"".join(response.streaming_content).decode()
+        return response, contenido, len(capturadas)
+    
+    def test_csv_por_voto_en_una_consulta(self):
+        with mock.patch.object(exportacion, "TAMANO_BLOQUE", 3):
+            response, contenido, consultas = self._exportar(
+                formato="csv", incluir_metadatos=True, incluir_justificaciones=True
+            )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(consultas, 1)
+        lineas = contenido.strip().splitlines()
+        self.assertEqual(lineas[0], "Opción,Votos,Porcentaje,Sede,Carrera,Fecha Voto,Justificación")
+        self.assertEqual(len(lineas), 1 + 7)
+        self.assertTrue(lineas[1].startswith("Opción 0,1,,Sin sede,Sin carrera,"))
+        self.assertTrue(lineas[-1].startswith("Opción 1,1,,Sede Central,Informática,"))
+    
+    def test_json_con_detalle_y_votos(self):
+        response, contenido, _ = self._exportar(formato="json", incluir_metadatos=True)
+        datos = json.loads(contenido)
+        self.assertEqual(datos["encuesta"]["id"], self.poll.id)
+        self.assertEqual(datos["encuesta"]["total_votos"], 5)
+        self.assertEqual(len(datos["votos"]), 7)
+        self.assertNotIn("justificacion", datos["votos"][0])
+    
+    def test_columnar_sin_pyarrow_usa_ndjson(self):
+        with mock.patch.object(exportacion, "pyarrow", None):
+            response, contenido, consultas = self._exportar(
+                formato="columnar", incluir_justificaciones=True
+            )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn(".ndjson", response["Content-Disposition"])
+        filas = [json.loads(linea) for linea in contenido.splitlines()]
+        self.assertEqual(len(filas), 7)
+        self.assertEqual(filas[0]["justificacion"], "Motivo 0")
+        self.assertEqual(consultas, 1)
+    
+    @skipUnless(exportacion.pyarrow, "pyarrow no está instalado")
+    def test_columnar_arrow(self):
+        response = self.client.post(
+            f"/api/polls/{self.poll.id}/export/", {"formato": "columnar"}, format="json"
+        )
+        tabla = exportacion.pyarrow.ipc.open_stream(b"".join(response.streaming_content)).read_all()
+        self.assertEqual(tabla.num_rows, 7)
+        self.assertEqual(tabla.column_names, ["opcion", "sede", "carrera", "fecha"])
+
+
+class PollAudienciaTests(APITestCase):
+    """Índice de audiencia sede × carrera para listados y permisos."""
+    
+    def setUp(self):
+        self.sede_a = Sede.objects.create(slug="a", nombre="Sede A", direccion="Av 1", lat=0, lng=0)
+        self.sede_b = Sede.objects.create(slug="b", nombre="Sede B", direccion="Av 2", lat=0, lng=0)
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.estudiante = User.objects.create_user(
+            email="est@duocuc.cl", password=None, campus=self.sede_a, career="Informática"
+        )
+    
+    def _crear_poll(self, titulo, sedes=(), carreras=()):
+        poll = Poll.objects.create(
+            titulo=titulo, creador=self.moderator, estado=Poll.Estado.ACTIVA, carreras=list(carreras)
+        )
+        poll.sedes.set(sedes)
+        return poll
+    
+    def test_audiencia_sigue_a_sedes_y_carreras(self):
+        poll = self._crear_poll("Encuesta abierta")
+        self.assertEqual(list(poll.audiencia.values_list("sede", "carrera")), [(None, "")])
+        
+        poll.sedes.add(self.sede_a, self.sede_b)
+        poll.carreras = ["Diseño", "Informática"]
+        poll.save()
+        self.assertEqual(poll.audiencia.count(), 4)
+        
+        self.sede_b.poll_set.clear()
+        self.assertEqual(
+            set(poll.audiencia.values_list("sede", "carrera")),
+            {(self.sede_a.id, "Diseño"), (self.sede_a.id, "Informática")},
+        )
+        
+        PollAudiencia.objects.all().delete()
+        call_command("reconstruir_audiencia_polls", stdout=StringIO())
+        self.assertEqual(poll.audiencia.count(), 2)
+    
+    def test_listado_filtra_por_audiencia_sin_consultas_por_fila(self):
+        visibles = {
+            self._crear_poll("Para todos").id,
+            self._crear_poll("Solo sede A", sedes=[self.sede_a]).id,
+            self._crear_poll("Solo Informática", carreras=["Informática"]).id,
+            self._crear_poll("Sede A e Informática", sedes=[self.sede_a], carreras=["Informática", "Diseño"]).id,
+        }
+        self._crear_poll("Solo sede B", sedes=[self.sede_b])
+        self._crear_poll("Solo Diseño", carreras=["Diseño"])
+        self._crear_poll("Sede B e Informática", sedes=[self.sede_b], carreras=["Informática"])
+        
+        self.client.force_authenticate(self.estudiante)
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get("/api/polls/")
+        self.assertEqual(response.status_code, 200)
+        resultados = response.data["results"]
+        self.assertEqual({p["id"] for p in resultados}, visibles)
+        self.assertTrue(all(p["puede_votar"] for p in resultados))
+        # Conteo y página: sin consultas por encuesta ni DISTINCT sobre el M2M.
+        self.assertEqual(len(capturadas), 2)
+        self.assertNotIn("DISTINCT", " ".join(q["sql"] for q in capturadas.captured_queries))
+    
+    def test_puede_votar_consulta_la_audiencia(self):
+        poll = self._crear_poll("Sede B e Informática", sedes=[self.sede_b], carreras=["Informática"])
+        sin_sede = User.objects.create_user(email="libre@duocuc.cl", password=None, career="Informática")
+        with self.assertNumQueries(1):
+            self.assertFalse(poll.puede_votar(self.estudiante))
+        self.assertTrue(poll.puede_votar(sin_sede))
+
+
+class PollCicloTests(APITestCase):
+    """Transiciones programadas y resultados congelados al cierre."""
+    
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.ahora = timezone.now()
+    
+    def _crear_poll(self, estado, inicia_at, cierra_at=None):
+        poll = Poll.objects.create(
+            titulo="Ciclo", creador=self.moderator, estado=estado,
+            inicia_at=inicia_at, cierra_at=cierra_at,
+        )
+        opciones = [PollOpcion.objects.create(poll=poll, texto=f"Opción {i}", orden=i) for i in range(2)]
+        return poll, opciones
+    
+    def test_transiciones_en_lote(self):
+        programada, _ = self._crear_poll(Poll.Estado.BORRADOR, self.ahora + timedelta(minutes=5))
+        sin_programar, _ = self._crear_poll(Poll.Estado.BORRADOR, self.ahora - timedelta(days=1))
+        vencida, _ = self._crear_poll(
+            Poll.Estado.ACTIVA, self.ahora - timedelta(days=1), self.ahora + timedelta(minutes=1)
+        )
+        vigente, _ = self._crear_poll(Poll.Estado.ACTIVA, self.ahora, self.ahora + timedelta(days=1))
+        
+        resultado = ciclo.avanzar(self.ahora + timedelta(minutes=10))
+        self.assertEqual(resultado, {"activadas": 1, "cerradas": 1})
+        estados = dict(Poll.objects.values_list("id", "estado"))
+        self.assertEqual(estados[programada.id], Poll.Estado.ACTIVA)
+        self.assertEqual(estados[sin_programar.id], Poll.Estado.BORRADOR)
+        self.assertEqual(estados[vencida.id], Poll.Estado.CERRADA)
+        self.assertEqual(estados[vigente.id], Poll.Estado.ACTIVA)
+        self.assertTrue(PollResultadoFinal.objects.filter(poll=vencida).exists())
+        self.assertEqual(ciclo.avanzar(self.ahora + timedelta(minutes=10)), {"activadas": 0, "cerradas": 0})
+    
+    def test_cerrada_se_sirve_desde_el_snapshot(self):
+        poll, opciones = self._crear_poll(Poll.Estado.ACTIVA, self.ahora - timedelta(days=1))
+        votante = User.objects.create_user(email="v@duocuc.cl", password=None)
+        PollVoto.objects.create(poll=poll, opcion=opciones[1], usuario=votante)
+        reconciliar(reparar=True)
+        
+        self.client.force_authenticate(self.moderator)
+        self.assertEqual(self.client.post(f"/api/polls/{poll.id}/cerrar/").status_code, 200)
+        final = PollResultadoFinal.objects.get(poll=poll)
+        self.assertEqual(final.participantes, 1)
+        self.assertEqual([o["votos"] for o in final.opciones], [0, 1])
+        
+        # Los votos posteriores no cambian lo que se muestra.
+        PollOpcion.objects.filter(pk=opciones[0].pk).update(votos_count=50)
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(f"/api/polls/{poll.id}/")
+        self.assertEqual(
+            [(o["votos"], o["porcentaje"]) for o in response.data["opciones"]], [(0, 0.0), (1, 100.0)]
+        )
+        self.assertFalse(any("polls_pollopcion" in q["sql"] for q in capturadas.captured_queries))
+    
+    def test_crear_con_inicio_futuro_queda_programada(self):
+        self.client.force_authenticate(self.moderator)
+        response = self.client.post("/api/polls/", {
+            "titulo": "Encuesta programada",
+            "inicia_at": (self.ahora + timedelta(hours=1)).isoformat(),
+            "opciones": [{"texto": "Sí"}, {"texto": "No"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        poll = Poll.objects.get(titulo="Encuesta programada")
+        self.assertEqual(poll.estado, Poll.Estado.BORRADOR)
+        ciclo.avanzar(self.ahora + timedelta(hours=2))
+        poll.refresh_from_db()
+        self.assertEqual(poll.estado, Poll.Estado.ACTIVA)
+    
+    def test_apertura_avisa_a_la_audiencia(self):
+        central = Sede.objects.create(slug="central", nombre="Central", direccion="Av 1", lat=0, lng=0)
+        norte = Sede.objects.create(slug="norte", nombre="Norte", direccion="Av 2", lat=0, lng=0)
+        alumno = User.objects.create_user(email="a@duocuc.cl", password=None, campus=central, career="Ing")
+        User.objects.create_user(email="b@duocuc.cl", password=None, campus=norte, career="Ing")
+        poll, _ = self._crear_poll(Poll.Estado.BORRADOR, self.ahora + timedelta(minutes=5))
+        poll.sedes.set([central])
+        
+        with mock.patch("studentspoint.apps.notifications.tasks.repartir_difusion.delay"):
+            with self.captureOnCommitCallbacks() as callbacks:
+                ciclo.avanzar(self.ahora + timedelta(minutes=10))
+            # El aviso espera a que se confirme el lote activado.
+            self.assertFalse(Notificacion.objects.filter(tipo="encuesta").exists())
+            for callback in callbacks:
+                callback()
+        aviso = Notificacion.objects.get(tipo="encuesta")
+        self.assertEqual(aviso.data_extra, {"poll_id": poll.id})
+        self.assertEqual(list(aviso.destinatarios.values_list("usuario_id", flat=True)), [alumno.id])
+
+
+class PollAnalisisTests(APITestCase):
+    """Tablas cruzadas de votos calculadas en columnas y cacheadas por versión."""
+    
+    def setUp(self):
+        cache.clear()
+        self.central = Sede.objects.create(slug="central", nombre="Central", direccion="Av 1", lat=0, lng=0)
+        self.norte = Sede.objects.create(slug="norte", nombre="Norte", direccion="Av 2", lat=0, lng=0)
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.poll = Poll.objects.create(
+            titulo="Cruce", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=True
+        )
+        self.poll.sedes.set([self.central, self.norte])
+        self.si, self.no = [
+            PollOpcion.objects.create(poll=self.poll, texto=texto, orden=i)
+            for i, texto in enumerate(["Sí", "No"])
+        ]
+        perfiles = [
+            (self.central, "Informática", [self.si]),
+            (self.central, "Informática", [self.si, self.no]),
+            (self.central, "Diseño", [self.no]),
+            (self.norte, "Informática", [self.si]),
+            (self.norte, "Diseño", None),
+        ]
+        for i, (sede, carrera, opciones) in enumerate(perfiles):
+            usuario = User.objects.create_user(
+                email=f"est{i}@duocuc.cl", password=None, campus=sede, career=carrera
+            )
+            for j, opcion in enumerate(opciones or []):
+                PollVoto.objects.create(poll=self.poll, opcion=opcion, usuario=usuario, principal=j == 0)
+        reconciliar(reparar=True)
+        self.poll.refresh_from_db()
+        self.client.force_authenticate(self.moderator)
+    
+    def _desglose(self, breakdown):
+        return self.client.get(f"/api/polls/{self.poll.id}/analytics/", {"breakdown": breakdown})
+    
+    def test_desgloses(self):
+        cruce = self._desglose("cruce").data
+        self.assertEqual(cruce["opciones"], ["Sí", "No"])
+        self.assertEqual(
+            [(f["sede"], f["carrera"], f["votos"]) for f in cruce["filas"]],
+            [("Central", "Diseño", [0, 1]), ("Central", "Informática", [2, 1]), ("Norte", "Informática", [1, 0])],
+        )
+        
+        horas = self._desglose("horas").data["horas"]
+        self.assertEqual(sum(h["votos"] for h in horas), 5)
+        
+        participacion = self._desglose("participacion").data
+        self.assertEqual(participacion["total"], {"participantes": 4, "habilitados": 5, "tasa": 80.0})
+        norte_diseno = next(
+            f for f in participacion["filas"] if (f["sede"], f["carrera"]) == ("Norte", "Diseño")
+        )
+        self.assertEqual((norte_diseno["participantes"], norte_diseno["habilitados"]), (0, 1))
+        
+        self.assertEqual(self._desglose("otro").status_code, 400)
+    
+    def test_cache_por_version(self):
+        primero = analisis.obtener(self.poll, "cruce")
+        with self.assertNumQueries(0):
+            self.assertEqual(analisis.obtener(self.poll, "horas")["horas"][0]["votos"], 5)
+        
+        votante = User.objects.get(email="est4@duocuc.cl")
+        PollVoto.objects.create(poll=self.poll, opcion=self.no, usuario=votante, principal=True)
+        reconciliar(reparar=True)
+        self.poll.refresh_from_db()
+        segundo = analisis.obtener(self.poll, "cruce")
+        self.assertNotEqual(primero, segundo)
+        self.assertIn(("Norte", "Diseño", [0, 1]), [(f["sede"], f["carrera"], f["votos"]) for f in segundo["filas"]])
+    
+    def test_sin_numpy_da_lo_mismo(self):
+        esperado = analisis.calcular(self.poll)
+        with mock.patch.object(analisis, "numpy", None):
+            self.assertEqual(analisis.calcular(self.poll), esperado)
+        columnas = (array("q", [0, 1, 1]), array("q", [2, 0, 0]))
+        self.assertEqual(analisis.contar(columnas, (2, 3), mascara=array("B", [1, 1, 0])), [0, 0, 1, 1, 0, 0])
+
+
+class PollTiempoRealTests(APITestCase):
+    """Resultados en vivo por SSE con el broker en memoria."""
+    
+    def setUp(self):
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.estudiante = User.objects.create_user(email="est@duocuc.cl", password=None)
+        self.poll = Poll.objects.create(
+            titulo="En vivo", creador=self.moderator, estado=Poll.Estado.ACTIVA, multi=True
+        )
+        self.opciones = [
+            PollOpcion.objects.create(poll=self.poll, texto=f"Opción {i}", orden=i) for i in range(2)
+        ]
+    
+    def _token(self, usuario):
+        return str(RefreshToken.for_user(usuario).access_token)
+    
+    def _votar(self, usuario, opciones):
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_votos(self.poll, [
+                PollVoto(poll=self.poll, opcion=opcion, usuario=usuario) for opcion in opciones
+            ])
+    
+    def _cerrar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ciclo.cerrar([self.poll.id], timezone.now())
+    
+    async def test_permisos(self):
+        url = f"/api/polls/{self.poll.id}/en-vivo/"
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.poll.mostrar_resultados = Poll.TipoResultados.AL_CIERRE
+        await self.poll.asave(update_fields=["mostrar_resultados"])
+        token = await sync_to_async(self._token)(self.estudiante)
+        response = await self.async_client.get(url, headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual((await self.async_client.get(f"{url}?token=invalido")).status_code, 401)
+    
+    def test_wsgi_responde_501_con_la_url_del_detalle(self):
+        response = self.client.get(
+            f"/api/polls/{self.poll.id}/en-vivo/", {"token": self._token(self.estudiante)}
+        )
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json()["resultados"], f"/api/polls/{self.poll.id}/")
+    
+    async def test_primer_evento_llega_antes_de_cerrar_el_stream(self):
+        response = await self.async_client.get(
+            f"/api/polls/{self.poll.id}/en-vivo/", {"token": await sync_to_async(self._token)(self.estudiante)}
+        )
+        self.assertEqual(response.status_code, 200)
+        stream = aiter(response.streaming_content)
+        # La encuesta sigue abierta: el estado se entrega sin esperar el final.
+        primero = await asyncio.wait_for(anext(stream), 5)
+        self.assertTrue(primero.startswith(b"event: estado\n"))
+        self.assertEqual(tiempo_real.broker().oyentes(tiempo_real.canal(self.poll.id)), 1)
+        await sync_to_async(self._cerrar)()
+        self.assertTrue((await asyncio.wait_for(anext(stream), 5)).startswith(b"event: cierre"))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+    
+    async def test_encuesta_cerrada_envia_estado_y_cierre(self):
+        await sync_to_async(self._cerrar)()
+        response = await self.async_client.get(
+            f"/api/polls/{self.poll.id}/en-vivo/", {"token": await sync_to_async(self._token)(self.estudiante)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        contenido = b"".join([parte async for parte in response.streaming_content])
+        self.assertTrue(contenido.startswith(b"event: estado\n"))
+        self.assertTrue(contenido.endswith(b"event: cierre\ndata: {}\n\n"))
+    
+    async def test_un_delta_para_todos_los_oyentes(self):
+        streams = [tiempo_real.eventos(self.poll.id) for _ in range(2)]
+        for stream in streams:
+            estado = await anext(stream)
+            self.assertEqual(
+                json.loads(estado.split(b"data: ")[1]),
+                {"p": 0, "v": {str(o.id): 0 for o in self.opciones}},
+            )
+        self.assertEqual(tiempo_real.broker().oyentes(tiempo_real.canal(self.poll.id)), 2)
+        
+        await sync_to_async(self._votar)(self.estudiante, self.opciones)
+        deltas = [await anext(stream) for stream in streams]
+        # Un mismo mensaje, serializado una vez, para ambos oyentes.
+        self.assertIs(deltas[0], deltas[1])
+        self.assertEqual(deltas[0].split(b"\n")[0], b"event: voto")
+        self.assertEqual(
+            json.loads(deltas[0].split(b"data: ")[1]),
+            {"p": 1, "d": {str(o.id): 1 for o in self.opciones}},
+        )
+        
+        await sync_to_async(self._cerrar)()
+        for stream in streams:
+            self.assertTrue((await anext(stream)).startswith(b"event: cierre"))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+        self.assertEqual(tiempo_real.broker().oyentes(tiempo_real.canal(self.poll.id)), 0)
+    
+    async def test_oyente_lento_recibe_estado_completo(self):
+        stream = tiempo_real.eventos(self.poll.id)
+        await anext(stream)
+        for _ in range(tiempo_real.LIMITE_COLA + 1):
+            tiempo_real.broker().publicar(tiempo_real.canal(self.poll.id), b"event: voto\ndata: {}\n\n")
+        await asyncio.sleep(0)
+        self.assertTrue((await anext(stream)).startswith(b"event: estado"))
+        await stream.aclose()
+
+
+class PollDashboardTests(APITestCase):
+    """Dashboard cacheado por rol con invalidación por versión."""
+    
+    def setUp(self):
+        cache.clear()
+        self.moderator = User.objects.create_user(
+            email="mod@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        self.otro = User.objects.create_user(
+            email="mod2@duocuc.cl", password=None, role=User.Roles.MODERATOR
+        )
+        for i, estado in enumerate([Poll.Estado.ACTIVA, Poll.Estado.ACTIVA, Poll.Estado.CERRADA]):
+            poll = Poll.objects.create(titulo=f"Encuesta {i}", creador=self.moderator, estado=estado)
+            Poll.objects.filter(pk=poll.pk).update(participantes_count=i)
+        self.client.force_authenticate(self.moderator)
+    
+    def _dashboard(self, consultas):
+        with self.assertNumQueries(consultas):
+            response = self.client.get("/api/polls/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_cache_por_rol_e_invalidacion(self):
+        data = self._dashboard(2)
+        self.assertEqual(data["estadisticas"], {
+            "total_encuestas": 3, "encuestas_activas": 2, "encuestas_cerradas": 1,
+            "mis_encuestas": 3, "actividad_reciente": 3,
+        })
+        self.assertEqual([p["participantes"] for p in data["top_encuestas"]], [2, 1, 0])
+        self._dashboard(0)
+        
+        # Mismo rol, otro usuario: solo su propio conteo.
+        self.client.force_authenticate(self.otro)
+        self.assertEqual(self._dashboard(1)["estadisticas"]["mis_encuestas"], 0)
+        
+        Poll.objects.create(titulo="Nueva encuesta", creador=self.otro, estado=Poll.Estado.ACTIVA)
+        data = self._dashboard(2)
+        self.assertEqual(data["estadisticas"]["total_encuestas"], 4)
+        self.assertEqual(data["estadisticas"]["mis_encuestas"], 1)
+    
+    def test_cierre_invalida(self):
+        self._dashboard(2)
+        poll = Poll.objects.filter(estado=Poll.Estado.ACTIVA).first()
+        Poll.objects.filter(pk=poll.pk).update(cierra_at=timezone.now() - timedelta(minutes=1))
+        ciclo.avanzar()
+        self.assertEqual(self._dashboard(2)["estadisticas"]["encuestas_cerradas"], 2)
@@ -0,0 +1,224 @@
+"""Resultados en vivo de encuestas por Server-Sent Events.
+
+Cada voto confirmado se publica una sola vez como un *delta* compacto::
+
+    event: voto
+    data: {"p": 42, "d": {"7": 1, "9": 1}}
+
+donde ``p`` es el total de participantes tras el voto (sirve de número de
+secuencia: el cliente descarta los deltas con ``p`` menor o igual al del
+estado que ya tiene) y ``d`` las opciones que sumaron. El mensaje se
+serializa al publicar y se reparte tal cual a todos los oyentes, así N
+clientes mirando la misma encuesta cuestan un solo cálculo.
+
+El reparto lo hace un :class:`Difusor` por proceso. Con el broker
+``"memoria"`` (desarrollo, tests, un solo proceso) el publicador entrega
+directo al difusor local; con una URL ``redis://`` se publica en Redis y
+cada proceso mantiene una única suscripción por encuesta con oyentes, que
+reenvía a su difusor. Se configura con ``POLLS_TIEMPO_REAL_BROKER``.
+
+El stream solo funciona servido por ASGI (``uvicorn`` o ``daphne`` sobre
+``studentspoint.asgi``): WSGI acumula la respuesta completa, así que ahí la
+vista responde 501 y el cliente vuelve a consultar el detalle. Con más de
+un worker el broker tiene que ser Redis; ``"memoria"`` no cruza procesos.
+
+Al conectarse, el cliente recibe primero un evento ``estado`` con el
+conteo completo (leído de los contadores, sin agregar votos) y al cerrarse
+la encuesta un evento ``cierre`` que termina el stream.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import Poll, PollOpcion
+
+KEEPALIVE = 15
+# Mensajes pendientes por oyente; si un cliente lento los acumula, se le
+# reenvía el estado completo en vez de seguir encolando.
+LIMITE_COLA = 100
+_REENVIAR_ESTADO = object()
+
+
+def canal(poll_id) -> str:
+    return f"polls:en_vivo:{poll_id}"
+
+
+def evento(nombre: str, datos) -> bytes:
+    return f"event: {nombre}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n".encode()
+
+
+class Oyente:
+    """Cola asíncrona de un cliente conectado."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=LIMITE_COLA)
+
+    def entregar(self, mensaje) -> None:
+        """Encola ``mensaje``; se puede llamar desde cualquier hilo."""
+        self.loop.call_soon_threadsafe(self._poner, mensaje)
+
+    def _poner(self, mensaje) -> None:
+        if self.cola.full():
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            mensaje = _REENVIAR_ESTADO
+        self.cola.put_nowait(mensaje)
+
+
+class Difusor:
+    """Reparte los mensajes de cada canal entre los oyentes del proceso."""
+
+    def __init__(self):
+        self._oyentes = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre_canal: str, oyente: Oyente) -> None:
+        with self._lock:
+            self._oyentes[nombre_canal].add(oyente)
+
+    def quitar(self, nombre_canal: str, oyente: Oyente) -> None:
+        with self._lock:
+            oyentes = self._oyentes.get(nombre_canal)
+            if oyentes is not None:
+                oyentes.discard(oyente)
+                if not oyentes:
+                    del self._oyentes[nombre_canal]
+
+    def oyentes(self, nombre_canal: str) -> int:
+        with self._lock:
+            return len(self._oyentes.get(nombre_canal, ()))
+
+    def entregar(self, nombre_canal: str, mensaje: bytes) -> None:
+        with self._lock:
+            oyentes = list(self._oyentes.get(nombre_canal, ()))
+        for oyente in oyentes:
+            oyente.entregar(mensaje)
+
+
+class BrokerMemoria(Difusor):
+    """Publicación dentro del mismo proceso."""
+
+    def publicar(self, nombre_canal: str, mensaje: bytes) -> None:
+        self.entregar(nombre_canal, mensaje)
+
+
+class BrokerRedis(Difusor):
+    """Publicación por Redis pub/sub con una suscripción por canal y proceso."""
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._cliente = None
+        self._lectores = {}
+
+    def publicar(self, nombre_canal: str, mensaje: bytes) -> None:
+        if self._cliente is None:
+            import redis
+
+            self._cliente = redis.Redis.from_url(self.url)
+        self._cliente.publish(nombre_canal, mensaje)
+
+    def agregar(self, nombre_canal, oyente):
+        super().agregar(nombre_canal, oyente)
+        if nombre_canal not in self._lectores:
+            self._lectores[nombre_canal] = oyente.loop.create_task(self._leer(nombre_canal))
+
+    def quitar(self, nombre_canal, oyente):
+        super().quitar(nombre_canal, oyente)
+        if not self.oyentes(nombre_canal):
+            lector = self._lectores.pop(nombre_canal, None)
+            if lector is not None:
+                lector.cancel()
+
+    async def _leer(self, nombre_canal):
+        import redis.asyncio
+
+        cliente = redis.asyncio.Redis.from_url(self.url)
+        pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(nombre_canal)
+            async for mensaje in pubsub.listen():
+                self.entregar(nombre_canal, mensaje["data"])
+        finally:
+            await pubsub.aclose()
+            await cliente.aclose()
+
+
+_broker = None
+
+
+def broker():
+    """Broker del proceso según ``POLLS_TIEMPO_REAL_BROKER``."""
+    global _broker
+    if _broker is None:
+        url = getattr(settings, "POLLS_TIEMPO_REAL_BROKER", "memoria")
+        _broker = BrokerMemoria() if url == "memoria" else BrokerRedis(url)
+    return _broker
+
+
+def publicar_voto(poll_id: int, opcion_ids) -> None:
+    """Publica el delta del voto cuando la transacción en curso confirme.
+
+    Debe llamarse después de incrementar los contadores, dentro de la
+    transacción del voto: el total leído ya incluye este participante.
+    """
+    participantes = Poll.objects.filter(pk=poll_id).values_list("participantes_count", flat=True).first()
+    mensaje = evento("voto", {"p": participantes, "d": {str(pk): 1 for pk in opcion_ids}})
+    transaction.on_commit(lambda: broker().publicar(canal(poll_id), mensaje))
+
+
+def publicar_cierre(poll_ids) -> None:
+    """Avisa el cierre de ``poll_ids`` a quienes los estén mirando."""
+    def enviar():
+        for poll_id in poll_ids:
+            broker().publicar(canal(poll_id), evento("cierre", {}))
+
+    transaction.on_commit(enviar)
+
+
+def estado_actual(poll_id: int) -> dict:
+    """Conteo completo desde los contadores, en una consulta."""
+    filas = list(
+        PollOpcion.objects.filter(poll_id=poll_id)
+        .order_by("orden", "id")
+        .values_list("id", "votos_count", "poll__participantes_count")
+    )
+    return {
+        "p": filas[0][2] if filas else 0,
+        "v": {str(pk): votos for pk, votos, _ in filas},
+    }
+
+
+async def eventos(poll_id: int, cerrada: bool = False):
+    """Stream SSE de ``poll_id``: estado inicial, deltas y cierre."""
+    if cerrada:
+        yield evento("estado", await sync_to_async(estado_actual)(poll_id))
+        yield evento("cierre", {})
+        return
+    oyente = Oyente()
+    nombre_canal = canal(poll_id)
+    # Suscribirse antes de leer el estado: ningún voto queda entre ambos.
+    broker().agregar(nombre_canal, oyente)
+    try:
+        yield evento("estado", await sync_to_async(estado_actual)(poll_id))
+        while True:
+            try:
+                mensaje = await asyncio.wait_for(oyente.cola.get(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if mensaje is _REENVIAR_ESTADO:
+                yield evento("estado", await sync_to_async(estado_actual)(poll_id))
+                continue
+            yield mensaje
+            if mensaje.startswith(b"event: cierre"):
+                return
+    finally:
+        broker().quitar(nombre_canal, oyente)
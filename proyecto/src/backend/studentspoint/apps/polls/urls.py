@@ -11,6 +11,7 @@ from .views import (
     PollCloseView,
     MyPollsView,
     PollsDashboardView,
+    resultados_en_vivo,
 )
 
 urlpatterns = [
@@ -23,6 +24,7 @@ urlpatterns = [
     path("polls/<int:pk>/cerrar/", PollCloseView.as_view(), name="poll-close"),
     path("polls/<int:pk>/export/", PollExportView.as_view(), name="poll-export"),
     path("polls/<int:pk>/analytics/", PollAnalyticsView.as_view(), name="poll-analytics"),
+    path("polls/<int:pk>/en-vivo/", resultados_en_vivo, name="poll-en-vivo"),
     
     # Vistas especiales
     path("polls/mis-encuestas/", MyPollsView.as_view(), name="my-polls"),
@@ -1,17 +1,27 @@
 """Vistas mejoradas para el sistema completo de encuestas."""
 
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Count, Q, Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import F, Value
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import generics, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
 from studentspoint.apps.accounts.permissions import IsModeratorOrDirector
 from .models import Poll, PollAnalytics
+from . import analisis, dashboard, tiempo_real
+from .audiencia import anotar_elegible, visibles_para
+from .ciclo import cerrar
+from .votacion import anotar_votacion
 from .serializers import (
     PollListSerializer,
     PollDetailSerializer,
@@ -55,7 +65,7 @@ class PollListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Poll.objects.select_related("creador").prefetch_related("sedes")
+        queryset = Poll.objects.select_related("creador")
         
         # Filtrar por estado
         estado = self.request.query_params.get("estado")
@@ -65,17 +75,9 @@ class PollListCreateView(generics.ListCreateAPIView):
             # Por defecto, mostrar solo encuestas activas y cerradas
             queryset = queryset.filter(estado__in=[Poll.Estado.ACTIVA, Poll.Estado.CERRADA])
         
-        # Filtrar por sede del usuario
-        if user.campus:
-            queryset = queryset.filter(
-                Q(sedes__isnull=True) | Q(sedes=user.campus)
-            ).distinct()
-        
-        # Filtrar por carrera del usuario
-        if user.career:
-            queryset = queryset.filter(
-                Q(carreras=[]) | Q(carreras__contains=[user.career])
-            )
+        # Filtrar por sede y carrera del usuario (índice de audiencia); lo
+        # listado queda elegible, así ``puede_votar`` no consulta por fila
+        queryset = visibles_para(queryset, user).annotate(elegible=Value(True))
         
         # Filtrar por fechas
         fecha_desde = self.request.query_params.get("fecha_desde")
@@ -91,10 +93,8 @@ class PollListCreateView(generics.ListCreateAPIView):
         if creador:
             queryset = queryset.filter(creador_id=creador)
         
-        # Anotar con total de votos
-        queryset = queryset.annotate(
-            total_votos=Count("votos__usuario", distinct=True)
-        )
+        # ``?ordering=total_votos`` ordena por el contador indexado
+        queryset = queryset.alias(total_votos=F("participantes_count"))
         
         return queryset
 
@@ -116,11 +116,8 @@ class PollListCreateView(generics.ListCreateAPIView):
 class PollDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de encuestas."""
     
-    queryset = Poll.objects.select_related("creador").prefetch_related(
-        "sedes", 
-        Prefetch("opciones", queryset=Poll.objects.none()),
-        "analytics"
-    )
+    # Las opciones y sus conteos los trae el motor de resultados en una consulta.
+    queryset = Poll.objects.select_related("creador", "analytics", "resultado_final").prefetch_related("sedes")
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
@@ -163,7 +160,7 @@ class PollVoteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, pk):
-        poll = get_object_or_404(Poll, pk=pk)
+        poll = get_object_or_404(anotar_votacion(Poll.objects.all(), request.user), pk=pk)
         
         serializer = PollVoteSerializer(
             data=request.data, 
@@ -201,32 +198,38 @@ class PollExportView(APIView):
         
         serializer = PollExportSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        formato = serializer.validated_data["formato"]
         
-        if serializer.validated_data["formato"] == "csv":
-            # Exportar CSV
-            csv_content = serializer.export_csv(poll)
-            response = HttpResponse(csv_content, content_type="text/csv")
-            response["Content-Disposition"] = f'attachment; filename="encuesta_{poll.id}_{poll.titulo[:30]}.csv"'
-            return response
-        
+        # Los votos se leen por bloques mientras se envía la respuesta
+        if formato == "csv":
+            content_type, extension = "text/csv", "csv"
+            contenido = serializer.iter_csv(poll)
+        elif formato == "json":
+            content_type, extension = "application/json", "json"
+            detalle = PollDetailSerializer(poll, context={"request": request}).data
+            contenido = serializer.iter_json(poll, detalle)
         else:
-            # Exportar JSON
-            poll_serializer = PollDetailSerializer(poll, context={"request": request})
-            response = HttpResponse(
-                poll_serializer.data, 
-                content_type="application/json"
-            )
-            response["Content-Disposition"] = f'attachment; filename="encuesta_{poll.id}_{poll.titulo[:30]}.json"'
-            return response
+            content_type, extension, contenido = serializer.export_columnar(poll)
+        
+        response = StreamingHttpResponse(contenido, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="encuesta_{poll.id}_{poll.titulo[:30]}.{extension}"'
+        return response
 
 
 @extend_schema(
     summary="Analytics de encuesta",
-    description="Obtiene estadísticas detalladas y análisis de una encuesta.",
+    description=(
+        "Obtiene estadísticas detalladas y análisis de una encuesta. Con el parámetro "
+        "breakdown (cruce, horas o participacion) entrega tablas cruzadas de los votos."
+    ),
     responses={200: PollAnalyticsSerializer}
 )
 class PollAnalyticsView(APIView):
-    """Obtiene analytics detallados de una encuesta."""
+    """Obtiene analytics detallados de una encuesta.
+    
+    Con ``?breakdown=cruce|horas|participacion`` entrega el desglose
+    correspondiente de :mod:`.analisis` en vez del resumen guardado.
+    """
     
     permission_classes = [permissions.IsAuthenticated, IsModeratorOrDirector]
     
@@ -241,6 +244,15 @@ class PollAnalyticsView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        breakdown = request.query_params.get("breakdown")
+        if breakdown is not None:
+            if breakdown not in analisis.DESGLOSES:
+                return Response(
+                    {"error": f"breakdown debe ser uno de: {', '.join(analisis.DESGLOSES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({"breakdown": breakdown, **analisis.obtener(poll, breakdown)})
+        
         # Obtener o crear analytics
         analytics, created = PollAnalytics.objects.get_or_create(poll=poll)
         if created or analytics.ultima_actualizacion < timezone.now() - timezone.timedelta(minutes=5):
@@ -277,9 +289,10 @@ class PollCloseView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        poll.estado = Poll.Estado.CERRADA
-        poll.cierra_at = timezone.now()
-        poll.save()
+        with transaction.atomic():
+            poll.cierra_at = timezone.now()
+            poll.save(update_fields=["cierra_at", "updated_at"])
+            cerrar([poll.id], poll.cierra_at)
         
         return Response({
             "status": "success",
@@ -298,12 +311,14 @@ class MyPollsView(generics.ListAPIView):
     serializer_class = PollListSerializer
     permission_classes = [permissions.IsAuthenticated, IsModeratorOrDirector]
     filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["created_at", "cierra_at", "total_votos"]
     ordering = ["-created_at"]
     
     def get_queryset(self):
-        return Poll.objects.filter(creador=self.request.user).annotate(
-            total_votos=Count("votos__usuario", distinct=True)
-        ).select_related("creador").prefetch_related("sedes")
+        queryset = Poll.objects.filter(creador=self.request.user).alias(
+            total_votos=F("participantes_count")
+        ).select_related("creador")
+        return anotar_elegible(queryset, self.request.user)
 
 
 @extend_schema(
@@ -318,45 +333,60 @@ class PollsDashboardView(APIView):
     
     def get(self, request):
         user = request.user
-        
-        # Estadísticas básicas
-        total_encuestas = Poll.objects.count()
-        encuestas_activas = Poll.objects.filter(estado=Poll.Estado.ACTIVA).count()
-        encuestas_cerradas = Poll.objects.filter(estado=Poll.Estado.CERRADA).count()
-        
-        # Encuestas del usuario si es moderador/director
-        mis_encuestas = Poll.objects.filter(creador=user).count()
-        
-        # Top encuestas por participación
-        top_encuestas = Poll.objects.annotate(
-            participantes=Count("votos__usuario", distinct=True)
-        ).order_by("-participantes")[:5]
-        
-        top_data = []
-        for poll in top_encuestas:
-            top_data.append({
-                "id": poll.id,
-                "titulo": poll.titulo,
-                "participantes": poll.participantes,
-                "estado": poll.estado
-            })
-        
-        # Actividad reciente
-        actividad_reciente = Poll.objects.filter(
-            created_at__gte=timezone.now() - timezone.timedelta(days=30)
-        ).count()
+        datos = dashboard.obtener(user)
         
         return Response({
-            "estadisticas": {
-                "total_encuestas": total_encuestas,
-                "encuestas_activas": encuestas_activas,
-                "encuestas_cerradas": encuestas_cerradas,
-                "mis_encuestas": mis_encuestas,
-                "actividad_reciente": actividad_reciente
-            },
-            "top_encuestas": top_data,
+            **datos,
             "usuario": {
                 "puede_crear": user.role in ["moderator", "director_carrera", "admin_global"],
                 "role": user.role
             }
-        })
\ No newline at end of file
+        })
+
+
+def _usuario_jwt(request):
+    """Usuario del header ``Authorization`` o de ``?token=`` (``EventSource`` no envía headers)."""
+    autenticador = JWTAuthentication()
+    try:
+        token = request.GET.get("token")
+        if token:
+            return autenticador.get_user(autenticador.get_validated_token(token))
+        resultado = autenticador.authenticate(request)
+    except (InvalidToken, TokenError):
+        return None
+    return resultado[0] if resultado else None
+
+
+async def resultados_en_vivo(request, pk):
+    """Stream SSE con los resultados de una encuesta a medida que llegan votos.
+
+    Ver :mod:`.tiempo_real` para el formato de los eventos. Bajo WSGI la
+    respuesta se acumularía completa antes de enviarse, así que se responde
+    501 con la URL del detalle para que el cliente consulte periódicamente.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {
+                "detail": "Resultados en vivo requieren un servidor ASGI; consulta el detalle periódicamente.",
+                "resultados": reverse("poll-detail", args=[pk]),
+            },
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    usuario = await sync_to_async(_usuario_jwt)(request)
+    if usuario is None or not usuario.is_active:
+        return JsonResponse({"detail": "No autenticado"}, status=status.HTTP_401_UNAUTHORIZED)
+    poll = await Poll.objects.select_related("creador").filter(pk=pk).afirst()
+    if poll is None:
+        return JsonResponse({"detail": "No encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    if not poll.puede_ver_resultados(usuario):
+        return JsonResponse(
+            {"detail": "No tienes permisos para ver los resultados de esta encuesta"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    respuesta = StreamingHttpResponse(
+        tiempo_real.eventos(poll.pk, cerrada=poll.estado == Poll.Estado.CERRADA),
+        content_type="text/event-stream",
+    )
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
@@ -0,0 +1,67 @@
+"""Registro de votos en encuestas.
+
+Un voto pasa por tres consultas fijas, sin importar cuántas opciones
+marque:
+
+1. :func:`anotar_votacion` trae la encuesta con lo necesario para
+   validar: si el usuario ya votó y si está en su audiencia.
+2. ``PollVoteSerializer.validate`` comprueba las opciones elegidas con una
+   sola lectura de ``PollOpcion``.
+3. :func:`registrar_votos` inserta todas las opciones con ``bulk_create`` y
+   actualiza los contadores en la misma transacción.
+
+La validación previa no basta ante dos envíos simultáneos del mismo
+usuario: la restricción ``poll_voto_unico_por_usuario`` (un voto
+``principal`` por usuario y encuesta) y ``unique_together`` los detienen
+en la base de datos, y la ``IntegrityError`` se traduce en
+:class:`VotoDuplicado` (409).
+"""
+
+from typing import List
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .audiencia import anotar_elegible
+from .estadisticas import registrar_participante
+from .models import Poll, PollOpcion, PollVoto
+from .tiempo_real import publicar_voto
+
+
+class VotoDuplicado(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Ya has votado en esta encuesta"
+    default_code = "voto_duplicado"
+
+
+def anotar_votacion(queryset, usuario):
+    """Anota ``ya_voto`` y ``elegible`` en un queryset de :class:`Poll`."""
+    return anotar_elegible(queryset, usuario).annotate(
+        ya_voto=Exists(PollVoto.objects.filter(poll=OuterRef("pk"), usuario=usuario)),
+    )
+
+
+def registrar_votos(poll: Poll, votos: List[PollVoto]) -> List[PollVoto]:
+    """Inserta los votos de un participante y suma uno a cada contador.
+
+    ``votos`` son las instancias sin guardar, todas del mismo usuario y de
+    opciones distintas de ``poll``. Las estadísticas de la encuesta se
+    actualizan según :mod:`.estadisticas` y, al confirmarse, el delta se
+    publica a los resultados en vivo (:mod:`.tiempo_real`). Lanza
+    :class:`VotoDuplicado` si el usuario ya tenía un voto registrado.
+    """
+    votos[0].principal = True
+    try:
+        with transaction.atomic():
+            PollVoto.objects.bulk_create(votos)
+            PollOpcion.objects.filter(id__in=[voto.opcion_id for voto in votos]).update(
+                votos_count=F("votos_count") + 1
+            )
+            Poll.objects.filter(pk=poll.pk).update(participantes_count=F("participantes_count") + 1)
+            registrar_participante(poll, votos[0])
+            publicar_voto(poll.pk, [voto.opcion_id for voto in votos])
+    except IntegrityError:
+        raise VotoDuplicado()
+    return votos
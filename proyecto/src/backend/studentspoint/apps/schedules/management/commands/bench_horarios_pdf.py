@@ -0,0 +1,129 @@
+import os
+import random
+import re
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+
+from studentspoint.apps.notifications import alertas
+from studentspoint.apps.schedules.models import Horario
+from studentspoint.apps.schedules.parsing import DAY_MAP, parse_pdf
+
+ASIGNATURAS = ["Algebra", "Programacion", "Fisica", "Ingles", "Base de Datos", "Etica", "Redes"]
+LINEAS_POR_PAGINA = 45
+
+
+def _linea(rng) -> str:
+    dia = rng.choice(list(DAY_MAP))
+    hora = rng.randrange(8, 21)
+    fin = "" if rng.random() < 0.2 else f"-{hora + 1}:{rng.choice(['00', '30'])}"
+    sala = f"{rng.choice(['Sala', 'Lab', 'Aula'])} {rng.choice('ABC')}-{rng.randrange(100, 400)}"
+    return f"{dia} {hora:02d}:00{fin} {rng.choice(ASIGNATURAS)} {sala}"
+
+
+def _corpus(directorio: Path, paginas, seed=1):
+    """Un PDF por cantidad de páginas, con ``LINEAS_POR_PAGINA`` bloques cada una."""
+    rng = random.Random(seed)
+    rutas = []
+    for i, total in enumerate(paginas):
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer)
+        for _ in range(total):
+            pdf.setFont("Helvetica", 9)
+            for k in range(LINEAS_POR_PAGINA):
+                pdf.drawString(30, 810 - k * 17, _linea(rng))
+            pdf.showPage()
+        pdf.save()
+        ruta = directorio / f"horario-{i}-{total}p.pdf"
+        ruta.write_bytes(buffer.getvalue())
+        rutas.append(ruta)
+    return rutas
+
+
+def _parse_anterior(ruta):
+    """Texto completo unido, ``re.search`` sin compilar por línea, como antes."""
+    text = "\n".join(page.extract_text() or "" for page in PdfReader(str(ruta)).pages)
+    text = re.sub(r"[ \t]+", " ", text)
+    blocks = []
+    for line in text.split("\n"):
+        match = re.search(
+            r"(Lunes|Martes|Miércoles|Jueves|Viernes|Sábado|Domingo) (\d{2}:\d{2})(?:-(\d{2}:\d{2}))? (.+?) (?:Sala|Lab|Aula)? ?([A-Za-z0-9-]+)?$",
+            line.strip(),
+        )
+        if match:
+            day, start, end, subject, sala = match.groups()
+            blocks.append((DAY_MAP[day], start, end or start, subject.strip(), sala or ""))
+    return blocks
+
+
+def _horario(usuario, bloque):
+    dia, inicio, fin, asignatura, sala = bloque
+    return Horario(
+        usuario=usuario, dia_semana=dia, inicio=inicio, fin=fin, asignatura=asignatura, sala=sala, editable=False
+    )
+
+
+class Command(BaseCommand):
+    help = "Mide el parseo de un corpus de horarios en PDF, en serie y con un pool de procesos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--paginas", type=int, nargs="+", default=[1, 1, 2, 2, 4, 40, 120])
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        usuario = get_user_model().objects.create_user(email="bench-horarios@duocuc.cl", password=None)
+        try:
+            with tempfile.TemporaryDirectory() as directorio:
+                rutas = _corpus(Path(directorio), options["paginas"])
+                self.stdout.write(
+                    f"  corpus: {len(rutas)} PDF, {sum(options['paginas'])} páginas, "
+                    f"{LINEAS_POR_PAGINA} bloques por página, {options['procesos']} procesos"
+                )
+                self._ejecutar(usuario, rutas, options["procesos"])
+        finally:
+            usuario.delete()
+
+    def _ejecutar(self, usuario, rutas, procesos):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        variantes = [("anterior", None), ("serie", 1)]
+        if procesos > 1:
+            variantes.append(("pool", procesos))
+        for nombre, workers in variantes:
+            Horario.objects.filter(usuario=usuario).delete()
+            consultas = 0
+            parseo = escritura = 0.0
+            with connection.execute_wrapper(contar):
+                for ruta in rutas:
+                    inicio = time.perf_counter()
+                    if workers is None:
+                        bloques = _parse_anterior(ruta)
+                    else:
+                        bloques = [b for pagina in parse_pdf(str(ruta), workers=workers) for b in pagina.blocks]
+                    parseo += time.perf_counter() - inicio
+                    inicio = time.perf_counter()
+                    if workers is None:
+                        for bloque in bloques:
+                            _horario(usuario, bloque).save()
+                    else:
+                        with transaction.atomic():
+                            Horario.objects.filter(usuario=usuario, editable=False).delete()
+                            Horario.objects.bulk_create(_horario(usuario, b) for b in bloques)
+                        # Lo que hace después schedule_class_alerts; antes lo hacía la señal por fila.
+                        alertas.programar([usuario.pk])
+                    escritura += time.perf_counter() - inicio
+            self.stdout.write(
+                f"  {nombre:9} parseo {parseo:6.2f} s  escritura {escritura:6.2f} s  {consultas} consultas"
+            )
@@ -10,8 +10,10 @@ class ScheduleImport(models.Model):
     """Stores uploaded PDF files for later parsing into :class:`Horario` blocks.
 
     The parsing task updates the ``status`` field and writes debug or warning
-    messages to ``parse_log`` so administrators can diagnose problems.  The
-    ``file`` field is limited to PDF uploads and validated in the API view.
+    messages to ``parse_log`` so administrators can diagnose problems.
+    ``pages_done`` out of ``pages_total`` reports progress while the PDF is
+    parsed.  The ``file`` field is limited to PDF uploads and validated in
+    the API view.
     """
 
     STATUS_CHOICES = [
@@ -26,6 +28,8 @@ class ScheduleImport(models.Model):
     file = models.FileField(upload_to="schedule_imports/")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
     parse_log = models.TextField(blank=True)
+    pages_total = models.PositiveIntegerField(default=0)
+    pages_done = models.PositiveIntegerField(default=0)
     timezone = models.CharField(max_length=64, default="America/Santiago")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
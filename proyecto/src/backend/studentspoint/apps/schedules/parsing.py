@@ -0,0 +1,122 @@
+"""Page-level parser for schedule PDFs.
+
+Text is extracted one page at a time from a lazily read ``PdfReader``
+instead of joining the whole document first, and every line goes through
+patterns compiled once at import. A page is parsed independently of the
+others, so large or multi-semester PDFs are spread across a process pool:
+each worker opens the file once (pool initializer) and then receives page
+numbers. Results are merged back in page order and ``on_page`` is called
+after every page so the caller can report progress.
+
+The pool is only used when the file is on local disk, the PDF has at
+least ``PARALLEL_MIN_PAGES`` pages, there is more than one CPU and the
+current process may have children (Celery's prefork workers are daemonic
+and may not).
+"""
+
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+
+from PyPDF2 import PdfReader
+
+DAY_MAP = {
+    "Lunes": 0,
+    "Martes": 1,
+    "Miércoles": 2,
+    "Jueves": 3,
+    "Viernes": 4,
+    "Sábado": 5,
+    "Domingo": 6,
+}
+
+SPACES_RE = re.compile(r"[ \t]+")
+BLOCK_RE = re.compile(
+    r"(Lunes|Martes|Miércoles|Jueves|Viernes|Sábado|Domingo) (\d{2}:\d{2})(?:-(\d{2}:\d{2}))? "
+    r"(.+?) (?:Sala|Lab|Aula)? ?([A-Za-z0-9-]+)?$"
+)
+DEFAULT_DURATION = timedelta(minutes=90)
+PARALLEL_MIN_PAGES = 8
+
+
+@dataclass
+class PageResult:
+    """Blocks ``(dia, inicio, fin, asignatura, sala)`` and warnings of one page."""
+
+    blocks: List[tuple] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    has_text: bool = False
+
+
+def parse_text(text: str) -> PageResult:
+    """Parse the extracted text of one page."""
+    result = PageResult(has_text=bool(text.strip()))
+    for line in SPACES_RE.sub(" ", text).split("\n"):
+        line = line.strip()
+        match = BLOCK_RE.search(line)
+        if match:
+            day, start, end, subject, sala = match.groups()
+            subject = subject.strip()
+            if not end:
+                end = (datetime.strptime(start, "%H:%M") + DEFAULT_DURATION).strftime("%H:%M")
+                result.warnings.append(f"{subject}: duración inferida 90m")
+            result.blocks.append((DAY_MAP[day], start, end, subject, sala or ""))
+        elif line:
+            result.warnings.append(f"Línea ignorada: {line}")
+    return result
+
+
+_worker_reader = None
+
+
+def _open_worker(path: str) -> None:
+    global _worker_reader
+    _worker_reader = PdfReader(path)
+
+
+def _parse_worker_page(number: int):
+    return number, parse_text(_worker_reader.pages[number].extract_text() or "")
+
+
+def _local_path(source):
+    try:
+        return source.path
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _workers(pages: int) -> int:
+    if pages < PARALLEL_MIN_PAGES or multiprocessing.current_process().daemon:
+        return 1
+    return min(os.cpu_count() or 1, pages // (PARALLEL_MIN_PAGES // 2))
+
+
+def parse_pdf(source, on_page=None, workers=None) -> List[PageResult]:
+    """Parse every page of ``source`` (a path or a Django ``FieldFile``).
+
+    ``on_page(done, total)`` is called after each parsed page. ``workers``
+    overrides the automatic process count (``1`` forces a serial parse).
+    """
+    reader = PdfReader(source)
+    total = len(reader.pages)
+    path = source if isinstance(source, (str, os.PathLike)) else _local_path(source)
+    workers = workers or _workers(total)
+    results = [None] * total
+    if workers > 1 and path:
+        with ProcessPoolExecutor(workers, initializer=_open_worker, initargs=(str(path),)) as pool:
+            futures = [pool.submit(_parse_worker_page, number) for number in range(total)]
+            for done, future in enumerate(as_completed(futures), 1):
+                number, result = future.result()
+                results[number] = result
+                if on_page:
+                    on_page(done, total)
+        return results
+    for number, page in enumerate(reader.pages):
+        results[number] = parse_text(page.extract_text() or "")
+        if on_page:
+            on_page(number + 1, total)
+    return results
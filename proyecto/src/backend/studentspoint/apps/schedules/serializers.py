@@ -7,8 +7,8 @@ from .models import ScheduleImport, Horario
 class ScheduleImportSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScheduleImport
-        fields = ["id", "status", "parse_log"]
-        read_only_fields = ["id", "status", "parse_log"]
+        fields = ["id", "status", "parse_log", "pages_total", "pages_done"]
+        read_only_fields = ["id", "status", "parse_log", "pages_total", "pages_done"]
 
 
 class HorarioSerializer(serializers.ModelSerializer):
@@ -1,27 +1,16 @@
 """Celery tasks for parsing schedule PDFs."""
 
-import re
-from datetime import datetime, timedelta
 from pathlib import Path
 
 from celery import shared_task
 from django.conf import settings
-from PyPDF2 import PdfReader
+from django.db import transaction
 import pytz
 
 from .models import ScheduleImport, Horario
+from .parsing import parse_pdf
 from studentspoint.apps.notifications.tasks import schedule_class_alerts
 
-DAY_MAP = {
-    "Lunes": 0,
-    "Martes": 1,
-    "Miércoles": 2,
-    "Jueves": 3,
-    "Viernes": 4,
-    "Sábado": 5,
-    "Domingo": 6,
-}
-
 CONFIG_DIR = Path(settings.BASE_DIR).parent.parent / "config"
 
 
@@ -34,10 +23,13 @@ def parse_schedule_pdf(import_id: str):
         Lunes 08:00-09:30 Algebra Sala B-101
 
     It normalises whitespace and extracts día, hora inicio/fin, asignatura y
-    sala.  For PDFs escaneados sin texto se devuelve el estado ``failed``.  Si
-    se habilita OCR en el futuro, este es el punto para llamar a una función
-    ``parse_schedule_pdf_ocr`` que convierta las imágenes a texto antes de
-    continuar.
+    sala, page by page (see :mod:`.parsing`), updating ``pages_done`` after
+    each page.  The new blocks replace the non-editable blocks of the
+    user's previous imports in a single transaction; blocks edited by hand
+    are kept.  For PDFs escaneados sin texto se devuelve el estado
+    ``failed``.  Si se habilita OCR en el futuro, este es el punto para
+    llamar a una función ``parse_schedule_pdf_ocr`` que convierta las
+    imágenes a texto antes de continuar.
     """
 
     imp = ScheduleImport.objects.get(id=import_id)
@@ -46,60 +38,45 @@ def parse_schedule_pdf(import_id: str):
 
     pytz.timezone(imp.timezone)  # ensures timezone string is valid
 
+    def on_page(done, total):
+        ScheduleImport.objects.filter(pk=imp.pk).update(pages_done=done, pages_total=total)
+
     try:
-        reader = PdfReader(imp.file)
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+        pages = parse_pdf(imp.file, on_page=on_page)
     except Exception as exc:  # pragma: no cover - rare
         imp.status = "failed"
         imp.parse_log = str(exc)
         imp.save(update_fields=["status", "parse_log"])
         return
 
-    if not text.strip():
+    if not any(page.has_text for page in pages):
         imp.status = "failed"
         imp.parse_log = "PDF escaneado sin texto detectable"
         imp.save(update_fields=["status", "parse_log"])
         return
 
-    # Normalise spaces but keep line breaks for block detection
-    text = re.sub(r"[ \t]+", " ", text)
-    blocks = []
-    warnings = []
-    for line in text.split("\n"):
-        line = line.strip()
-        match = re.search(
-            r"(Lunes|Martes|Miércoles|Jueves|Viernes|Sábado|Domingo) (\d{2}:\d{2})(?:-(\d{2}:\d{2}))? (.+?) (?:Sala|Lab|Aula)? ?([A-Za-z0-9-]+)?$",
-            line,
-        )
-        if match:
-            day, start, end, subject, sala = match.groups()
-            if not end:
-                start_dt = datetime.strptime(start, "%H:%M")
-                end_dt = (start_dt + timedelta(minutes=90)).strftime("%H:%M")
-                warnings.append(f"{subject.strip()}: duración inferida 90m")
-            else:
-                end_dt = end
-            blocks.append((DAY_MAP[day], start, end_dt, subject.strip(), sala or ""))
-        elif line:
-            warnings.append(f"Línea ignorada: {line}")
-
-    created = 0
-    for dia, inicio, fin, asignatura, sala in blocks:
-        Horario.objects.create(
-            usuario=imp.usuario,
-            dia_semana=dia,
-            inicio=inicio,
-            fin=fin,
-            asignatura=asignatura,
-            sala=sala,
-            fuente=imp,
-            editable=False,
+    warnings = [warning for page in pages for warning in page.warnings]
+    with transaction.atomic():
+        Horario.objects.filter(usuario=imp.usuario, fuente__isnull=False, editable=False).delete()
+        created = Horario.objects.bulk_create(
+            Horario(
+                usuario=imp.usuario,
+                dia_semana=dia,
+                inicio=inicio,
+                fin=fin,
+                asignatura=asignatura,
+                sala=sala,
+                fuente=imp,
+                editable=False,
+            )
+            for page in pages
+            for dia, inicio, fin, asignatura, sala in page.blocks
         )
-        created += 1
-
-    log_lines = [f"{created} bloques creados"] + warnings
-    imp.status = "done"
-    imp.parse_log = "\n".join(log_lines)
-    imp.save(update_fields=["status", "parse_log"])
+        log_lines = [f"{len(created)} bloques creados"] + warnings
+        imp.status = "done"
+        imp.parse_log = "\n".join(log_lines)
+        imp.save(update_fields=["status", "parse_log"])
 
-    schedule_class_alerts.delay(str(imp.usuario_id))
+        # bulk_create skips the Horario post_save signal: reschedule the
+        # user's class alerts once the blocks are committed.
+        transaction.on_commit(lambda: schedule_class_alerts.delay(str(imp.usuario_id)))
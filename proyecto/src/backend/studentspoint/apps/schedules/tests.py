@@ -1,15 +1,37 @@
-from datetime import time, datetime
+import tempfile
+from datetime import time, datetime, timedelta
+from pathlib import Path
 from unittest.mock import patch
 
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 
 from studentspoint.apps.accounts.models import User
 from .models import ScheduleImport, Horario
+from .parsing import parse_pdf, parse_text
 from .tasks import parse_schedule_pdf
 
 
+def _pdf(pages) -> bytes:
+    """PDF with one page per list of lines."""
+    from io import BytesIO
+
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for lines in pages:
+        y = 800
+        for line in lines:
+            pdf.drawString(40, y, line)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
 class ScheduleImportTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(email="a@duocuc.cl", password="x")
@@ -38,8 +60,8 @@ class ScheduleImportTests(TestCase):
             def extract_text(self_inner):
                 return sample_text
 
-        with patch("duocpoint.apps.schedules.tasks.PdfReader") as mock_reader, \
-            patch("duocpoint.apps.schedules.tasks.schedule_class_alerts.delay"):
+        with patch("studentspoint.apps.schedules.parsing.PdfReader") as mock_reader, \
+            patch("studentspoint.apps.schedules.tasks.schedule_class_alerts.delay"):
             mock_reader.return_value.pages = [DummyPage()]
             parse_schedule_pdf(str(imp.id))
 
@@ -49,8 +71,7 @@ class ScheduleImportTests(TestCase):
         imp.refresh_from_db()
         self.assertIn("duración inferida", imp.parse_log)
 
-    @patch("duocpoint.apps.notifications.tasks.send_class_push.apply_async")
-    def test_schedule_class_alerts(self, mock_apply):
+    def test_schedule_class_alerts(self):
         horario = Horario.objects.create(
             usuario=self.user,
             dia_semana=datetime.now().weekday(),
@@ -58,12 +79,13 @@ class ScheduleImportTests(TestCase):
             fin=time(11, 0),
             asignatura="Test",
         )
+        from studentspoint.apps.notifications.models import AlertaClase
         from studentspoint.apps.notifications.tasks import schedule_class_alerts
 
         schedule_class_alerts(self.user.id)
-        self.assertTrue(mock_apply.called)
-        args, kwargs = mock_apply.call_args
-        self.assertIn("eta", kwargs)
+        schedule_class_alerts(self.user.id)
+        alerta = AlertaClase.objects.get(horario=horario)
+        self.assertEqual(alerta.clase_at - alerta.dispara_at, timedelta(minutes=20))
 
     def test_horario_crud(self):
         resp = self.client.post(
@@ -79,3 +101,67 @@ class ScheduleImportTests(TestCase):
         self.assertTrue(resp.data["editable"])
         resp = self.client.delete(f"/api/horarios/{hid}")
         self.assertEqual(resp.status_code, 204)
+
+
+class ScheduleParsingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="p@duocuc.cl", password="x")
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _import(self, pages):
+        imp = ScheduleImport(usuario=self.user)
+        imp.file.save("horario.pdf", ContentFile(_pdf(pages)))
+        return imp
+
+    def test_parse_text(self):
+        result = parse_text("Lunes  08:00-09:30 Algebra Sala B-101\nsin formato\n")
+        self.assertEqual(result.blocks, [(0, "08:00", "09:30", "Algebra", "B-101")])
+        self.assertEqual(result.warnings, ["Línea ignorada: sin formato"])
+
+    def test_reimport_replaces_previous_blocks_and_reports_progress(self):
+        primero = self._import([["Lunes 08:00-09:30 Algebra Sala B-101"]])
+        with patch("studentspoint.apps.schedules.tasks.schedule_class_alerts.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            parse_schedule_pdf(str(primero.id))
+        delay.assert_called_once_with(str(self.user.id))
+        Horario.objects.create(usuario=self.user, dia_semana=2, inicio=time(9), fin=time(10), asignatura="Propio")
+        editado = Horario.objects.get(asignatura="Algebra")
+        editado.editable = True
+        editado.save()
+
+        segundo = self._import([
+            ["Martes 10:00-11:30 Fisica Sala C-1"],
+            ["Jueves 14:00 Quimica Lab L-2"],
+            ["Viernes 08:00-09:00 Ingles Sala A-3"],
+        ])
+        with patch("studentspoint.apps.schedules.tasks.schedule_class_alerts.delay"):
+            parse_schedule_pdf(str(segundo.id))
+        segundo.refresh_from_db()
+        self.assertEqual((segundo.status, segundo.pages_done, segundo.pages_total), ("done", 3, 3))
+        self.assertEqual(
+            sorted(Horario.objects.filter(usuario=self.user).values_list("asignatura", flat=True)),
+            ["Algebra", "Fisica", "Ingles", "Propio", "Quimica"],
+        )
+        self.assertEqual(Horario.objects.get(asignatura="Quimica").fin, time(15, 30))
+
+        tercero = self._import([["Martes 10:00-11:30 Fisica Sala C-1"]])
+        with patch("studentspoint.apps.schedules.tasks.schedule_class_alerts.delay"):
+            parse_schedule_pdf(str(tercero.id))
+        self.assertEqual(
+            sorted(Horario.objects.filter(usuario=self.user).values_list("asignatura", flat=True)),
+            ["Algebra", "Fisica", "Propio"],
+        )
+
+    def test_process_pool_matches_serial_parse(self):
+        path = self.media / "semestres.pdf"
+        path.write_bytes(_pdf([[f"Lunes 08:{i:02d}-09:30 Ramo {i} Sala S-{i}", "ruido"] for i in range(10)]))
+        progreso = []
+        paralelo = parse_pdf(str(path), on_page=lambda done, total: progreso.append((done, total)), workers=2)
+        self.assertEqual(paralelo, parse_pdf(str(path), workers=1))
+        self.assertEqual(progreso, [(i, 10) for i in range(1, 11)])
+        self.assertEqual(paralelo[3].blocks, [(0, "08:03", "09:30", "Ramo 3", "S-3")])
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'studentspoint.apps.search'
+
+    def ready(self):
+        from .indice import conectar_senales
+
+        conectar_senales()
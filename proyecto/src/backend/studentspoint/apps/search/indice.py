@@ -0,0 +1,255 @@
+"""Índice de búsqueda de texto completo para posts y productos.
+
+Cada tipo indexado tiene una tabla "sombra" propia, ``search_indice_<tipo>``,
+cuya clave es el ``id`` del objeto original:
+
+* En PostgreSQL la tabla guarda un ``tsvector`` (configuración ``spanish``,
+  con stemming) y tiene un índice GIN.
+* En SQLite es una tabla virtual FTS5 con el tokenizador ``unicode61``;
+  el stemming se hace en Python con :func:`raiz`.
+
+En ambos casos los acentos se eliminan en Python antes de indexar y de
+consultar, por lo que "cálculo" y "calculo" son equivalentes sin depender
+de la extensión ``unaccent``. Las tablas se mantienen sincronizadas con
+señales ``post_save``/``post_delete``; ``manage.py reindexar_busqueda``
+las reconstruye desde cero.
+
+:func:`buscar` filtra un queryset con una subconsulta sobre la tabla
+sombra y anota la columna ``relevancia``. En otros motores se usa ``icontains``.
+"""
+
+import re
+import unicodedata
+from typing import NamedTuple, Tuple
+
+from django.apps import apps
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+MOTORES_SOPORTADOS = ("postgresql", "sqlite")
+TAMANO_LOTE = 1000
+
+_PALABRA_RE = re.compile(r"\w+")
+_DIACRITICOS_RE = re.compile("[\u0300-\u036f]+")
+# Sufijos flexivos frecuentes en español, del más largo al más corto.
+_SUFIJOS = ("amientos", "imientos", "amiento", "imiento", "aciones", "iciones",
+            "amente", "mente", "acion", "icion", "ciones", "cion", "es", "s")
+
+
+class Indice(NamedTuple):
+    """Modelo indexado y campos de texto que se concatenan."""
+
+    modelo: str
+    campos: Tuple[str, ...]
+
+
+INDICES = {
+    "post": Indice("forum.Post", ("titulo", "cuerpo")),
+    "producto": Indice("market.Producto", ("titulo", "descripcion")),
+}
+
+
+def tabla(tipo: str) -> str:
+    return f"search_indice_{tipo}"
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin acentos."""
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS_RE.sub("", unicodedata.normalize("NFKD", texto))
+
+
+def raiz(palabra: str) -> str:
+    """Stemming liviano para español (plurales, adverbios y nominalizaciones)."""
+    for sufijo in _SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[: -len(sufijo)]
+    return palabra
+
+
+def _texto_documento(instancia, campos, vendor) -> str:
+    texto = plegar(" ".join(str(getattr(instancia, campo) or "") for campo in campos))
+    if vendor == "sqlite":
+        return " ".join(raiz(p) for p in _PALABRA_RE.findall(texto))
+    return texto
+
+
+# ---- Esquema ----
+
+def crear_tablas(connection) -> None:
+    """Crea las tablas sombra para el motor de ``connection``."""
+    with connection.cursor() as cursor:
+        for tipo in INDICES:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {tabla(tipo)} ("
+                    "objeto_id bigint PRIMARY KEY, vector tsvector NOT NULL)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {tabla(tipo)}_vector_gin "
+                    f"ON {tabla(tipo)} USING GIN (vector)"
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla(tipo)} USING fts5("
+                    "contenido, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+
+
+def eliminar_tablas(connection) -> None:
+    if connection.vendor not in MOTORES_SOPORTADOS:
+        return
+    with connection.cursor() as cursor:
+        for tipo in INDICES:
+            cursor.execute(f"DROP TABLE IF EXISTS {tabla(tipo)}")
+
+
+# ---- Escritura ----
+
+def _guardar(connection, tipo, filas) -> None:
+    """Inserta o reemplaza ``filas`` de la forma ``(id, texto)``."""
+    if not filas:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {tabla(tipo)} (objeto_id, vector) "
+                "VALUES (%s, to_tsvector('spanish', %s)) "
+                "ON CONFLICT (objeto_id) DO UPDATE SET vector = EXCLUDED.vector",
+                filas,
+            )
+        elif connection.vendor == "sqlite":
+            cursor.executemany(
+                f"DELETE FROM {tabla(tipo)} WHERE rowid = %s", [(pk,) for pk, _ in filas]
+            )
+            cursor.executemany(
+                f"INSERT INTO {tabla(tipo)} (rowid, contenido) VALUES (%s, %s)", filas
+            )
+
+
+def indexar(tipo: str, instancia, using: str = "default") -> None:
+    """Agrega o actualiza ``instancia`` en el índice de ``tipo``."""
+    connection = connections[using]
+    if connection.vendor not in MOTORES_SOPORTADOS:
+        return
+    texto = _texto_documento(instancia, INDICES[tipo].campos, connection.vendor)
+    _guardar(connection, tipo, [(instancia.pk, texto)])
+
+
+def desindexar(tipo: str, pk, using: str = "default") -> None:
+    connection = connections[using]
+    if connection.vendor not in MOTORES_SOPORTADOS:
+        return
+    columna = "objeto_id" if connection.vendor == "postgresql" else "rowid"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {tabla(tipo)} WHERE {columna} = %s", [pk])
+
+
+def reindexar(tipo: str, modelo=None, using: str = "default") -> int:
+    """Reconstruye el índice de ``tipo`` completo. Devuelve filas indexadas.
+
+    ``modelo`` permite pasar el modelo histórico desde una migración.
+    """
+    connection = connections[using]
+    if connection.vendor not in MOTORES_SOPORTADOS:
+        return 0
+    indice = INDICES[tipo]
+    modelo = modelo or apps.get_model(indice.modelo)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {tabla(tipo)}")
+
+    total = 0
+    lote = []
+    filas = modelo._default_manager.using(using).only("pk", *indice.campos)
+    for instancia in filas.iterator(chunk_size=TAMANO_LOTE):
+        lote.append((instancia.pk, _texto_documento(instancia, indice.campos, connection.vendor)))
+        if len(lote) >= TAMANO_LOTE:
+            _guardar(connection, tipo, lote)
+            total += len(lote)
+            lote = []
+    _guardar(connection, tipo, lote)
+    return total + len(lote)
+
+
+# ---- Consulta ----
+
+def buscar(queryset, tipo: str, consulta: str):
+    """Filtra ``queryset`` por ``consulta`` y anota ``relevancia``.
+
+    El queryset no se reordena; el llamador decide si ordenar por
+    ``-relevancia``.
+    """
+    connection = connections[queryset.db]
+    palabras = _PALABRA_RE.findall(plegar(consulta))
+    if not palabras:
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+    tabla_indice = tabla(tipo)
+    columna_id = f"{connection.ops.quote_name(queryset.model._meta.db_table)}.id"
+    if connection.vendor == "postgresql":
+        texto = " ".join(palabras)
+        consulta_ts = "plainto_tsquery('spanish', %s)"
+        coincidencias = RawSQL(
+            f"SELECT objeto_id FROM {tabla_indice} WHERE vector @@ {consulta_ts}", [texto]
+        )
+        relevancia = RawSQL(
+            f"SELECT ts_rank(vector, {consulta_ts}) FROM {tabla_indice} "
+            f"WHERE objeto_id = {columna_id}",
+            [texto],
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=coincidencias).annotate(relevancia=relevancia)
+    if connection.vendor == "sqlite":
+        # Cada palabra se busca por prefijo de su raíz; FTS5 las combina con AND.
+        expresion = " ".join(f'"{raiz(p)}"*' for p in palabras)
+        coincidencias = RawSQL(f"SELECT rowid FROM {tabla_indice} WHERE {tabla_indice} MATCH %s", [expresion])
+        # Un MATCH con ``rowid = ...`` por fila repite la búsqueda completa
+        # cada vez. ``LIMIT -1`` impide que SQLite aplane la subconsulta: el
+        # MATCH se evalúa una vez y se cruza por ``rowid`` con un índice
+        # automático. ``rank`` es bm25 negativo: más chico es más relevante.
+        relevancia = RawSQL(
+            f"SELECT m.relevancia FROM (SELECT rowid AS objeto_id, -rank AS relevancia "
+            f"FROM {tabla_indice} WHERE {tabla_indice} MATCH %s LIMIT -1) AS m "
+            f"WHERE m.objeto_id = {columna_id}",
+            [expresion],
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=coincidencias).annotate(relevancia=relevancia)
+
+    filtro = Q()
+    for campo in INDICES[tipo].campos:
+        filtro |= Q(**{f"{campo}__icontains": consulta})
+    return queryset.filter(filtro).annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+
+# ---- Sincronización ----
+
+def _al_guardar(tipo):
+    campos = set(INDICES[tipo].campos)
+
+    def receptor(sender, instance, update_fields=None, raw=False, using="default", **kwargs):
+        if raw or (update_fields is not None and not campos & set(update_fields)):
+            return
+        indexar(tipo, instance, using=using)
+
+    return receptor
+
+
+def _al_eliminar(tipo):
+    def receptor(sender, instance, using="default", **kwargs):
+        desindexar(tipo, instance.pk, using=using)
+
+    return receptor
+
+
+def conectar_senales() -> None:
+    for tipo, indice in INDICES.items():
+        modelo = apps.get_model(indice.modelo)
+        post_save.connect(_al_guardar(tipo), sender=modelo, weak=False,
+                          dispatch_uid=f"search-indexar-{tipo}")
+        post_delete.connect(_al_eliminar(tipo), sender=modelo, weak=False,
+                            dispatch_uid=f"search-desindexar-{tipo}")
@@ -0,0 +1,103 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from studentspoint.apps.market.models import CategoriaProducto, Producto
+from studentspoint.apps.search.indice import buscar, reindexar
+
+VOCABULARIO = (
+    "libro cálculo calculadora notebook mochila apuntes física química "
+    "programación python álgebra estadística guía ejercicios resueltos "
+    "venta usado nuevo edición casio celular audífonos mouse teclado "
+    "monitor impresora lámpara escritorio silla bicicleta"
+).split()
+# Relleno para que cada término del vocabulario sea relativamente escaso.
+RELLENO = [f"palabra{i}" for i in range(5000)]
+CONSULTAS = ("cálculo", "programación python", "audífonos", "guía ejercicios", "zzzinexistente")
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda de texto completo con icontains sobre N productos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=100_000)
+        parser.add_argument("--palabras", type=int, default=40, help="Palabras por descripción")
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Todo se ejecuta en una transacción que se revierte al final.
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _ejecutar(self, options):
+        rng = random.Random(options["seed"])
+
+        def texto(n):
+            return " ".join(
+                rng.choice(VOCABULARIO) if rng.random() < 0.05 else rng.choice(RELLENO)
+                for _ in range(n)
+            )
+
+        vendedor = get_user_model().objects.create_user(email="bench-busqueda@duocuc.cl", password=None)
+        categoria = CategoriaProducto.objects.create(nombre="bench-busqueda")
+
+        inicio = time.perf_counter()
+        Producto.objects.bulk_create(
+            (
+                Producto(
+                    vendedor=vendedor,
+                    categoria=categoria,
+                    titulo=texto(4),
+                    descripcion=texto(options["palabras"]),
+                    url_principal="https://example.com/p",
+                    estado=Producto.Estados.PUBLICADO,
+                )
+                for _ in range(options["productos"])
+            ),
+            batch_size=2000,
+        )
+        indexados = reindexar("producto")
+        self.stdout.write(
+            f"{indexados} productos creados e indexados en {time.perf_counter() - inicio:.1f} s"
+        )
+
+        base = Producto.objects.filter(categoria=categoria)
+        for consulta in CONSULTAS:
+            filtro = Q(titulo__icontains=consulta) | Q(descripcion__icontains=consulta)
+            t_icontains, n_icontains = self._medir(
+                lambda: list(base.filter(filtro).order_by("-created_at")[:20]),
+                lambda: base.filter(filtro).count(),
+                options["repeticiones"],
+            )
+            resultado = buscar(base, "producto", consulta)
+            t_fts, n_fts = self._medir(
+                lambda: list(resultado.order_by("-relevancia", "-created_at")[:20]),
+                lambda: resultado.count(),
+                options["repeticiones"],
+            )
+            self.stdout.write(
+                f"  {consulta!r:24} icontains {t_icontains * 1000:8.1f} ms ({n_icontains:6} filas)"
+                f"   fts {t_fts * 1000:8.1f} ms ({n_fts:6} filas)"
+            )
+
+    @staticmethod
+    def _medir(pagina, contar, repeticiones):
+        """Tiempo medio de obtener la primera página más el total (lo que hace la API)."""
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            pagina()
+            total = contar()
+        return (time.perf_counter() - inicio) / repeticiones, total
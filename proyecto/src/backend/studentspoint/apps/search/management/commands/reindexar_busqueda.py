@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from studentspoint.apps.search.indice import INDICES, crear_tablas, reindexar
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las tablas de búsqueda de texto completo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipos", nargs="*", choices=sorted(INDICES), help="Tipos a reindexar")
+
+    def handle(self, *args, **options):
+        crear_tablas(connection)
+        for tipo in options["tipos"] or INDICES:
+            with transaction.atomic():
+                total = reindexar(tipo)
+            self.stdout.write(self.style.SUCCESS(f"{tipo}: {total} documentos indexados"))
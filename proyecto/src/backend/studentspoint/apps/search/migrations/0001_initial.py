@@ -0,0 +1,100 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Copia del esquema y del texto indexado de ``search.indice`` al crear esta
+# migración: los cambios posteriores del módulo no deben alterarla.
+INDICES = {
+    "post": ("forum", "Post", ("titulo", "cuerpo")),
+    "producto": ("market", "Producto", ("titulo", "descripcion")),
+}
+TAMANO_LOTE = 1000
+
+_PALABRA_RE = re.compile(r"\w+")
+_DIACRITICOS_RE = re.compile("[\u0300-\u036f]+")
+_SUFIJOS = ("amientos", "imientos", "amiento", "imiento", "aciones", "iciones",
+            "amente", "mente", "acion", "icion", "ciones", "cion", "es", "s")
+
+
+def _plegar(texto):
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS_RE.sub("", unicodedata.normalize("NFKD", texto))
+
+
+def _raiz(palabra):
+    for sufijo in _SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[: -len(sufijo)]
+    return palabra
+
+
+def _texto(instancia, campos, vendor):
+    texto = _plegar(" ".join(str(getattr(instancia, campo) or "") for campo in campos))
+    if vendor == "sqlite":
+        return " ".join(_raiz(p) for p in _PALABRA_RE.findall(texto))
+    return texto
+
+
+def _guardar(cursor, vendor, tabla, filas):
+    if not filas:
+        return
+    if vendor == "postgresql":
+        cursor.executemany(
+            f"INSERT INTO {tabla} (objeto_id, vector) VALUES (%s, to_tsvector('spanish', %s))", filas
+        )
+    else:
+        cursor.executemany(f"INSERT INTO {tabla} (rowid, contenido) VALUES (%s, %s)", filas)
+
+
+def crear_indices(apps, schema_editor):
+    connection = schema_editor.connection
+    vendor = connection.vendor
+    if vendor not in ("postgresql", "sqlite"):
+        return
+    with connection.cursor() as cursor:
+        for tipo, (app_label, nombre_modelo, campos) in INDICES.items():
+            tabla = f"search_indice_{tipo}"
+            if vendor == "postgresql":
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {tabla} ("
+                    "objeto_id bigint PRIMARY KEY, vector tsvector NOT NULL)"
+                )
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {tabla}_vector_gin ON {tabla} USING GIN (vector)")
+            else:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5("
+                    "contenido, tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            cursor.execute(f"DELETE FROM {tabla}")
+            modelo = apps.get_model(app_label, nombre_modelo)
+            lote = []
+            filas = modelo._default_manager.using(connection.alias).only("pk", *campos)
+            for instancia in filas.iterator(chunk_size=TAMANO_LOTE):
+                lote.append((instancia.pk, _texto(instancia, campos, vendor)))
+                if len(lote) >= TAMANO_LOTE:
+                    _guardar(cursor, vendor, tabla, lote)
+                    lote = []
+            _guardar(cursor, vendor, tabla, lote)
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor not in ("postgresql", "sqlite"):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for tipo in INDICES:
+            cursor.execute(f"DROP TABLE IF EXISTS search_indice_{tipo}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0005_post_hot_rank'),
+        ('market', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,106 @@
+"""Pruebas para la búsqueda de texto completo."""
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APITestCase
+
+from studentspoint.apps.campuses.models import Sede
+from studentspoint.apps.forum.models import Foro, Post
+from studentspoint.apps.market.models import CategoriaProducto, Producto
+
+from .indice import buscar, plegar, raiz, reindexar
+
+
+class NormalizacionTests(SimpleTestCase):
+    def test_plegar_quita_acentos_y_mayusculas(self):
+        self.assertEqual(plegar("Cálculo ÑANDÚ"), "calculo nandu")
+
+    def test_raiz_iguala_singular_y_plural(self):
+        self.assertEqual(raiz("calculadoras"), raiz("calculadora"))
+        self.assertEqual(raiz("soluciones"), raiz("solucion"))
+        # Palabras cortas no se recortan.
+        self.assertEqual(raiz("mes"), "mes")
+
+
+class IndicePostTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password=None)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+
+    def _crear(self, titulo, cuerpo="texto"):
+        return Post.objects.create(foro=self.foro, usuario=self.user, titulo=titulo, cuerpo=cuerpo)
+
+    def _ids(self, consulta):
+        return list(buscar(Post.objects.all(), "post", consulta).order_by("-relevancia", "id")
+                    .values_list("id", flat=True))
+
+    def test_ignora_acentos_y_plurales(self):
+        post = self._crear("Apuntes de Cálculo", "ejercicios resueltos")
+        self._crear("Horario biblioteca")
+        self.assertEqual(self._ids("calculo"), [post.id])
+        self.assertEqual(self._ids("EJERCICIO"), [post.id])
+
+    def test_todas_las_palabras_deben_aparecer(self):
+        ambos = self._crear("Ayudantía de física", "guía de física y química")
+        self._crear("Física general")
+        self.assertEqual(self._ids("física química"), [ambos.id])
+
+    def test_ordena_por_relevancia(self):
+        poco = self._crear("Venta de libros", "incluye uno de programación")
+        mucho = self._crear("Programación en Python", "curso de programación, ejercicios de programación")
+        self.assertEqual(self._ids("programación"), [mucho.id, poco.id])
+
+    def test_sincroniza_al_editar_y_eliminar(self):
+        post = self._crear("Apuntes de álgebra")
+        post.titulo = "Apuntes de estadística"
+        post.save()
+        self.assertEqual(self._ids("algebra"), [])
+        self.assertEqual(self._ids("estadistica"), [post.id])
+        post.delete()
+        self.assertEqual(self._ids("estadistica"), [])
+
+    def test_reindexar_reconstruye_el_indice(self):
+        post = self._crear("Taller de robótica")
+        Post.objects.filter(pk=post.pk).update(titulo="Taller de soldadura")
+        self.assertEqual(self._ids("soldadura"), [])
+        self.assertEqual(reindexar("post"), 1)
+        self.assertEqual(self._ids("soldadura"), [post.id])
+
+
+class BusquedaEndpointTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email="user@duocuc.cl", password=None)
+        self.client.force_authenticate(self.user)
+        sede = Sede.objects.create(slug="central", nombre="Sede Central", direccion="Av 1", lat=0, lng=0)
+        self.foro = Foro.objects.create(sede=sede, carrera="Ing", titulo="General", slug="general")
+        self.categoria = CategoriaProducto.objects.create(nombre="Libros")
+
+    def _producto(self, titulo, descripcion):
+        return Producto.objects.create(
+            vendedor=self.user,
+            titulo=titulo,
+            descripcion=descripcion,
+            categoria=self.categoria,
+            url_principal="https://example.com/p",
+            estado=Producto.Estados.PUBLICADO,
+        )
+
+    def test_search_en_productos(self):
+        libro = self._producto("Libro de Cálculo", "Cálculo diferencial, edición 2020")
+        self._producto("Calculadora científica", "Casio fx")
+        self._producto("Mochila", "Mochila con compartimiento para calculo de notebook")
+        response = self.client.get("/api/productos/", {"search": "cálculo"})
+        self.assertEqual(response.status_code, 200)
+        ids = [p["id"] for p in response.data["results"]]
+        self.assertEqual(ids[0], libro.id)
+        self.assertEqual(len(ids), 2)
+
+    def test_search_en_posts(self):
+        post = Post.objects.create(foro=self.foro, usuario=self.user, titulo="Práctica", cuerpo="Busco prácticas")
+        Post.objects.create(foro=self.foro, usuario=self.user, titulo="Otro", cuerpo="nada")
+        response = self.client.get("/api/forum/posts/", {"search": "practica", "paginacion": "cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["id"] for p in response.data["results"]], [post.id])
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     "studentspoint.apps.portfolio",
     "studentspoint.apps.reports",
     "studentspoint.apps.schedules",
+    "studentspoint.apps.search",
     "studentspoint.apps.wellbeing",
 ]
 
@@ -157,9 +158,41 @@ CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000"
 # GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 
 
+# ---- Resultados en vivo de encuestas ----
+# "memoria" reparte dentro del proceso; con varios workers ASGI usar una URL redis://.
+POLLS_TIEMPO_REAL_BROKER = os.getenv("POLLS_TIEMPO_REAL_BROKER", "memoria")
+
+
+# ---- OpenGraph del marketplace ----
+# Redes no públicas a las que igual se puede descargar (p. ej. "10.0.0.0/8"); vacío en producción.
+MARKET_OG_REDES_PERMITIDAS = []
+
+
 # ---- Celery ----
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+CELERY_BEAT_SCHEDULE = {
+    "forum-recalcular-hot-rank": {
+        "task": "studentspoint.apps.forum.tasks.recalcular_hot_rank",
+        "schedule": 600.0,  # cada 10 minutos
+    },
+    "market-volcar-contadores": {
+        "task": "studentspoint.apps.market.tasks.volcar_contadores",
+        "schedule": 30.0,  # una vez por ventana de contadores
+    },
+    "market-consolidar-visualizaciones": {
+        "task": "studentspoint.apps.market.tasks.consolidar_visualizaciones",
+        "schedule": 300.0,  # cada 5 minutos
+    },
+    "polls-avanzar-ciclo": {
+        "task": "studentspoint.apps.polls.tasks.avanzar_ciclo_polls",
+        "schedule": 60.0,  # cada minuto
+    },
+    "notifications-despachar-alertas-clase": {
+        "task": "studentspoint.apps.notifications.tasks.despachar_alertas_clase",
+        "schedule": 60.0,  # cada minuto
+    },
+}
 
 # ---- OAuth de Google ----
 GOOGLE_CLIENT_ID = "307562557576-0fd8ta7i09i1e6it5hstla13jsomeq2s.apps.googleusercontent.com"
@@ -234,6 +234,9 @@ CACHES = {
     }
 }
 
+# Resultados en vivo de encuestas (pub/sub compartido entre workers ASGI)
+POLLS_TIEMPO_REAL_BROKER = os.getenv('POLLS_TIEMPO_REAL_BROKER', os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'))
+
 # Celery configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')